@@ -0,0 +1,111 @@
+"""
+Dashboard figures for students, teachers and admins.
+
+Each dashboard is built from a couple of aggregate queries and kept in Django's
+cache for a short time. Student and teacher figures are dropped as soon as the
+user's quiz attempts, doubts or lecture progress change (see accounts.signals);
+the shared admin figures simply expire.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Window
+
+CACHE_KEY = 'dashboard:{user_id}'
+ADMIN_CACHE_KEY = 'dashboard:admin'
+CACHE_TIMEOUT = getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 60)
+RECENT_LIMIT = 5
+
+
+def cache_key(user_id):
+    return CACHE_KEY.format(user_id=user_id)
+
+
+def invalidate(*user_ids):
+    cache.delete_many([cache_key(user_id) for user_id in user_ids if user_id])
+
+
+def _student(user):
+    from courses.models import SubjectProgress
+    from doubts.models import Doubt
+    from quizzes.models import QuizAttempt
+
+    # Lecture counts come from the per-subject completion rollups
+    subject_progress = list(
+        SubjectProgress.objects.filter(user=user).select_related('subject').annotate(
+            total_lectures=Count('subject__chapters__lectures')
+        ).order_by('subject__name')
+    )
+    for rollup in subject_progress:
+        rollup.percent = rollup.percent_complete(rollup.total_lectures)
+
+    # The window counts run over every row of the user's before LIMIT applies,
+    # so each recent list also carries the totals for the stat cards
+    recent_attempts = list(
+        QuizAttempt.objects.filter(user=user).select_related('quiz').annotate(
+            attempt_count=Window(Count('pk'))
+        ).order_by('-started_at')[:RECENT_LIMIT]
+    )
+    recent_doubts = list(
+        Doubt.objects.filter(user=user).annotate(
+            pending_count=Window(Count('pk', filter=Q(status='submitted')))
+        ).order_by('-created_at')[:RECENT_LIMIT]
+    )
+
+    return {
+        'subject_progress': subject_progress,
+        'total_lectures': sum(rollup.started_lectures for rollup in subject_progress),
+        'completed_lectures': sum(rollup.completed_lectures for rollup in subject_progress),
+        'quiz_attempts': recent_attempts[0].attempt_count if recent_attempts else 0,
+        'pending_doubts': recent_doubts[0].pending_count if recent_doubts else 0,
+        'recent_attempts': recent_attempts,
+        'recent_doubts': recent_doubts,
+    }
+
+
+def _teacher(user):
+    from doubts.models import Doubt
+
+    counts = Doubt.teacher_counts(user)
+    return {
+        'assigned_doubts': counts['assigned'],
+        'resolved_doubts': counts['resolved'],
+        'pending_assignments': counts['pending'],
+    }
+
+
+def _admin():
+    from doubts.models import Doubt
+    from .models import Role, User
+
+    users_by_role = {
+        Role.name_for(role_id): count
+        for role_id, count in User.objects.order_by().values_list('role').annotate(count=Count('pk'))
+    }
+    figures = Doubt.objects.aggregate(
+        total_doubts=Count('pk'),
+        pending_doubts=Count('pk', filter=Q(status='submitted')),
+    )
+    figures.update({
+        'total_users': sum(users_by_role.values()),
+        'total_students': users_by_role.get('student', 0),
+        'total_teachers': users_by_role.get('teacher', 0),
+    })
+    return figures
+
+
+def get_dashboard(user):
+    """Return the template context for `user`'s dashboard, or {} if their role has none."""
+    if user.is_student:
+        key, build = cache_key(user.pk), lambda: _student(user)
+    elif user.is_teacher:
+        key, build = cache_key(user.pk), lambda: _teacher(user)
+    elif user.is_admin:
+        key, build = ADMIN_CACHE_KEY, _admin
+    else:
+        return {}
+
+    figures = cache.get(key)
+    if figures is None:
+        figures = build()
+        cache.set(key, figures, CACHE_TIMEOUT)
+    return figures
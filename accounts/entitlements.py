@@ -0,0 +1,140 @@
+"""
+Per-user entitlement cache.
+
+A user's active batch enrollments and course enrollment scopes are resolved once
+and kept in Django's cache until an enrollment, order or expiry change
+invalidates them (see accounts.signals), so access checks on content pages do
+not hit the database. Content views go through EntitlementRequiredMixin and
+templates through the `has_access` filter.
+
+Invalidation only reaches every worker through a shared cache. With a
+process-local one (the LocMemCache default), entries live for
+LOCAL_CACHE_TIMEOUT instead, which bounds how long a revoked enrollment keeps
+working on the other workers.
+"""
+from operator import attrgetter
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.shortcuts import redirect
+from django.utils import timezone
+from main import shared_cache
+
+CACHE_KEY = 'entitlements:{user_id}'
+CACHE_TIMEOUT = getattr(settings, 'ENTITLEMENT_CACHE_TIMEOUT', 60 * 60)
+LOCAL_CACHE_TIMEOUT = getattr(settings, 'ENTITLEMENT_LOCAL_CACHE_TIMEOUT', 30)
+
+
+def cache_key(user_id):
+    return CACHE_KEY.format(user_id=user_id)
+
+
+def invalidate(user_id):
+    cache.delete(cache_key(user_id))
+
+
+def _load(user):
+    from batches.models import BatchEnrollment
+    from courses.models import Enrollment
+
+    now = timezone.now()
+    batch_ids = set(
+        BatchEnrollment.objects.filter(user=user, is_active=True).values_list('batch_id', flat=True)
+    )
+
+    course_scopes = set()
+    next_expiry = None
+    for class_level, stream, expires_at in Enrollment.objects.filter(
+        user=user, payment_status='completed'
+    ).values_list('class_level', 'stream', 'expires_at'):
+        if expires_at and expires_at <= now:
+            continue
+        course_scopes.add((class_level, stream))
+        if expires_at and (next_expiry is None or expires_at < next_expiry):
+            next_expiry = expires_at
+
+    # Never serve an enrollment from cache past its expiry
+    timeout = CACHE_TIMEOUT if shared_cache.is_shared() else LOCAL_CACHE_TIMEOUT
+    if next_expiry:
+        timeout = max(1, min(timeout, int((next_expiry - now).total_seconds())))
+    return {'batch_ids': batch_ids, 'course_scopes': course_scopes}, timeout
+
+
+def get_entitlements(user):
+    """Return `{'batch_ids': set, 'course_scopes': set of (class_level, stream)}` for `user`."""
+    if not user.is_authenticated:
+        return {'batch_ids': set(), 'course_scopes': set()}
+
+    # Memoize on the user instance so repeated checks in one request skip the cache too
+    entitlements = getattr(user, '_entitlements', None)
+    if entitlements is None:
+        key = cache_key(user.pk)
+        entitlements = cache.get(key)
+        if entitlements is None:
+            entitlements, timeout = _load(user)
+            cache.set(key, entitlements, timeout)
+        user._entitlements = entitlements
+    return entitlements
+
+
+def has_access(user, obj):
+    """
+    Return True if `user` may access `obj`: a batch, batch content, or course
+    content. Teachers and admins may access everything.
+    """
+    from batches.models import Batch, BatchSubject, Lecture as BatchLecture, DPP, DPPSolution
+    from courses.models import Subject, Lecture as CourseLecture
+
+    if not user.is_authenticated:
+        return False
+    if user.is_teacher or user.is_admin:
+        return True
+
+    entitlements = get_entitlements(user)
+    if isinstance(obj, Batch):
+        return obj.pk in entitlements['batch_ids']
+    if isinstance(obj, BatchSubject):
+        return obj.batch_id in entitlements['batch_ids']
+    if isinstance(obj, BatchLecture):
+        return obj.subject.batch_id in entitlements['batch_ids']
+    if isinstance(obj, DPP):
+        return obj.lecture.subject.batch_id in entitlements['batch_ids']
+    if isinstance(obj, DPPSolution):
+        return obj.dpp.lecture.subject.batch_id in entitlements['batch_ids']
+
+    if isinstance(obj, CourseLecture):
+        if obj.is_free:
+            return True
+        obj = obj.chapter.subject
+    if isinstance(obj, Subject):
+        return (obj.class_level, obj.stream) in entitlements['course_scopes']
+
+    raise TypeError(f"Unsupported entitlement object: {type(obj).__name__}")
+
+
+class EntitlementRequiredMixin:
+    """
+    For detail views of paid content: send users without access to
+    `denied_url_name`, reversed with the object's `denied_url_arg` attribute
+    (dotted for related objects), with `denied_message` instead of rendering
+    the page.
+    """
+    denied_url_name = 'batches:detail'
+    denied_url_arg = None
+    denied_message = 'You need to enroll in this batch to access content.'
+
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
+        self.object = self.get_object()
+        if not has_access(request.user, self.object):
+            messages.error(request, self.denied_message)
+            return redirect(self.denied_url_name, attrgetter(self.denied_url_arg)(self.object))
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_object(self, queryset=None):
+        # Fetched once in dispatch; DetailView.get asks again
+        if getattr(self, 'object', None) is None:
+            self.object = super().get_object(queryset)
+        return self.object
@@ -0,0 +1,64 @@
+import time
+from django.core.management.base import BaseCommand
+from accounts import notifications
+from accounts.models import Notification, Role, User
+from batches.models import Batch, BatchEnrollment, Category
+
+PREFIX = 'notify-bench-'
+
+
+class Command(BaseCommand):
+    help = 'Time a notification fan-out to every student of a synthetic batch (rows are removed afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=200000, help='Synthetic students enrolled in the batch')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows inserted per query while seeding')
+        parser.add_argument('--keep', action='store_true', help='Keep the synthetic rows')
+
+    def seed(self, students, batch_size):
+        role, _ = Role.objects.get_or_create(name='student')
+        category = Category.objects.create(name=f'{PREFIX}category')
+        batch = Batch.objects.create(name=f'{PREFIX}batch', category=category)
+        for start in range(0, students, batch_size):
+            users = User.objects.bulk_create([
+                User(username=f'{PREFIX}{i}', email=f'{PREFIX}{i}@example.com', password='!', role=role)
+                for i in range(start, min(start + batch_size, students))
+            ])
+            BatchEnrollment.objects.bulk_create([BatchEnrollment(user=user, batch=batch) for user in users])
+        return batch
+
+    def cleanup(self):
+        users = User.objects.filter(username__startswith=PREFIX)
+        Notification.objects.filter(user__in=users).delete()
+        BatchEnrollment.objects.filter(user__in=users).delete()
+        users.delete()
+        Category.objects.filter(name=f'{PREFIX}category').delete()
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Enrolling {options['students']} synthetic students...")
+        started = time.perf_counter()
+        batch = self.seed(options['students'], options['batch_size'])
+        self.stdout.write(f"Seeded in {time.perf_counter() - started:.1f}s")
+
+        try:
+            started = time.perf_counter()
+            sent = notifications.fan_out(
+                notifications.audience(batch=batch), 'Benchmark', 'A new lecture is up.', notification_type='lecture'
+            )
+            elapsed = time.perf_counter() - started
+            chunks = -(-sent // notifications.CHUNK_SIZE)
+            self.stdout.write(
+                f"Fan-out to {sent} students: {elapsed:.1f}s ({sent / elapsed:,.0f}/s), "
+                f"{chunks} transactions of {notifications.CHUNK_SIZE} averaging {elapsed / max(1, chunks) * 1000:.0f}ms"
+            )
+
+            user = User.objects.filter(username__startswith=PREFIX).first()
+            started = time.perf_counter()
+            notifications.mark_all_read(user)
+            self.stdout.write(self.style.SUCCESS(
+                f"Mark all read: {(time.perf_counter() - started) * 1000:.1f}ms, "
+                f"counter now {User.objects.get(pk=user.pk).unread_notifications}"
+            ))
+        finally:
+            if not options['keep']:
+                self.cleanup()
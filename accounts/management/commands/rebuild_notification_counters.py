@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from accounts import notifications
+from accounts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Recount every user\'s unread notification counter from their notifications'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Number of users updated per statement')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        updated = 0
+        last_pk = 0
+        while True:
+            pks = list(User.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            last_pk = pks[-1]
+            updated += notifications.rebuild_unread_counts(User.objects.filter(pk__in=pks))
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt unread counters for {updated} users'))
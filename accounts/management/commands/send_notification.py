@@ -0,0 +1,33 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from accounts import notifications
+from accounts.models import Notification, Role, User
+
+
+class Command(BaseCommand):
+    help = 'Send a notification to every active user matching the given batch, class, stream and role'
+
+    def add_arguments(self, parser):
+        parser.add_argument('title')
+        parser.add_argument('message')
+        parser.add_argument('--batch', type=int, help='Students enrolled in this batch id')
+        parser.add_argument('--class-level', choices=[choice for choice, _ in User.CLASS_CHOICES])
+        parser.add_argument('--stream', choices=[choice for choice, _ in User.STREAM_CHOICES])
+        parser.add_argument('--role', choices=[choice for choice, _ in Role.ROLE_CHOICES])
+        parser.add_argument('--type', default='general',
+                            choices=[choice for choice, _ in Notification.NOTIFICATION_TYPES])
+        parser.add_argument('--link', default='', help='Path the notification opens')
+
+    def handle(self, *args, **options):
+        if not any(options[name] for name in ('batch', 'class_level', 'stream', 'role')):
+            raise CommandError('Give at least one of --batch, --class-level, --stream or --role')
+
+        users = notifications.audience(
+            batch=options['batch'], class_level=options['class_level'],
+            stream=options['stream'], role=options['role'],
+        )
+        started = time.perf_counter()
+        sent = notifications.fan_out(
+            users, options['title'], options['message'], notification_type=options['type'], link=options['link']
+        )
+        self.stdout.write(self.style.SUCCESS(f'Sent to {sent} users in {time.perf_counter() - started:.1f}s'))
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_alter_role_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='link',
+            field=models.CharField(blank=True, max_length=300),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='unread_notifications',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('general', 'General'), ('doubt', 'Doubt'), ('quiz', 'Quiz'), ('payment', 'Payment'), ('lecture', 'Lecture'), ('dpp', 'DPP')], default='general', max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read', 'created_at'], name='notification_user_unread_idx'),
+        ),
+    ]
@@ -1,3 +1,5 @@
+import time
+
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.utils import timezone
@@ -13,8 +15,29 @@ class Role(models.Model):
     name = models.CharField(max_length=64, unique=True, choices=ROLE_CHOICES)
     description = models.CharField(max_length=255, blank=True)
     
+    # id -> name for the whole (tiny) table, shared by every request in the
+    # process. Cleared on Role changes; the TTL bounds staleness across processes.
+    NAMES_TTL = 300
+    _names = None
+    _names_loaded_at = 0.0
+    
     def __str__(self):
         return self.get_name_display()
+    
+    @classmethod
+    def name_for(cls, role_id):
+        """Role name for `role_id` without a query once the table is cached."""
+        if role_id is None:
+            return None
+        names = cls._names
+        if names is None or role_id not in names or time.monotonic() - cls._names_loaded_at > cls.NAMES_TTL:
+            names = cls._names = dict(cls.objects.values_list('id', 'name'))
+            cls._names_loaded_at = time.monotonic()
+        return names.get(role_id)
+    
+    @classmethod
+    def clear_name_cache(cls):
+        cls._names = None
 
 class User(AbstractUser):
     CLASS_CHOICES = [
@@ -37,6 +60,8 @@ class User(AbstractUser):
     role = models.ForeignKey(Role, on_delete=models.CASCADE, null=True, blank=True)
     is_active = models.BooleanField(default=True)
     last_login = models.DateTimeField(null=True, blank=True)
+    # Denormalised for the navbar badge; maintained by accounts.notifications
+    unread_notifications = models.PositiveIntegerField(default=0, editable=False)
     
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
@@ -47,21 +72,25 @@ class User(AbstractUser):
     def get_full_name(self):
         return f"{self.first_name} {self.last_name}".strip() or self.username
     
+    @property
+    def role_name(self):
+        return Role.name_for(self.role_id)
+    
     @property
     def is_admin(self):
-        return self.role and self.role.name == 'admin'
+        return self.role_name == 'admin'
     
     @property
     def is_teacher(self):
-        return self.role and self.role.name == 'teacher'
+        return self.role_name == 'teacher'
     
     @property
     def is_student(self):
-        return self.role and self.role.name == 'student'
+        return self.role_name == 'student'
     
     @property
     def is_sales_executive(self):
-        return self.role and self.role.name == 'sales_executive'
+        return self.role_name == 'sales_executive'
 
 class Notification(models.Model):
     NOTIFICATION_TYPES = [
@@ -69,17 +98,24 @@ class Notification(models.Model):
         ('doubt', 'Doubt'),
         ('quiz', 'Quiz'),
         ('payment', 'Payment'),
+        ('lecture', 'Lecture'),
+        ('dpp', 'DPP'),
     ]
     
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
     title = models.CharField(max_length=200)
     message = models.TextField()
+    link = models.CharField(max_length=300, blank=True)
     is_read = models.BooleanField(default=False)
     notification_type = models.CharField(max_length=50, choices=NOTIFICATION_TYPES, default='general')
     created_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # A user's newest notifications, and their unread ones for mark-all-read
+            models.Index(fields=['user', 'is_read', 'created_at'], name='notification_user_unread_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.user.username}"
\ No newline at end of file
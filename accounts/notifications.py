@@ -0,0 +1,136 @@
+"""
+Notification fan-out.
+
+An audience is a User queryset resolved entirely in SQL (batch enrollment,
+class level, stream, role). `fan_out` reads its ids once and sends to them
+CHUNK_SIZE at a time; each chunk is its own short transaction of one
+INSERT ... SELECT for the notifications and one UPDATE for those users' unread
+counters, so a fan-out to a few hundred thousand students never holds the
+database for longer than one chunk. `schedule` runs a fan-out on a background
+thread once the change that triggered it has committed.
+
+`User.unread_notifications` is what the navbar badge shows. Everything that
+creates or reads notifications goes through here (single notifications
+saved directly are counted by accounts.signals) so the counter stays exact;
+deleting notifications does not adjust it, and
+`manage.py rebuild_notification_counters` recounts from the rows.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Notification, User
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = getattr(settings, 'NOTIFICATION_CHUNK_SIZE', 2000)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # One fan-out at a time keeps a burst of announcements from
+            # competing for the database with each other
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='notifications')
+        return _executor
+
+
+def audience(batch=None, class_level=None, stream=None, role=None):
+    """
+    Active users matching every given filter. `batch` is anything the ORM
+    accepts for a Batch foreign key, including a subquery of batch ids.
+    """
+    users = User.objects.filter(is_active=True)
+    if batch is not None:
+        users = users.filter(batch_enrollments__batch=batch, batch_enrollments__is_active=True)
+    if class_level:
+        users = users.filter(class_level=class_level)
+    if stream:
+        users = users.filter(stream=stream)
+    if role:
+        users = users.filter(role__name=role)
+    return users
+
+
+def _insert(user_ids, **values):
+    """One notification per user in `user_ids`, built by the database with INSERT ... SELECT."""
+    fields = [Notification._meta.get_field(name) for name in values]
+    rows = User.objects.filter(pk__in=user_ids).order_by().annotate(**{
+        f'notification_{field.name}': Value(values[field.name], output_field=field) for field in fields
+    }).values_list('pk', *(f'notification_{field.name}' for field in fields))
+    select, params = rows.query.sql_with_params()
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(field.column) for field in [Notification._meta.get_field('user'), *fields])
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {quote(Notification._meta.db_table)} ({columns}) {select}', params)
+
+
+def fan_out(users, title, message, notification_type='general', link=''):
+    """Send one notification to every user in `users`. Returns the number sent."""
+    # Resolved once: re-running a join per chunk would rescan the whole audience each time
+    user_ids = sorted(users.order_by().values_list('pk', flat=True).distinct())
+    for start in range(0, len(user_ids), CHUNK_SIZE):
+        chunk = user_ids[start:start + CHUNK_SIZE]
+        with transaction.atomic():
+            _insert(chunk, title=title, message=message, notification_type=notification_type, link=link,
+                    is_read=False, created_at=timezone.now())
+            User.objects.filter(pk__in=chunk).update(unread_notifications=F('unread_notifications') + 1)
+    return len(user_ids)
+
+
+def _run(users, notification):
+    try:
+        sent = fan_out(users, **notification)
+        logger.info('Sent "%s" to %d users', notification['title'], sent)
+    except Exception:
+        logger.exception('Could not send notification "%s"', notification['title'])
+    finally:
+        # The worker thread holds its own connection
+        connection.close()
+
+
+def schedule(users, title, message, notification_type='general', link=''):
+    """Fan out on the worker thread once the current transaction commits."""
+    notification = {'title': title, 'message': message, 'notification_type': notification_type, 'link': link}
+    transaction.on_commit(lambda: _get_executor().submit(_run, users, notification))
+
+
+def mark_read(user, notification_id):
+    """Mark one of `user`'s notifications read. Returns the notification, or None if it is not theirs."""
+    notification = Notification.objects.filter(pk=notification_id, user=user).first()
+    if notification is None:
+        return None
+    with transaction.atomic():
+        # Conditional, so two clicks on the same notification only count once
+        if Notification.objects.filter(pk=notification.pk, is_read=False).update(is_read=True):
+            User.objects.filter(pk=user.pk).update(unread_notifications=Greatest(F('unread_notifications') - 1, 0))
+    return notification
+
+
+def mark_all_read(user):
+    """Mark every unread notification of `user` read. Returns how many changed."""
+    with transaction.atomic():
+        updated = Notification.objects.filter(user=user, is_read=False).update(is_read=True)
+        # Subtract rather than zero, so a chunk of a fan-out committed between
+        # the two statements stays counted
+        User.objects.filter(pk=user.pk).update(
+            unread_notifications=Greatest(F('unread_notifications') - updated, 0)
+        )
+    return updated
+
+
+def rebuild_unread_counts(users):
+    """Recount `unread_notifications` for `users` from their notification rows. Returns the number updated."""
+    unread = Notification.objects.filter(user=OuterRef('pk'), is_read=False).order_by().values('user').annotate(
+        total=Count('pk')
+    ).values('total')
+    return users.update(unread_notifications=Coalesce(Subquery(unread), 0))
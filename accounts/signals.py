@@ -0,0 +1,73 @@
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.urls import reverse
+from batches.models import BatchEnrollment, BatchSubject, Order, Lecture as BatchLecture, DPP
+from courses.models import Enrollment, Progress
+from doubts.models import Doubt
+from quizzes.models import QuizAttempt
+from .models import Notification, Role, User
+from . import dashboards, entitlements, notifications
+
+
+@receiver(post_save, sender=BatchEnrollment)
+@receiver(post_delete, sender=BatchEnrollment)
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def invalidate_entitlements(sender, instance, **kwargs):
+    entitlements.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=QuizAttempt)
+@receiver(post_delete, sender=QuizAttempt)
+@receiver(post_save, sender=Progress)
+@receiver(post_delete, sender=Progress)
+def invalidate_dashboard(sender, instance, **kwargs):
+    dashboards.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=Doubt)
+@receiver(post_delete, sender=Doubt)
+def invalidate_doubt_dashboards(sender, instance, **kwargs):
+    dashboards.invalidate(instance.user_id, instance.teacher_id)
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def clear_role_names(sender, **kwargs):
+    Role.clear_name_cache()
+
+
+@receiver(post_save, sender=Notification)
+def count_new_notification(sender, instance, created, raw=False, **kwargs):
+    # Fan-outs bulk-insert and count their own; this covers one-off notifications
+    if created and not raw and not instance.is_read:
+        User.objects.filter(pk=instance.user_id).update(unread_notifications=F('unread_notifications') + 1)
+
+
+@receiver(post_save, sender=BatchLecture)
+def announce_batch_lecture(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.is_active:
+        batch = BatchSubject.objects.filter(pk=instance.subject_id).values('batch')[:1]
+        notifications.schedule(
+            notifications.audience(batch=batch),
+            title=f'New lecture: {instance.topic_name}',
+            message=f'Day {instance.day_number} is now available in your batch.',
+            notification_type='lecture',
+            link=reverse('batches:lecture_detail', args=[instance.pk]),
+        )
+
+
+@receiver(post_save, sender=DPP)
+def announce_dpp(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.is_active:
+        batch = BatchLecture.objects.filter(pk=instance.lecture_id).values('subject__batch')[:1]
+        notifications.schedule(
+            notifications.audience(batch=batch),
+            title=f'New DPP: {instance.title}',
+            message='A new daily practice problem set is up in your batch.',
+            notification_type='dpp',
+            link=reverse('batches:dpp_detail', args=[instance.pk]),
+        )
@@ -1,3 +1,136 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+
+from courses.models import Chapter, Enrollment, Lecture, Progress, Subject, SubjectProgress
+from doubts.models import Doubt
+from main.testing import AppTestCase, QueryBudgetMixin, make_user
+from quizzes.models import Quiz, QuizAttempt
+from . import dashboards, entitlements
+from .forms import ProfileForm
+from .models import Notification, Role, User
+from .views import DashboardView
+
+
+class EntitlementCacheTests(AppTestCase):
+    def cached_timeout(self):
+        with mock.patch.object(entitlements.cache, 'set', wraps=entitlements.cache.set) as cache_set:
+            entitlements.get_entitlements(User.objects.get(pk=self.student.pk))
+        key, value, timeout = cache_set.call_args.args
+        return timeout
+
+    def test_process_local_cache_keeps_entries_briefly(self):
+        # Other workers never see an invalidation in LocMemCache
+        self.assertLessEqual(self.cached_timeout(), entitlements.LOCAL_CACHE_TIMEOUT)
+
+    def test_course_enrollment_expiry_caps_the_timeout(self):
+        Enrollment.objects.create(user=self.student, course_type='basic', class_level='11th', stream='JEE',
+                                  payment_status='completed', expires_at=timezone.now() + timedelta(seconds=5))
+        self.assertLessEqual(self.cached_timeout(), 5)
+        self.assertEqual(
+            entitlements.get_entitlements(User.objects.get(pk=self.student.pk))['course_scopes'], {('11th', 'JEE')}
+        )
+
+
+class DashboardQueryBudgetTests(QueryBudgetMixin, AppTestCase):
+    # A cached dashboard only looks up the session and the user
+    CACHED_BUDGET = 2
+
+    def setUp(self):
+        super().setUp()
+        self.roles = {name: Role.objects.get_or_create(name=name)[0] for name in ('student', 'teacher', 'admin')}
+        self.subject = Subject.objects.create(name='Physics', class_level='11th', stream='JEE')
+        self.quiz = Quiz.objects.create(
+            title='Kinematics quiz', chapter=Chapter.objects.create(name='Kinematics', subject=self.subject)
+        )
+
+    def add_doubts(self, student, count, **fields):
+        Doubt.objects.bulk_create(
+            Doubt(title=f'Doubt {number}', description='Why?', user=student, **fields) for number in range(count)
+        )
+
+    def assertDashboardWithinBudget(self, user, grow):
+        """Check the cold and the cached dashboard of `user` as `grow(size)` adds data."""
+        self.client.force_login(user)
+        # Role names stay cached between requests; the budgets are for a warm process
+        user.role_name
+        budget = DashboardView.query_budgets[user.role_name]
+        url = reverse('accounts:dashboard')
+        for size in (10, 100, 1000):
+            grow(size)
+            cache.delete_many([dashboards.cache_key(user.pk), dashboards.ADMIN_CACHE_KEY])
+            with self.subTest(size=size, cache='cold'):
+                self.assertWithinQueryBudget(budget, url)
+            with self.subTest(size=size, cache='warm'):
+                self.assertWithinQueryBudget(self.CACHED_BUDGET, url)
+
+    def test_student_dashboard_stays_within_budget(self):
+        student = self.student
+
+        def grow(size):
+            chapter = Chapter.objects.create(name=f'Chapter {size}', subject=self.subject, order_index=size)
+            lectures = Lecture.objects.bulk_create(
+                Lecture(title=f'Lecture {number}', chapter=chapter) for number in range(size)
+            )
+            Progress.objects.bulk_create(
+                Progress(user=student, lecture=lecture, is_completed=True) for lecture in lectures
+            )
+            SubjectProgress.rebuild_for_users([student.pk])
+            QuizAttempt.objects.bulk_create(QuizAttempt(user=student, quiz=self.quiz) for _ in range(size))
+            self.add_doubts(student, size)
+
+        self.assertDashboardWithinBudget(student, grow)
+
+    def test_teacher_dashboard_stays_within_budget(self):
+        teacher = make_user('teacher', 'teacher')
+        student = self.student
+
+        def grow(size):
+            self.add_doubts(student, size)
+            self.add_doubts(student, size, status='in_progress', teacher=teacher)
+            self.add_doubts(student, size, status='resolved', teacher=teacher)
+
+        self.assertDashboardWithinBudget(teacher, grow)
+
+    def test_admin_dashboard_stays_within_budget(self):
+        admin = make_user('admin', 'admin')
+
+        def grow(size):
+            start = User.objects.count()
+            students = User.objects.bulk_create(
+                User(username=f'user{number}', email=f'user{number}@example.com', role=self.roles['student'])
+                for number in range(start, start + size)
+            )
+            for student in students[:10]:
+                self.add_doubts(student, size // 10)
+
+        self.assertDashboardWithinBudget(admin, grow)
+
+
+class UnreadCounterTests(AppTestCase):
+    def notify(self):
+        Notification.objects.create(user=self.student, title='New lecture', message='Vectors is up')
+
+    def unread(self):
+        return User.objects.get(pk=self.student.pk).unread_notifications
+
+    def test_profile_update_keeps_the_counter(self):
+        self.client.force_login(self.student)
+        clean = ProfileForm.clean
+
+        def notify_then_clean(form):
+            # Counted after the request loaded its user
+            self.notify()
+            return clean(form)
+
+        with mock.patch.object(ProfileForm, 'clean', notify_then_clean):
+            response = self.client.post(reverse('accounts:profile'), {
+                'first_name': 'Asha', 'last_name': 'Rao', 'email': 'student@example.com', 'phone': '',
+                'class_level': '11th', 'stream': 'JEE',
+            })
+        self.assertRedirects(response, reverse('accounts:profile'))
+        self.assertEqual(self.unread(), 1)
+        self.assertEqual(User.objects.get(pk=self.student.pk).get_full_name(), 'Asha Rao')
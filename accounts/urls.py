@@ -10,6 +10,10 @@ urlpatterns = [
     path('register/', views.RegisterView.as_view(), name='register'),
     path('profile/', views.ProfileView.as_view(), name='profile'),
     path('dashboard/', views.DashboardView.as_view(), name='dashboard'),
+    path('notifications/', views.NotificationListView.as_view(), name='notifications'),
+    path('notifications/<int:notification_id>/read/', views.MarkNotificationReadView.as_view(),
+         name='notification_read'),
+    path('notifications/read-all/', views.MarkAllNotificationsReadView.as_view(), name='notifications_read_all'),
     
     # Password reset URLs
     path('password-reset/', auth_views.PasswordResetView.as_view(
@@ -4,14 +4,13 @@ from django.contrib.auth.views import LoginView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.views.generic import CreateView, UpdateView, TemplateView
+from django.views import View
+from django.views.generic import CreateView, UpdateView, TemplateView, ListView
 from django.urls import reverse_lazy
-from django.db.models import Count, Q
+from django.utils.http import url_has_allowed_host_and_scheme
 from .forms import UserRegistrationForm, CustomLoginForm, ProfileForm
-from .models import User, Role
-from courses.models import Progress, Enrollment
-from quizzes.models import QuizAttempt
-from doubts.models import Doubt
+from .models import User, Role, Notification
+from . import dashboards, notifications
 
 class CustomLoginView(LoginView):
     form_class = CustomLoginForm
@@ -39,7 +38,7 @@ class RegisterView(CreateView):
         try:
             student_role = Role.objects.get(name='student')
             self.object.role = student_role
-            self.object.save()
+            self.object.save(update_fields=['role'])
         except Role.DoesNotExist:
             pass
         
@@ -56,44 +55,46 @@ class ProfileView(LoginRequiredMixin, UpdateView):
         return self.request.user
     
     def form_valid(self, form):
+        # request.user was loaded before any notification counted since, so
+        # only write back what the form edits, not a stale unread_notifications
+        self.object = form.save(commit=False)
+        self.object.save(update_fields=form._meta.fields)
         messages.success(self.request, 'Profile updated successfully!')
-        return super().form_valid(form)
+        return redirect(self.get_success_url())
 
 class DashboardView(LoginRequiredMixin, TemplateView):
     template_name = 'accounts/dashboard.html'
+    # Per role, including the session and user lookups every logged-in page
+    # pays; a cached dashboard runs only those
+    query_budgets = {'student': 5, 'teacher': 3, 'admin': 4}
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        user = self.request.user
-        
-        if user.is_student:
-            # Student dashboard data
-            context.update({
-                'total_lectures': Progress.objects.filter(user=user).count(),
-                'completed_lectures': Progress.objects.filter(user=user, is_completed=True).count(),
-                'quiz_attempts': QuizAttempt.objects.filter(user=user).count(),
-                'pending_doubts': Doubt.objects.filter(user=user, status='submitted').count(),
-                'recent_attempts': QuizAttempt.objects.filter(user=user).order_by('-started_at')[:5],
-                'recent_doubts': Doubt.objects.filter(user=user).order_by('-created_at')[:5],
-                'enrollments': Enrollment.objects.filter(user=user, payment_status='completed'),
-            })
-        elif user.is_teacher:
-            # Teacher dashboard data
-            context.update({
-                'assigned_doubts': Doubt.objects.filter(teacher=user, status='in_progress').count(),
-                'resolved_doubts': Doubt.objects.filter(teacher=user, status='resolved').count(),
-                'pending_assignments': Doubt.objects.filter(status='submitted').count(),
-                'recent_doubts': Doubt.objects.filter(teacher=user).order_by('-created_at')[:5],
-            })
-        elif user.is_admin:
-            # Admin dashboard data
-            context.update({
-                'total_users': User.objects.count(),
-                'total_students': User.objects.filter(role__name='student').count(),
-                'total_teachers': User.objects.filter(role__name='teacher').count(),
-                'total_doubts': Doubt.objects.count(),
-                'pending_doubts': Doubt.objects.filter(status='submitted').count(),
-                'recent_registrations': User.objects.order_by('-date_joined')[:5],
-            })
-        
-        return context
\ No newline at end of file
+        context.update(dashboards.get_dashboard(self.request.user))
+        return context
+
+class NotificationListView(LoginRequiredMixin, ListView):
+    template_name = 'accounts/notifications.html'
+    context_object_name = 'notifications'
+    paginate_by = 20
+    
+    def get_queryset(self):
+        return Notification.objects.filter(user=self.request.user).order_by('-created_at', '-id')
+
+class MarkNotificationReadView(LoginRequiredMixin, View):
+    """Mark a notification read and follow its link."""
+    
+    def post(self, request, notification_id):
+        notification = notifications.mark_read(request.user, notification_id)
+        if notification and notification.link and url_has_allowed_host_and_scheme(
+            notification.link, allowed_hosts={request.get_host()}
+        ):
+            return redirect(notification.link)
+        return redirect('accounts:notifications')
+
+class MarkAllNotificationsReadView(LoginRequiredMixin, View):
+    def post(self, request):
+        updated = notifications.mark_all_read(request.user)
+        if updated:
+            messages.success(request, f'Marked {updated} notification{"s" if updated != 1 else ""} as read.')
+        return redirect('accounts:notifications')
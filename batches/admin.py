@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import (Category, Batch, BatchSubject, Lecture, DPP, DPPQuestion, 
+from quizzes.admin import ItemStatisticsAdmin
+from .models import (Category, Batch, BatchSubject, Lecture, DPP, DPPQuestion, DPPQuestionStats,
                      DPPSolution, DPPAttempt, Comment, BatchEnrollment, Order)
 
 @admin.register(Category)
@@ -61,6 +62,11 @@ class DPPQuestionAdmin(admin.ModelAdmin):
     list_filter = ['question_type', 'dpp__lecture__subject__batch']
     search_fields = ['question_text']
 
+@admin.register(DPPQuestionStats)
+class DPPQuestionStatsAdmin(ItemStatisticsAdmin):
+    list_filter = ['question__question_type', 'question__dpp__lecture__subject__batch']
+    search_fields = ['question__question_text', 'question__dpp__title']
+
 @admin.register(DPPSolution)
 class DPPSolutionAdmin(admin.ModelAdmin):
     list_display = ['dpp', 'video_type', 'created_at']
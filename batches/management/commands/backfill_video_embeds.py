@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from batches.models import Lecture, DPPSolution
+from batches import video
+
+class Command(BaseCommand):
+    help = 'Resolve and store embed URLs for existing lectures and DPP solutions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Number of rows updated per query')
+
+    def handle(self, *args, **options):
+        for model in (Lecture, DPPSolution):
+            updated = video.backfill(model, options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Updated {updated} {model._meta.verbose_name_plural}'))
@@ -0,0 +1,42 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from batches import exports
+
+class Command(BaseCommand):
+    help = 'Stream orders or batch enrollments to a CSV or JSON Lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(exports.EXPORTS), help='What to export')
+        parser.add_argument('--format', choices=sorted(exports.FORMATS), default='csv', help='Output format')
+        parser.add_argument('--gzip', action='store_true', help='Gzip the output')
+        parser.add_argument('--start', help='Only rows on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--end', help='Only rows on or before this date (YYYY-MM-DD)')
+        parser.add_argument('--status', help='Only rows with this status')
+        parser.add_argument('--chunk-size', type=int, default=exports.CHUNK_SIZE, help='Rows fetched per database round trip')
+        parser.add_argument('-o', '--output', help='File to write; defaults to stdout')
+
+    def handle(self, *args, **options):
+        try:
+            filters = exports.parse_filters(exports.EXPORTS[options['kind']], options)
+        except ValueError as e:
+            raise CommandError(str(e))
+        
+        chunks = exports.stream(
+            options['kind'], options['format'], compress=options['gzip'],
+            chunk_size=options['chunk_size'], **filters
+        )
+        
+        written = 0
+        out = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+                written += len(chunk)
+        finally:
+            if options['output']:
+                out.close()
+            else:
+                out.flush()
+        
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f"Wrote {written} bytes to {options['output']}"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from batches.models import Comment
+
+class Command(BaseCommand):
+    help = 'Rebuild stored comment like/dislike counters from the M2M tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Number of comments updated per statement')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        updated = 0
+        last_pk = 0
+        while True:
+            pks = list(
+                Comment.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            last_pk = pks[-1]
+            updated += Comment.rebuild_counters(Comment.objects.filter(pk__in=pks))
+        
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt counters for {updated} comments'))
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:32
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_counters(apps, schema_editor):
+    Comment = apps.get_model('batches', 'Comment')
+
+    def count_of(through):
+        return Coalesce(Subquery(
+            through.objects.filter(comment_id=OuterRef('pk'))
+            .values('comment_id').annotate(total=Count('id')).values('total')
+        ), 0)
+
+    Comment.objects.update(
+        likes_count=count_of(Comment.likes.through),
+        dislikes_count=count_of(Comment.dislikes.through),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('batches', '0004_order_discount_amount_order_original_amount_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='dislikes_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
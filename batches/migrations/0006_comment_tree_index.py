@@ -0,0 +1,78 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+CHUNK_SIZE = 1000
+PATH_SEGMENT_WIDTH = 10
+
+
+def build_tree_index(apps, schema_editor):
+    Comment = apps.get_model('batches', 'Comment')
+
+    last_pk = 0
+    while True:
+        comments = list(
+            Comment.objects.filter(pk__gt=last_pk).order_by('pk').only('id', 'parent_id')[:CHUNK_SIZE]
+        )
+        if not comments:
+            break
+        last_pk = comments[-1].pk
+
+        # Parents are always created before their replies, so they either appear
+        # earlier in this chunk or were indexed by a previous one
+        known = {
+            parent.pk: parent for parent in Comment.objects.filter(
+                pk__in={c.parent_id for c in comments if c.parent_id and c.parent_id < comments[0].pk}
+            ).only('id', 'root_id', 'depth', 'path')
+        }
+        for comment in comments:
+            segment = str(comment.pk).zfill(PATH_SEGMENT_WIDTH)
+            parent = known.get(comment.parent_id)
+            if parent is None:
+                comment.path = segment
+                comment.depth = 0
+                comment.root_id = comment.pk
+            else:
+                comment.path = f"{parent.path}/{segment}"
+                comment.depth = parent.depth + 1
+                comment.root_id = parent.root_id
+            known[comment.pk] = comment
+
+        Comment.objects.bulk_update(comments, ['path', 'depth', 'root_id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('batches', '0005_comment_likes_count_comment_dislikes_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='root',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='thread', to='batches.comment'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['content_type', 'object_id', 'depth', '-created_at', '-id'], name='comment_thread_page_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['root', 'path'], name='comment_tree_idx'),
+        ),
+        migrations.RunPython(build_tree_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('batches', '0006_comment_tree_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dppsolution',
+            name='embed_url',
+            field=models.URLField(blank=True, editable=False, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='dppsolution',
+            name='video_id',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='lecture',
+            name='embed_url',
+            field=models.URLField(blank=True, editable=False, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='lecture',
+            name='video_id',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+    ]
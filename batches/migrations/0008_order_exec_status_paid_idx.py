@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('batches', '0007_lecture_dppsolution_embed_url'),
+        ('referrals', '0002_auto_20250801_2043'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['sales_executive', 'payment_status', 'payment_date'], name='order_exec_status_paid_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:05
+
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('batches', '0008_order_exec_status_paid_idx'),
+        ('referrals', '0002_auto_20250801_2043'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_at'], name='order_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['payment_date'], name='order_paid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(django.db.models.functions.comparison.Coalesce('payment_date', 'created_at'), name='order_bucket_idx'),
+        ),
+    ]
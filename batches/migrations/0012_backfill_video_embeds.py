@@ -0,0 +1,19 @@
+from django.db import migrations
+
+from batches import video
+
+
+def backfill_video_embeds(apps, schema_editor):
+    for model_name in ('Lecture', 'DPPSolution'):
+        video.backfill(apps.get_model('batches', model_name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('batches', '0011_comment_hidden_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_video_embeds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:13
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def date_existing_orders(apps, schema_editor):
+    # Their last change is not known; dating them by their bucket keeps the
+    # first incremental rollup run from rescanning every order
+    Order = apps.get_model('batches', 'Order')
+    Order.objects.update(updated_at=Coalesce('payment_date', 'created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('batches', '0012_backfill_video_embeds'),
+        ('referrals', '0003_sales_daily_rollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(date_existing_orders, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['updated_at'], name='order_updated_idx'),
+        ),
+    ]
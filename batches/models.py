@@ -1,8 +1,13 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Coalesce, Concat, RowNumber
+from django.db.models.lookups import StartsWith
 from django.utils import timezone
 from django.contrib.auth import get_user_model
+import base64
+from datetime import datetime
 import uuid
-import re
+from quizzes.models import ItemStatistics
+from . import video
 
 User = get_user_model()
 
@@ -41,7 +46,31 @@ class BatchSubject(models.Model):
     def __str__(self):
         return f"{self.batch.name} - {self.name}"
 
-class Lecture(models.Model):
+class EmbeddableVideo(models.Model):
+    """Stores the resolved embed URL of a model's video source whenever it is saved."""
+    video_id = models.CharField(max_length=100, blank=True, editable=False)
+    embed_url = models.URLField(max_length=500, blank=True, editable=False)
+    
+    class Meta:
+        abstract = True
+    
+    def resolve_video(self):
+        self.video_id, self.embed_url = video.resolve(self.video_type, self.video_url)
+    
+    def save(self, *args, **kwargs):
+        self.resolve_video()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'video_type', 'video_url'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'video_id', 'embed_url'}
+        super().save(*args, **kwargs)
+    
+    def get_embed_url(self):
+        if not self.embed_url and self.video_url:
+            # Saved before embed URLs were stored and not backfilled yet
+            return video.resolve(self.video_type, self.video_url)[1] or None
+        return self.embed_url or None
+
+class Lecture(EmbeddableVideo):
     VIDEO_TYPES = [
         ('youtube', 'YouTube'),
         ('vimeo', 'Vimeo'),
@@ -73,44 +102,6 @@ class Lecture(models.Model):
     
     def __str__(self):
         return f"Day {self.day_number}: {self.topic_name}"
-    
-    def get_embed_url(self):
-        if self.video_type == 'youtube' and self.video_url:
-            video_id = self.extract_youtube_id(self.video_url)
-            return f"https://www.youtube.com/embed/{video_id}" if video_id else None
-        elif self.video_type == 'vimeo' and self.video_url:
-            video_id = self.extract_vimeo_id(self.video_url)
-            return f"https://player.vimeo.com/video/{video_id}" if video_id else None
-        elif self.video_type == 'drive' and self.video_url:
-            file_id = self.extract_drive_id(self.video_url)
-            return f"https://drive.google.com/file/d/{file_id}/preview" if file_id else None
-        return self.video_url
-    
-    def extract_youtube_id(self, url):
-        patterns = [
-            r'(?:youtube\.com\/watch\?v=|youtu\.be\/)([^&\n?#]+)',
-            r'youtube\.com\/embed\/([^&\n?#]+)'
-        ]
-        for pattern in patterns:
-            match = re.search(pattern, url)
-            if match:
-                return match.group(1)
-        return None
-    
-    def extract_vimeo_id(self, url):
-        match = re.search(r'vimeo\.com\/(\d+)', url)
-        return match.group(1) if match else None
-    
-    def extract_drive_id(self, url):
-        patterns = [
-            r'drive\.google\.com\/file\/d\/([a-zA-Z0-9_-]+)',
-            r'drive\.google\.com\/open\?id=([a-zA-Z0-9_-]+)'
-        ]
-        for pattern in patterns:
-            match = re.search(pattern, url)
-            if match:
-                return match.group(1)
-        return None
 
 class DPP(models.Model):
     lecture = models.OneToOneField(Lecture, on_delete=models.CASCADE, related_name='dpp')
@@ -152,7 +143,19 @@ class DPPQuestion(models.Model):
     def __str__(self):
         return f"Q{self.order_index}: {self.question_text[:50]}"
 
-class DPPSolution(models.Model):
+class DPPQuestionStats(ItemStatistics):
+    question = models.OneToOneField(DPPQuestion, on_delete=models.CASCADE, related_name='stats')
+    
+    class Meta:
+        verbose_name_plural = 'DPP question stats'
+    
+    def __str__(self):
+        return f"Stats - {self.question}"
+    
+    def get_key(self):
+        return self.question.correct_answer
+
+class DPPSolution(EmbeddableVideo):
     VIDEO_TYPES = [
         ('youtube', 'YouTube'),
         ('vimeo', 'Vimeo'),
@@ -175,44 +178,6 @@ class DPPSolution(models.Model):
     
     def __str__(self):
         return f"Solution - {self.dpp.title}"
-    
-    def get_embed_url(self):
-        if self.video_type == 'youtube' and self.video_url:
-            video_id = self.extract_youtube_id(self.video_url)
-            return f"https://www.youtube.com/embed/{video_id}" if video_id else None
-        elif self.video_type == 'vimeo' and self.video_url:
-            video_id = self.extract_vimeo_id(self.video_url)
-            return f"https://player.vimeo.com/video/{video_id}" if video_id else None
-        elif self.video_type == 'drive' and self.video_url:
-            file_id = self.extract_drive_id(self.video_url)
-            return f"https://drive.google.com/file/d/{file_id}/preview" if file_id else None
-        return self.video_url
-    
-    def extract_youtube_id(self, url):
-        patterns = [
-            r'(?:youtube\.com\/watch\?v=|youtu\.be\/)([^&\n?#]+)',
-            r'youtube\.com\/embed\/([^&\n?#]+)'
-        ]
-        for pattern in patterns:
-            match = re.search(pattern, url)
-            if match:
-                return match.group(1)
-        return None
-    
-    def extract_vimeo_id(self, url):
-        match = re.search(r'vimeo\.com\/(\d+)', url)
-        return match.group(1) if match else None
-    
-    def extract_drive_id(self, url):
-        patterns = [
-            r'drive\.google\.com\/file\/d\/([a-zA-Z0-9_-]+)',
-            r'drive\.google\.com\/open\?id=([a-zA-Z0-9_-]+)'
-        ]
-        for pattern in patterns:
-            match = re.search(pattern, url)
-            if match:
-                return match.group(1)
-        return None
 
 class DPPAttempt(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='dpp_attempts')
@@ -229,6 +194,74 @@ class DPPAttempt(models.Model):
     
     def __str__(self):
         return f"{self.user.username} - {self.dpp.title} - {self.score}/{self.total_marks}"
+    
+    @classmethod
+    def start(cls, user, dpp):
+        """Create an attempt and its blank answer sheet with a single bulk insert."""
+        with transaction.atomic():
+            attempt = cls.objects.create(
+                user=user,
+                dpp=dpp,
+                total_marks=dpp.total_marks,
+                started_at=timezone.now()
+            )
+            question_ids = dpp.questions.values_list('id', flat=True)
+            DPPAnswer.objects.bulk_create([
+                DPPAnswer(attempt=attempt, question_id=question_id)
+                for question_id in question_ids
+            ])
+        return attempt
+    
+    def submit(self, submitted_answers):
+        """
+        Grade a submission in memory and persist it in a constant number of queries.
+        
+        `submitted_answers` maps question ids to the selected answer. The attempt row
+        is locked for the duration of grading so a repeated POST cannot grade twice.
+        Returns False if the attempt had already been completed.
+        """
+        with transaction.atomic():
+            locked = DPPAttempt.objects.select_for_update().get(pk=self.pk)
+            if locked.completed_at:
+                self.refresh_from_db()
+                return False
+            
+            # One query loads the answer sheet together with its answer key
+            answers = list(
+                locked.answers.select_related('question').only(
+                    'id', 'attempt_id', 'question_id', 'selected_answer',
+                    'question__correct_answer', 'question__marks'
+                )
+            )
+            
+            total_score = 0
+            graded = []
+            for answer in answers:
+                selected_answer = submitted_answers.get(answer.question_id)
+                if not selected_answer:
+                    continue
+                answer.selected_answer = selected_answer
+                answer.grade()
+                total_score += answer.marks_obtained
+                graded.append(answer)
+            
+            if graded:
+                DPPAnswer.objects.bulk_update(graded, ['selected_answer', 'is_correct', 'marks_obtained'])
+            
+            locked.score = total_score
+            locked.completed_at = timezone.now()
+            if locked.total_marks > 0:
+                locked.percentage = (total_score / locked.total_marks) * 100
+            
+            time_taken = (locked.completed_at - locked.started_at).total_seconds() / 60
+            locked.time_taken_minutes = int(time_taken)
+            locked.save(update_fields=['score', 'completed_at', 'percentage', 'time_taken_minutes'])
+        
+        self.score = locked.score
+        self.completed_at = locked.completed_at
+        self.percentage = locked.percentage
+        self.time_taken_minutes = locked.time_taken_minutes
+        return True
 
 class DPPAnswer(models.Model):
     attempt = models.ForeignKey(DPPAttempt, on_delete=models.CASCADE, related_name='answers')
@@ -240,12 +273,102 @@ class DPPAnswer(models.Model):
     class Meta:
         unique_together = ['attempt', 'question']
     
+    def grade(self):
+        self.is_correct = self.selected_answer == self.question.correct_answer
+        self.marks_obtained = self.question.marks if self.is_correct else 0
+    
     def save(self, *args, **kwargs):
         if self.selected_answer:
-            self.is_correct = self.selected_answer == self.question.correct_answer
-            self.marks_obtained = self.question.marks if self.is_correct else 0
+            self.grade()
         super().save(*args, **kwargs)
 
+class CommentQuerySet(models.QuerySet):
+    PATH_SEGMENT_WIDTH = 10
+    
+    @staticmethod
+    def encode_cursor(comment):
+        raw = f"{comment.created_at.isoformat()}|{comment.pk}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+    
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            created_at, pk = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+            return datetime.fromisoformat(created_at), int(pk)
+        except (ValueError, UnicodeError):
+            return None
+    
+    def visible(self):
+        """Active comments none of whose ancestors has been deactivated."""
+        hidden_ancestors = self.model.objects.filter(
+            StartsWith(models.OuterRef('path'), Concat(models.F('path'), models.Value('/'))),
+            root_id=models.OuterRef('root_id'), is_active=False,
+        )
+        return self.filter(is_active=True).filter(~models.Exists(hidden_ancestors))
+    
+    def thread_page(self, content_type, object_id, cursor=None, limit=20, replies_per_thread=5):
+        """
+        Fetch one page of top-level comments, newest first, together with the first
+        `replies_per_thread` replies of each thread (in tree order) in a single query.
+        
+        Returns `(threads, next_cursor)`. Each thread is a root Comment carrying
+        `thread_replies` and `has_more_replies`; `next_cursor` is None on the last page.
+        """
+        roots = self.filter(content_type=content_type, object_id=object_id, depth=0, is_active=True)
+        position = self.decode_cursor(cursor) if cursor else None
+        if position:
+            created_at, pk = position
+            roots = roots.filter(
+                models.Q(created_at__lt=created_at) | models.Q(created_at=created_at, pk__lt=pk)
+            )
+        roots = roots.order_by('-created_at', '-id').values('id')[:limit + 1]
+        
+        rows = (
+            self.filter(root_id__in=models.Subquery(roots)).visible()
+            .annotate(thread_rank=models.Window(
+                RowNumber(), partition_by=[models.F('root_id')], order_by=models.F('path').asc()
+            ))
+            # Rank 1 is the root itself; fetch one reply beyond the preview to detect more
+            .filter(thread_rank__lte=replies_per_thread + 2)
+            .select_related('user')
+            .order_by('-root__created_at', '-root_id', 'path')
+        )
+        
+        threads = []
+        for comment in rows:
+            if comment.depth == 0:
+                comment.thread_replies = []
+                comment.has_more_replies = False
+                threads.append(comment)
+            elif threads and comment.root_id == threads[-1].pk:
+                thread = threads[-1]
+                if len(thread.thread_replies) < replies_per_thread:
+                    thread.thread_replies.append(comment)
+                else:
+                    thread.has_more_replies = True
+        
+        next_cursor = None
+        if len(threads) > limit:
+            threads = threads[:limit]
+            next_cursor = self.encode_cursor(threads[-1])
+        return threads, next_cursor
+    
+    def subtree_page(self, comment, after_path=None, limit=20):
+        """
+        Fetch the next `limit` descendants of `comment` in tree order, starting after
+        `after_path`. Returns `(replies, next_path)`.
+        """
+        replies = self.filter(root_id=comment.root_id, path__startswith=f"{comment.path}/").visible()
+        if after_path:
+            replies = replies.filter(path__gt=after_path)
+        replies = list(replies.select_related('user').order_by('path')[:limit + 1])
+        
+        next_path = None
+        if len(replies) > limit:
+            replies = replies[:limit]
+            next_path = replies[-1].path
+        return replies, next_path
+
 class Comment(models.Model):
     CONTENT_TYPES = [
         ('lecture', 'Lecture'),
@@ -258,26 +381,107 @@ class Comment(models.Model):
     
     text = models.TextField()
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
+    
+    # Tree index: the top-level comment of the thread, nesting depth, and the
+    # '/'-joined zero-padded ids from the root down to this comment
+    root = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True,
+                             related_name='thread', editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    path = models.CharField(max_length=500, blank=True, editable=False)
+    
     likes = models.ManyToManyField(User, blank=True, related_name='liked_comments')
     dislikes = models.ManyToManyField(User, blank=True, related_name='disliked_comments')
+    likes_count = models.PositiveIntegerField(default=0, editable=False)
+    dislikes_count = models.PositiveIntegerField(default=0, editable=False)
     
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
     
+    objects = CommentQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['content_type', 'object_id', 'depth', '-created_at', '-id'],
+                         name='comment_thread_page_idx'),
+            models.Index(fields=['root', 'path'], name='comment_tree_idx'),
+            # Deactivated comments only, for hiding their replies (see CommentQuerySet.visible)
+            models.Index(fields=['root', 'path'], condition=models.Q(is_active=False), name='comment_hidden_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username}: {self.text[:50]}"
     
-    @property
-    def likes_count(self):
-        return self.likes.count()
+    def get_content_object(self):
+        """The Lecture or DPPSolution this comment was posted on, or None if it no longer exists."""
+        if self.content_type == 'lecture':
+            return Lecture.objects.select_related('subject').filter(pk=self.object_id).first()
+        if self.content_type == 'solution':
+            return DPPSolution.objects.select_related('dpp__lecture__subject').filter(pk=self.object_id).first()
+        return None
     
-    @property
-    def dislikes_count(self):
-        return self.dislikes.count()
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        super().save(*args, **kwargs)
+        if is_new and not self.path:
+            segment = str(self.pk).zfill(CommentQuerySet.PATH_SEGMENT_WIDTH)
+            if self.parent_id:
+                parent = self.parent
+                self.path = f"{parent.path}/{segment}"
+                self.depth = parent.depth + 1
+                self.root_id = parent.root_id or parent.pk
+            else:
+                self.path = segment
+                self.depth = 0
+                self.root_id = self.pk
+            Comment.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth, root_id=self.root_id)
+    
+    def toggle_like(self, user):
+        """Toggle a like by `user`, clearing any dislike. Returns True if the comment is now liked."""
+        return self._toggle_reaction(user, Comment.likes.through, 'likes_count',
+                                     Comment.dislikes.through, 'dislikes_count')
+    
+    def toggle_dislike(self, user):
+        """Toggle a dislike by `user`, clearing any like. Returns True if the comment is now disliked."""
+        return self._toggle_reaction(user, Comment.dislikes.through, 'dislikes_count',
+                                     Comment.likes.through, 'likes_count')
+    
+    def _toggle_reaction(self, user, through, counter, opposite_through, opposite_counter):
+        membership = through.objects.filter(comment_id=self.pk, user_id=user.pk)
+        with transaction.atomic():
+            if membership.exists():
+                removed, _ = membership.delete()
+                if removed:
+                    Comment.objects.filter(pk=self.pk).update(**{counter: models.F(counter) - removed})
+                active = False
+            else:
+                _, created = through.objects.get_or_create(comment_id=self.pk, user_id=user.pk)
+                updates = {counter: models.F(counter) + 1} if created else {}
+                cleared, _ = opposite_through.objects.filter(comment_id=self.pk, user_id=user.pk).delete()
+                if cleared:
+                    updates[opposite_counter] = models.F(opposite_counter) - cleared
+                if updates:
+                    Comment.objects.filter(pk=self.pk).update(**updates)
+                active = True
+        self.refresh_from_db(fields=['likes_count', 'dislikes_count'])
+        return active
+    
+    @classmethod
+    def rebuild_counters(cls, queryset=None):
+        """Recompute the stored like/dislike counters from the M2M tables."""
+        if queryset is None:
+            queryset = cls.objects.all()
+        return queryset.update(
+            likes_count=Coalesce(models.Subquery(
+                cls.likes.through.objects.filter(comment_id=models.OuterRef('pk'))
+                .values('comment_id').annotate(total=models.Count('id')).values('total')
+            ), 0),
+            dislikes_count=Coalesce(models.Subquery(
+                cls.dislikes.through.objects.filter(comment_id=models.OuterRef('pk'))
+                .values('comment_id').annotate(total=models.Count('id')).values('total')
+            ), 0),
+        )
 
 class BatchEnrollment(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='batch_enrollments')
@@ -317,6 +521,18 @@ class Order(models.Model):
     payment_status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(default=timezone.now)
     payment_date = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['sales_executive', 'payment_status', 'payment_date'],
+                         name='order_exec_status_paid_idx'),
+            # Incremental scans and day rebuilds for referrals.SalesDailyRollup
+            models.Index(fields=['created_at'], name='order_created_idx'),
+            models.Index(fields=['payment_date'], name='order_paid_idx'),
+            models.Index(Coalesce('payment_date', 'created_at'), name='order_bucket_idx'),
+            models.Index(fields=['updated_at'], name='order_updated_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.order_id:
@@ -1,3 +1,205 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.urls import reverse
+
+from accounts import entitlements
+from main import events
+from main.testing import AppTestCase, QueryBudgetMixin, make_user
+from . import video
+from .models import (Batch, BatchEnrollment, BatchSubject, Category, Comment, DPP, DPPAttempt, DPPQuestion,
+                     DPPSolution, Lecture)
+from .views import MyBatchesView, StartDPPView, SubjectDetailView, TakeDPPView
+
+
+class BatchTestCase(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='JEE')
+        self.batch = Batch.objects.create(name='Arjuna', category=self.category, price=999)
+        self.subject = BatchSubject.objects.create(batch=self.batch, name='Physics')
+        self.lecture = Lecture.objects.create(subject=self.subject, day_number=1, topic_name='Vectors')
+
+    def enroll(self, user=None, batch=None):
+        return BatchEnrollment.objects.create(user=user or self.student, batch=batch or self.batch)
+
+
+class CommentRepliesTests(BatchTestCase):
+    def setUp(self):
+        super().setUp()
+        self.root = Comment.objects.create(user=self.student, content_type='lecture', object_id=self.lecture.pk,
+                                           text='Why is the dot product commutative?')
+        self.reply = Comment.objects.create(user=self.student, content_type='lecture', object_id=self.lecture.pk,
+                                            text='Because cos is even', parent=self.root)
+        self.nested = Comment.objects.create(user=self.student, content_type='lecture', object_id=self.lecture.pk,
+                                             text='Thanks', parent=self.reply)
+        self.url = reverse('batches:comment_replies', args=[self.root.pk])
+        self.client.force_login(self.student)
+
+    def reply_ids(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return [reply['id'] for reply in response.json()['replies']]
+
+    def test_replies_need_access_to_the_lecture(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.enroll()
+        self.assertEqual(self.reply_ids(), [self.reply.pk, self.nested.pk])
+
+    def test_replies_under_a_deactivated_reply_are_hidden(self):
+        self.enroll()
+        Comment.objects.filter(pk=self.reply.pk).update(is_active=False)
+        self.assertEqual(self.reply_ids(), [])
+
+        threads, _ = Comment.objects.thread_page('lecture', self.lecture.pk)
+        self.assertEqual([thread.thread_replies for thread in threads], [[]])
+        self.assertEqual(self.client.get(reverse('batches:comment_replies', args=[self.nested.pk])).status_code, 404)
+
+
+class BatchContentAccessTests(BatchTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dpp = DPP.objects.create(lecture=self.lecture, title='Vectors DPP')
+        self.solution = DPPSolution.objects.create(dpp=self.dpp)
+        self.client.force_login(self.student)
+        self.urls = [
+            reverse('batches:subject_detail', args=[self.subject.pk]),
+            reverse('batches:lecture_detail', args=[self.lecture.pk]),
+            reverse('batches:dpp_detail', args=[self.dpp.pk]),
+            reverse('batches:dpp_solution', args=[self.solution.pk]),
+        ]
+
+    def test_content_pages_need_an_enrollment(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertRedirects(self.client.get(url), reverse('batches:detail', args=[self.batch.pk]))
+        self.enroll()
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_teachers_and_admins_open_content_without_an_enrollment(self):
+        for role in ('teacher', 'admin'):
+            self.client.force_login(make_user(role, role))
+            for url in self.urls:
+                with self.subTest(role=role, url=url):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_starting_a_dpp_or_commenting_needs_an_enrollment(self):
+        response = self.client.post(reverse('batches:start_dpp', args=[self.dpp.pk]))
+        self.assertRedirects(response, reverse('batches:detail', args=[self.batch.pk]))
+        self.assertFalse(DPPAttempt.objects.exists())
+
+        comment = {'content_type': 'lecture', 'object_id': str(self.lecture.pk), 'text': 'Hello'}
+        self.assertEqual(self.client.post(reverse('batches:add_comment'), comment).status_code, 403)
+        self.enroll()
+        self.assertEqual(self.client.post(reverse('batches:add_comment'), comment).status_code, 200)
+
+    def test_revoked_enrollment_is_seen_on_the_next_request(self):
+        enrollment = self.enroll()
+        self.assertEqual(self.client.get(self.urls[1]).status_code, 200)
+        enrollment.is_active = False
+        enrollment.save()
+        self.assertEqual(self.client.get(self.urls[1]).status_code, 302)
+
+
+class VideoEmbedTests(BatchTestCase):
+    def test_rows_saved_before_embed_urls_still_embed_and_are_backfilled(self):
+        self.lecture.video_url = 'https://youtu.be/dQw4w9WgXcQ'
+        self.lecture.save()
+        Lecture.objects.filter(pk=self.lecture.pk).update(video_id='', embed_url='')
+        lecture = Lecture.objects.get(pk=self.lecture.pk)
+        self.assertEqual(lecture.get_embed_url(), 'https://www.youtube.com/embed/dQw4w9WgXcQ')
+
+        self.assertEqual(video.backfill(Lecture), 1)
+        lecture.refresh_from_db()
+        self.assertEqual((lecture.video_id, lecture.embed_url),
+                         ('dQw4w9WgXcQ', 'https://www.youtube.com/embed/dQw4w9WgXcQ'))
+        self.assertEqual(video.backfill(Lecture), 0)
+
+
+class BatchQueryBudgetTests(QueryBudgetMixin, BatchTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.student)
+
+    def test_subject_detail_stays_within_budget(self):
+        self.enroll()
+
+        def grow(size):
+            start = self.subject.lectures.count() + 1
+            lectures = Lecture.objects.bulk_create(
+                Lecture(subject=self.subject, day_number=day, topic_name=f'Topic {day}', lecture_pdf=f'{day}.pdf')
+                for day in range(start, size + 1)
+            )
+            DPP.objects.bulk_create(DPP(lecture=lecture, title=lecture.topic_name) for lecture in lectures[::2])
+
+        self.assertQueryBudgetHolds(SubjectDetailView, reverse('batches:subject_detail', args=[self.subject.pk]), grow)
+
+    def test_my_batches_stays_within_budget(self):
+        def grow(size):
+            start = self.student.batch_enrollments.count()
+            batches = Batch.objects.bulk_create(
+                Batch(name=f'Batch {number}', category=self.category) for number in range(start, size)
+            )
+            BatchSubject.objects.bulk_create(
+                BatchSubject(batch=batch, name=name) for batch in batches for name in ('Physics', 'Chemistry')
+            )
+            BatchEnrollment.objects.bulk_create(BatchEnrollment(user=self.student, batch=batch) for batch in batches)
+
+        self.assertQueryBudgetHolds(MyBatchesView, reverse('batches:my_batches'), grow)
+
+
+class DPPSubmissionTests(QueryBudgetMixin, BatchTestCase):
+    def setUp(self):
+        super().setUp()
+        self.enroll()
+        self.client.force_login(self.student)
+        # Entitlements and role names stay cached between requests; the budgets are for a warm process
+        entitlements.get_entitlements(self.student)
+        self.student.role_name
+
+    def add_dpp(self, questions):
+        lecture = Lecture.objects.create(subject=self.subject, day_number=questions + 1, topic_name='Kinematics')
+        dpp = DPP.objects.create(lecture=lecture, title='Kinematics DPP', total_marks=questions)
+        DPPQuestion.objects.bulk_create(
+            DPPQuestion(dpp=dpp, question_text=f'Question {number}', correct_answer='A', order_index=number)
+            for number in range(questions)
+        )
+        return dpp
+
+    def test_starting_and_submitting_stay_within_budget(self):
+        # Up to the most rows SQLite takes in one bulk statement
+        for size in (10, 50, 150):
+            dpp = self.add_dpp(size)
+            with self.subTest(size=size):
+                self.assertWithinQueryBudget(StartDPPView.query_budget, reverse('batches:start_dpp', args=[dpp.pk]),
+                                             data={})
+                attempt = DPPAttempt.objects.get(dpp=dpp)
+                self.assertEqual(attempt.answers.count(), size)
+
+                answers = {f'question_{pk}': 'A' for pk in dpp.questions.values_list('pk', flat=True)}
+                self.assertWithinQueryBudget(TakeDPPView.query_budget, reverse('batches:take_dpp', args=[attempt.pk]),
+                                             data=answers)
+                attempt.refresh_from_db()
+                self.assertEqual(attempt.score, size)
+
+    def test_second_submission_is_not_graded_or_reported(self):
+        dpp = self.add_dpp(2)
+        first, second = dpp.questions.values_list('pk', flat=True)
+        attempt = DPPAttempt.start(self.student, dpp)
+        self.assertTrue(attempt.submit({first: 'A'}))
+        self.assertFalse(DPPAttempt.objects.get(pk=attempt.pk).submit({first: 'B', second: 'A'}))
+        self.assertEqual(dict(attempt.answers.values_list('question_id', 'selected_answer')), {first: 'A', second: ''})
+        self.assertEqual(DPPAttempt.objects.get(pk=attempt.pk).score, 1)
+
+        other = DPPAttempt.start(self.student, dpp)
+        # Another request completes the attempt after this one has read it
+        with mock.patch.object(DPPAttempt, 'submit', return_value=False), \
+                mock.patch.object(events, 'emit') as emit:
+            response = self.client.post(reverse('batches:take_dpp', args=[other.pk]), {f'question_{first}': 'A'},
+                                        follow=True)
+        self.assertRedirects(response, reverse('batches:dpp_results', args=[other.pk]))
+        self.assertEqual(
+            [str(message) for message in response.context['messages']], ['This DPP attempt was already submitted.']
+        )
+        emit.assert_not_called()
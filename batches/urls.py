@@ -11,6 +11,7 @@ urlpatterns = [
     path('<int:batch_id>/purchase/', views.PurchaseBatchView.as_view(), name='purchase'),
     path('my-batches/', views.MyBatchesView.as_view(), name='my_batches'),
     path('order/<str:order_id>/', views.OrderDetailView.as_view(), name='order_detail'),
+    path('export/<str:kind>/', views.ExportView.as_view(), name='export'),
     
     # Subject and Lecture URLs
     path('subject/<int:subject_id>/', views.SubjectDetailView.as_view(), name='subject_detail'),
@@ -25,6 +26,7 @@ urlpatterns = [
     
     # Comment URLs
     path('comment/add/', views.AddCommentView.as_view(), name='add_comment'),
+    path('comment/<int:comment_id>/replies/', views.CommentRepliesView.as_view(), name='comment_replies'),
     path('comment/<int:comment_id>/toggle-like/', views.ToggleCommentLikeView.as_view(), name='toggle_comment_like'),
     
     # Referral URLs
@@ -0,0 +1,78 @@
+"""
+Video provider resolution shared by batch lectures and DPP solutions.
+
+Patterns are compiled once at import; models resolve their embed URL when
+saved so templates never parse video URLs on the request path.
+"""
+import re
+
+YOUTUBE_PATTERNS = (
+    re.compile(r'(?:youtube\.com\/watch\?v=|youtu\.be\/)([^&\n?#]+)'),
+    re.compile(r'youtube\.com\/embed\/([^&\n?#]+)'),
+)
+VIMEO_PATTERNS = (
+    re.compile(r'vimeo\.com\/(\d+)'),
+)
+DRIVE_PATTERNS = (
+    re.compile(r'drive\.google\.com\/file\/d\/([a-zA-Z0-9_-]+)'),
+    re.compile(r'drive\.google\.com\/open\?id=([a-zA-Z0-9_-]+)'),
+)
+
+PROVIDERS = {
+    'youtube': (YOUTUBE_PATTERNS, 'https://www.youtube.com/embed/{}'),
+    'vimeo': (VIMEO_PATTERNS, 'https://player.vimeo.com/video/{}'),
+    'drive': (DRIVE_PATTERNS, 'https://drive.google.com/file/d/{}/preview'),
+}
+
+
+def extract_video_id(video_type, url):
+    """Return the provider's id for `url`, or None if it cannot be found."""
+    patterns, _ = PROVIDERS.get(video_type, ((), None))
+    for pattern in patterns:
+        match = pattern.search(url)
+        if match:
+            return match.group(1)
+    return None
+
+
+def resolve(video_type, url):
+    """
+    Resolve a video source to `(video_id, embed_url)`.
+    
+    Provider URLs become that provider's embed URL; uploads and direct URLs are
+    passed through unchanged. Either value is '' when it cannot be resolved.
+    """
+    if video_type in PROVIDERS and url:
+        video_id = extract_video_id(video_type, url)
+        if not video_id:
+            return '', ''
+        return video_id, PROVIDERS[video_type][1].format(video_id)
+    return '', url or ''
+
+
+def backfill(model, batch_size=500):
+    """
+    Store the resolved `video_id`/`embed_url` of every row of `model` whose
+    stored values are out of date. Also used by a data migration, so it only
+    relies on the model's fields. Returns the number of rows updated.
+    """
+    updated = 0
+    last_pk = 0
+    while True:
+        rows = list(
+            model.objects.filter(pk__gt=last_pk).order_by('pk')
+            .only('id', 'video_type', 'video_url', 'video_id', 'embed_url')[:batch_size]
+        )
+        if not rows:
+            return updated
+        last_pk = rows[-1].pk
+        
+        changed = []
+        for row in rows:
+            resolved = resolve(row.video_type, row.video_url)
+            if resolved != (row.video_id, row.embed_url):
+                row.video_id, row.embed_url = resolved
+                changed.append(row)
+        if changed:
+            model.objects.bulk_update(changed, ['video_id', 'embed_url'])
+            updated += len(changed)
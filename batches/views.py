@@ -3,16 +3,21 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.views.generic import ListView, DetailView, TemplateView, View
 from django.utils import timezone
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse, HttpResponseBadRequest, Http404
 from django.db import transaction
+from django.db.models import Exists, OuterRef, Q, ExpressionWrapper, BooleanField
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 import json
 from .models import (Batch, BatchSubject, BatchEnrollment, Order, Lecture, DPP, DPPAttempt, 
                      DPPAnswer, DPPSolution, Comment)
 from referrals.models import ReferralCode, SalesExecutive
+from accounts.entitlements import EntitlementRequiredMixin, has_access
+from main import events
+from main.page_cache import AnonymousPageCacheMixin
+from . import exports
 
-class BatchListView(ListView):
+class BatchListView(AnonymousPageCacheMixin, ListView):
     model = Batch
     template_name = 'batches/list.html'
     context_object_name = 'batches'
@@ -29,50 +34,67 @@ class BatchDetailView(DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         if self.request.user.is_authenticated:
-            context['is_enrolled'] = BatchEnrollment.objects.filter(
-                user=self.request.user, batch=self.object, is_active=True
-            ).exists()
+            context['is_enrolled'] = has_access(self.request.user, self.object)
         return context
 
-class SubjectDetailView(LoginRequiredMixin, DetailView):
+class SubjectDetailView(LoginRequiredMixin, EntitlementRequiredMixin, DetailView):
     model = BatchSubject
     template_name = 'batches/subject_detail.html'
     context_object_name = 'subject'
     pk_url_kwarg = 'subject_id'
+    denied_url_arg = 'batch_id'
+    query_budget = 7
     
-    def dispatch(self, request, *args, **kwargs):
-        subject = get_object_or_404(BatchSubject, id=kwargs['subject_id'])
-        if not BatchEnrollment.objects.filter(user=request.user, batch=subject.batch, is_active=True).exists():
-            messages.error(request, 'You need to enroll in this batch to access content.')
-            return redirect('batches:detail', batch_id=subject.batch.id)
-        return super().dispatch(request, *args, **kwargs)
+    def get_queryset(self):
+        return BatchSubject.objects.select_related('batch__category')
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['lectures'] = self.object.lectures.annotate(
+            has_dpp=Exists(DPP.objects.filter(lecture=OuterRef('pk'))),
+            has_pdf=ExpressionWrapper(
+                Q(lecture_pdf__isnull=False) & ~Q(lecture_pdf=''), output_field=BooleanField()
+            ),
+        )
+        return context
 
-class LectureDetailView(LoginRequiredMixin, DetailView):
+class LectureDetailView(LoginRequiredMixin, EntitlementRequiredMixin, DetailView):
     model = Lecture
     template_name = 'batches/lecture_detail.html'
     context_object_name = 'lecture'
     pk_url_kwarg = 'lecture_id'
+    denied_url_arg = 'subject.batch_id'
+    
+    def get_queryset(self):
+        return Lecture.objects.select_related('subject')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         lecture = self.object
         
-        # Get comments for this lecture
-        comments = Comment.objects.filter(
-            content_type='lecture',
-            object_id=lecture.id,
-            parent=None,
-            is_active=True
-        ).select_related('user').prefetch_related('replies__user')
+        # Get one page of comment threads for this lecture
+        comments, next_cursor = Comment.objects.thread_page(
+            'lecture', lecture.id, cursor=self.request.GET.get('cursor')
+        )
+        if not self.request.GET.get('cursor'):
+            events.emit('batch_lecture_view', user=self.request.user.pk, lecture=lecture.pk,
+                        subject=lecture.subject_id)
         
-        context['comments'] = comments
+        context.update({
+            'comments': comments,
+            'next_cursor': next_cursor,
+        })
         return context
 
-class DPPDetailView(LoginRequiredMixin, DetailView):
+class DPPDetailView(LoginRequiredMixin, EntitlementRequiredMixin, DetailView):
     model = DPP
     template_name = 'batches/dpp_detail.html'
     context_object_name = 'dpp'
     pk_url_kwarg = 'dpp_id'
+    denied_url_arg = 'lecture.subject.batch_id'
+    
+    def get_queryset(self):
+        return DPP.objects.select_related('lecture__subject')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -89,28 +111,21 @@ class DPPDetailView(LoginRequiredMixin, DetailView):
         return context
 
 class StartDPPView(LoginRequiredMixin, View):
+    # The attempt and its whole answer sheet are two INSERTs however long the DPP
+    query_budget = 8
+    
     def post(self, request, dpp_id):
-        dpp = get_object_or_404(DPP, id=dpp_id, is_active=True)
-        
-        attempt = DPPAttempt.objects.create(
-            user=request.user,
-            dpp=dpp,
-            total_marks=dpp.total_marks,
-            started_at=timezone.now()
-        )
-        
-        # Create answer records for all questions
-        questions = dpp.questions.all()
-        for question in questions:
-            DPPAnswer.objects.create(
-                attempt=attempt,
-                question=question
-            )
-        
+        dpp = get_object_or_404(DPP.objects.select_related('lecture__subject'), id=dpp_id, is_active=True)
+        if not has_access(request.user, dpp):
+            messages.error(request, 'You need to enroll in this batch to access content.')
+            return redirect('batches:detail', batch_id=dpp.lecture.subject.batch_id)
+        attempt = DPPAttempt.start(request.user, dpp)
         return redirect('batches:take_dpp', attempt_id=attempt.id)
 
 class TakeDPPView(LoginRequiredMixin, TemplateView):
     template_name = 'batches/take_dpp.html'
+    # Submitting a sheet: one bulk UPDATE grades every answer
+    query_budget = 9
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -136,33 +151,20 @@ class TakeDPPView(LoginRequiredMixin, TemplateView):
         if attempt.completed_at:
             return redirect('batches:dpp_results', attempt_id=attempt.id)
         
-        total_score = 0
-        with transaction.atomic():
-            for question in attempt.dpp.questions.all():
-                answer_key = f'question_{question.id}'
-                selected_answer = request.POST.get(answer_key)
-                
-                if selected_answer:
-                    dpp_answer = DPPAnswer.objects.get(
-                        attempt=attempt,
-                        question=question
-                    )
-                    dpp_answer.selected_answer = selected_answer
-                    dpp_answer.save()
-                    
-                    if dpp_answer.is_correct:
-                        total_score += dpp_answer.marks_obtained
-            
-            # Update attempt
-            attempt.score = total_score
-            attempt.completed_at = timezone.now()
-            if attempt.total_marks > 0:
-                attempt.percentage = (total_score / attempt.total_marks) * 100
-            
-            time_taken = (attempt.completed_at - attempt.started_at).total_seconds() / 60
-            attempt.time_taken_minutes = int(time_taken)
-            attempt.save()
+        submitted_answers = {}
+        for key, value in request.POST.items():
+            if key.startswith('question_') and value:
+                try:
+                    submitted_answers[int(key[len('question_'):])] = value
+                except ValueError:
+                    continue
         
+        if not attempt.submit(submitted_answers):
+            # A second submission of the same attempt, e.g. a double click
+            messages.info(request, 'This DPP attempt was already submitted.')
+            return redirect('batches:dpp_results', attempt_id=attempt.id)
+        events.emit('dpp_submit', user=request.user.pk, dpp=attempt.dpp_id, attempt=attempt.pk,
+                    score=attempt.score, total_marks=attempt.total_marks)
         return redirect('batches:dpp_results', attempt_id=attempt.id)
 
 class DPPResultsView(LoginRequiredMixin, DetailView):
@@ -180,25 +182,29 @@ class DPPResultsView(LoginRequiredMixin, DetailView):
         context['answers'] = answers
         return context
 
-class DPPSolutionView(LoginRequiredMixin, DetailView):
+class DPPSolutionView(LoginRequiredMixin, EntitlementRequiredMixin, DetailView):
     model = DPPSolution
     template_name = 'batches/dpp_solution.html'
     context_object_name = 'solution'
     pk_url_kwarg = 'solution_id'
+    denied_url_arg = 'dpp.lecture.subject.batch_id'
+    
+    def get_queryset(self):
+        return DPPSolution.objects.select_related('dpp__lecture__subject')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         solution = self.object
         
-        # Get comments for this solution
-        comments = Comment.objects.filter(
-            content_type='solution',
-            object_id=solution.id,
-            parent=None,
-            is_active=True
-        ).select_related('user').prefetch_related('replies__user')
+        # Get one page of comment threads for this solution
+        comments, next_cursor = Comment.objects.thread_page(
+            'solution', solution.id, cursor=self.request.GET.get('cursor')
+        )
         
-        context['comments'] = comments
+        context.update({
+            'comments': comments,
+            'next_cursor': next_cursor,
+        })
         return context
 
 class AddCommentView(LoginRequiredMixin, View):
@@ -210,10 +216,18 @@ class AddCommentView(LoginRequiredMixin, View):
         
         if not all([content_type, object_id, text]):
             return JsonResponse({'error': 'Missing required fields'}, status=400)
+        if content_type not in dict(Comment.CONTENT_TYPES) or not object_id.isdigit():
+            return JsonResponse({'error': 'Unknown content'}, status=400)
+        
+        content = Comment(content_type=content_type, object_id=int(object_id)).get_content_object()
+        if content is None or not has_access(request.user, content):
+            return JsonResponse({'error': 'You need to enroll in this batch to comment.'}, status=403)
         
         parent = None
         if parent_id:
-            parent = get_object_or_404(Comment, id=parent_id)
+            parent = get_object_or_404(
+                Comment.objects.visible(), id=parent_id, content_type=content_type, object_id=content.pk
+            )
         
         comment = Comment.objects.create(
             user=request.user,
@@ -222,6 +236,8 @@ class AddCommentView(LoginRequiredMixin, View):
             text=text,
             parent=parent
         )
+        events.emit('comment_post', user=request.user.pk, comment=comment.pk, content_type=content_type,
+                    object_id=int(comment.object_id), reply=parent is not None)
         
         return JsonResponse({
             'success': True,
@@ -235,33 +251,52 @@ class AddCommentView(LoginRequiredMixin, View):
             }
         })
 
+class CommentRepliesView(LoginRequiredMixin, View):
+    def get(self, request, comment_id):
+        comment = get_object_or_404(Comment.objects.visible(), id=comment_id)
+        content = comment.get_content_object()
+        if content is None or not has_access(request.user, content):
+            return JsonResponse({'error': 'You need to enroll in this batch to read these replies.'}, status=403)
+        replies, next_path = Comment.objects.subtree_page(comment, after_path=request.GET.get('after'))
+        
+        return JsonResponse({
+            'replies': [
+                {
+                    'id': reply.id,
+                    'parent_id': reply.parent_id,
+                    'depth': reply.depth,
+                    'path': reply.path,
+                    'user': reply.user.get_full_name() or reply.user.username,
+                    'text': reply.text,
+                    'created_at': reply.created_at.strftime('%Y-%m-%d %H:%M'),
+                    'likes_count': reply.likes_count,
+                    'dislikes_count': reply.dislikes_count
+                }
+                for reply in replies
+            ],
+            'next': next_path
+        })
+
 class ToggleCommentLikeView(LoginRequiredMixin, View):
     def post(self, request, comment_id):
         comment = get_object_or_404(Comment, id=comment_id)
         action = request.POST.get('action')  # 'like' or 'dislike'
         
         if action == 'like':
-            if request.user in comment.likes.all():
-                comment.likes.remove(request.user)
-                liked = False
-            else:
-                comment.likes.add(request.user)
-                comment.dislikes.remove(request.user)
-                liked = True
+            user_liked = comment.toggle_like(request.user)
+            user_disliked = False
         elif action == 'dislike':
-            if request.user in comment.dislikes.all():
-                comment.dislikes.remove(request.user)
-                disliked = False
-            else:
-                comment.dislikes.add(request.user)
-                comment.likes.remove(request.user)
-                disliked = True
+            user_disliked = comment.toggle_dislike(request.user)
+            user_liked = False
+        else:
+            user_liked = comment.likes.filter(pk=request.user.pk).exists()
+            user_disliked = comment.dislikes.filter(pk=request.user.pk).exists()
         
         return JsonResponse({
             'likes_count': comment.likes_count,
             'dislikes_count': comment.dislikes_count,
-            'user_liked': request.user in comment.likes.all(),
-            'user_disliked': request.user in comment.dislikes.all()
+            'user_liked': user_liked,
+            'user_disliked': user_disliked
         })
 
 # Existing views from previous implementation
@@ -269,7 +304,7 @@ class EnrollBatchView(LoginRequiredMixin, TemplateView):
     def post(self, request, batch_id):
         batch = get_object_or_404(Batch, id=batch_id, is_active=True)
         
-        if BatchEnrollment.objects.filter(user=request.user, batch=batch, is_active=True).exists():
+        if has_access(request.user, batch):
             messages.info(request, 'You are already enrolled in this batch.')
             return redirect('batches:my_batches')
         
@@ -350,12 +385,13 @@ class PurchaseBatchView(LoginRequiredMixin, TemplateView):
 
 class MyBatchesView(LoginRequiredMixin, TemplateView):
     template_name = 'batches/my_batches.html'
+    query_budget = 5
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['enrollments'] = BatchEnrollment.objects.filter(
             user=self.request.user, is_active=True
-        ).select_related('batch__category')
+        ).select_related('batch__category').prefetch_related('batch__subjects')
         return context
 
 class OrderDetailView(LoginRequiredMixin, DetailView):
@@ -366,4 +402,34 @@ class OrderDetailView(LoginRequiredMixin, DetailView):
     slug_url_kwarg = 'order_id'
     
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user)
\ No newline at end of file
+        return Order.objects.filter(user=self.request.user)
+
+class ExportView(LoginRequiredMixin, View):
+    """
+    Stream orders or enrollments as CSV or JSON Lines for finance.
+    
+    Query parameters: format=csv|jsonl, gzip=1, start/end (YYYY-MM-DD) and status.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        if request.user.is_authenticated and not request.user.is_admin:
+            return redirect('main:index')
+        return super().dispatch(request, *args, **kwargs)
+    
+    def get(self, request, kind):
+        if kind not in exports.EXPORTS:
+            raise Http404
+        fmt = request.GET.get('format', 'csv')
+        if fmt not in exports.FORMATS:
+            return HttpResponseBadRequest(f"'format' must be one of: {', '.join(exports.FORMATS)}")
+        try:
+            filters = exports.parse_filters(exports.EXPORTS[kind], request.GET)
+        except ValueError as e:
+            return HttpResponseBadRequest(str(e))
+        
+        compress = request.GET.get('gzip') == '1'
+        response = StreamingHttpResponse(
+            exports.stream(kind, fmt, compress=compress, **filters),
+            content_type='application/gzip' if compress else exports.FORMATS[fmt],
+        )
+        response['Content-Disposition'] = f'attachment; filename="{exports.filename(kind, fmt, compress)}"'
+        return response
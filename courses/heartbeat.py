@@ -0,0 +1,261 @@
+"""
+Buffered video-progress heartbeats.
+
+Players report their position every few seconds. Rather than writing each
+report to the database, `record` keeps the furthest position per
+(user, lecture) in the cache and registers the pair in an append-only slot
+log the first time it becomes dirty. `flush` (run periodically by the
+`flush_progress_heartbeats` command) drains the log and writes each batch of
+dirty pairs with three SELECTs (lectures, users and existing progress) and one
+upsert, plus a rollup refresh for the rows that were created or completed.
+
+Only the cache's atomic `add` and `incr` are relied on, so this works with
+any shared backend (Redis, Memcached, database cache). A process-local cache
+(the LocMemCache default) would hide the buffer from the flush command, so
+then each process keeps its own buffer in memory and a background thread
+writes it every PROGRESS_HEARTBEAT_FLUSH_INTERVAL seconds, and once more when
+the process exits.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+from accounts import dashboards
+from main import shared_cache
+from .models import Lecture, Progress
+
+User = get_user_model()
+
+logger = logging.getLogger(__name__)
+
+SEQUENCE_KEY = 'heartbeat:seq'
+FLUSHED_KEY = 'heartbeat:flushed'
+LOCK_KEY = 'heartbeat:lock'
+BUFFER_TIMEOUT = 60 * 60 * 24
+# A pair re-registers after this long even if its slot was lost, so a missed
+# flush delays its progress instead of dropping it
+DIRTY_TIMEOUT = 60 * 10
+LOCK_TIMEOUT = 60 * 5
+FLUSH_BATCH_SIZE = 1000
+# How often a process without a shared cache writes its own buffer
+LOCAL_FLUSH_INTERVAL = getattr(settings, 'PROGRESS_HEARTBEAT_FLUSH_INTERVAL', 30)
+
+# Fraction of a lecture's duration after which it counts as completed
+COMPLETE_THRESHOLD = getattr(settings, 'PROGRESS_COMPLETE_THRESHOLD', 0.9)
+
+
+def position_key(user_id, lecture_id):
+    return f'heartbeat:pos:{user_id}:{lecture_id}'
+
+
+def dirty_key(user_id, lecture_id):
+    return f'heartbeat:dirty:{user_id}:{lecture_id}'
+
+
+def slot_key(number):
+    return f'heartbeat:slot:{number}'
+
+
+def _next_slot():
+    try:
+        return cache.incr(SEQUENCE_KEY)
+    except ValueError:
+        cache.add(SEQUENCE_KEY, 0, None)
+        return cache.incr(SEQUENCE_KEY)
+
+
+def record(user_id, lecture_id, position):
+    """
+    Buffer a heartbeat at `position` seconds into the lecture.
+
+    Positions only move forward: an earlier position than the one already
+    buffered is ignored. Costs a few cache operations and no queries, or
+    with a process-local cache a dictionary update.
+    """
+    if not shared_cache.is_shared():
+        local_buffer.add(user_id, lecture_id, position)
+        return
+
+    key = position_key(user_id, lecture_id)
+    buffered = cache.get(key)
+    if buffered is None or position > buffered:
+        cache.set(key, position, BUFFER_TIMEOUT)
+
+    # Register the pair in the slot log once per flush cycle
+    if cache.add(dirty_key(user_id, lecture_id), True, DIRTY_TIMEOUT):
+        cache.set(slot_key(_next_slot()), (user_id, lecture_id), BUFFER_TIMEOUT)
+
+
+def is_complete(position, duration_minutes):
+    return bool(duration_minutes) and position >= duration_minutes * 60 * COMPLETE_THRESHOLD
+
+
+def write_positions(positions):
+    """
+    Merge {(user_id, lecture_id): seconds} into Progress, keeping the larger
+    of the stored and buffered positions. Returns the number of rows written.
+    """
+    if not positions:
+        return 0
+
+    user_ids = {user_id for user_id, _ in positions}
+    lecture_ids = {lecture_id for _, lecture_id in positions}
+    # Users or lectures deleted since the heartbeat are dropped
+    durations = dict(Lecture.objects.filter(id__in=lecture_ids).values_list('id', 'duration'))
+    user_ids = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+    existing = {
+        (row.user_id, row.lecture_id): row
+        for row in Progress.objects.filter(user_id__in=user_ids, lecture_id__in=lecture_ids).only(
+            'user_id', 'lecture_id', 'watched_duration', 'is_completed'
+        )
+    }
+
+    now = timezone.now()
+    rows = []
+    # New rows and newly completed ones change the completion rollups
+    changed = []
+    for (user_id, lecture_id), position in positions.items():
+        if lecture_id not in durations or user_id not in user_ids:
+            continue
+        duration = durations[lecture_id]
+        if duration:
+            position = min(position, duration * 60)
+        current = existing.get((user_id, lecture_id))
+        watched = max(position, current.watched_duration if current else 0)
+        was_completed = current is not None and current.is_completed
+        completed = was_completed or is_complete(watched, duration)
+        if current is None or completed != was_completed:
+            changed.append((user_id, lecture_id))
+        rows.append(Progress(
+            user_id=user_id,
+            lecture_id=lecture_id,
+            watched_duration=watched,
+            is_completed=completed,
+            last_watched=now,
+        ))
+
+    if not rows:
+        return 0
+    Progress.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['user', 'lecture'],
+        update_fields=['watched_duration', 'is_completed', 'last_watched'],
+    )
+    # bulk_create skips post_save, so refresh the rollups here
+    Progress.refresh_rollups(changed)
+    dashboards.invalidate(*{user_id for user_id, _ in changed})
+    return len(rows)
+
+
+def flush(batch_size=FLUSH_BATCH_SIZE):
+    """
+    Write every buffered heartbeat to the database.
+
+    Safe to run from several processes; only one flushes at a time. Returns
+    the number of Progress rows written.
+    """
+    if not cache.add(LOCK_KEY, True, LOCK_TIMEOUT):
+        return 0
+    try:
+        flushed = cache.get(FLUSHED_KEY, 0)
+        last = cache.get(SEQUENCE_KEY, 0)
+        if last < flushed:
+            # The sequence was evicted and restarted from zero
+            flushed = 0
+        written = 0
+        while flushed < last:
+            end = min(flushed + batch_size, last)
+            slots = [slot_key(number) for number in range(flushed + 1, end + 1)]
+            pairs = list(cache.get_many(slots).values())
+
+            # Clear the dirty markers before reading positions: a heartbeat
+            # landing in between re-registers its pair for the next flush
+            cache.delete_many([dirty_key(*pair) for pair in pairs])
+            buffered = cache.get_many([position_key(*pair) for pair in pairs])
+            positions = {}
+            for pair in pairs:
+                position = buffered.get(position_key(*pair))
+                if position is not None:
+                    positions[pair] = max(position, positions.get(pair, 0))
+
+            written += write_positions(positions)
+            cache.delete_many(slots)
+            cache.set(FLUSHED_KEY, end, None)
+            flushed = end
+        return written
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+class LocalBuffer:
+    """
+    Furthest position per (user, lecture) held in this process, for when the
+    cache is not shared. A background thread writes it every
+    LOCAL_FLUSH_INTERVAL seconds.
+    """
+
+    def __init__(self):
+        self._positions = {}
+        self._lock = threading.Lock()
+        self._writer_lock = threading.Lock()
+        self._writer_pid = None
+
+    def add(self, user_id, lecture_id, position):
+        if self._writer_pid != os.getpid():
+            self._start_writer()
+        pair = (user_id, lecture_id)
+        with self._lock:
+            if position > self._positions.get(pair, -1):
+                self._positions[pair] = position
+
+    def _start_writer(self):
+        with self._writer_lock:
+            if self._writer_pid == os.getpid():
+                return
+            if self._writer_pid is not None:
+                # A forked child inherits the parent's buffer but not its
+                # writer thread; the parent writes those positions itself
+                with self._lock:
+                    self._positions.clear()
+            else:
+                atexit.register(self.flush)
+            self._writer_pid = os.getpid()
+            threading.Thread(target=self._write_loop, name='progress-heartbeats', daemon=True).start()
+
+    def _write_loop(self):
+        while True:
+            time.sleep(LOCAL_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Could not write buffered lecture heartbeats')
+            finally:
+                # The thread holds its own connection
+                connection.close()
+
+    def flush(self, batch_size=FLUSH_BATCH_SIZE):
+        """Write every buffered position now. Returns the number of Progress rows written."""
+        with self._lock:
+            positions, self._positions = self._positions, {}
+        pairs = list(positions)
+        written = 0
+        for start in range(0, len(pairs), batch_size):
+            try:
+                written += write_positions({pair: positions[pair] for pair in pairs[start:start + batch_size]})
+            except Exception:
+                # Keep what was not written for the next attempt
+                for pair in pairs[start:]:
+                    self.add(*pair, positions[pair])
+                raise
+        return written
+
+
+local_buffer = LocalBuffer()
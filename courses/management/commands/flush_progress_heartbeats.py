@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand
+from courses import heartbeat
+from main import shared_cache
+
+class Command(BaseCommand):
+    help = 'Write buffered lecture heartbeats to Progress; run from cron or with --interval'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=heartbeat.FLUSH_BATCH_SIZE, help='Dirty (user, lecture) pairs written per upsert')
+        parser.add_argument('--interval', type=int, default=0, help='Keep running, flushing every N seconds')
+
+    def handle(self, *args, **options):
+        if not shared_cache.is_shared():
+            self.stdout.write(self.style.WARNING(
+                'The cache is local to each process, so there is nothing to flush here; '
+                'each web worker writes its own buffered heartbeats until a shared cache is configured'
+            ))
+            return
+        while True:
+            written = heartbeat.flush(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Flushed {written} progress records'))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
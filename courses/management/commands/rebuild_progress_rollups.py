@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from courses.models import Progress, ChapterProgress, SubjectProgress
+
+class Command(BaseCommand):
+    help = 'Recount chapter and subject completion rollups from Progress'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Number of users recounted at a time')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        user_ids = list(Progress.objects.values_list('user_id', flat=True).distinct().order_by('user_id'))
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            ChapterProgress.rebuild_for_users(batch)
+            SubjectProgress.rebuild_for_users(batch)
+        
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt completion rollups for {len(user_ids)} users'))
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_rollups(apps, schema_editor):
+    Progress = apps.get_model('courses', 'Progress')
+    rollups = [
+        (apps.get_model('courses', 'ChapterProgress'), 'chapter_id', 'lecture__chapter_id'),
+        (apps.get_model('courses', 'SubjectProgress'), 'subject_id', 'lecture__chapter__subject_id'),
+    ]
+    for model, field, path in rollups:
+        grouped = Progress.objects.values('user_id', path).annotate(
+            started=Count('id'),
+            completed=Count('id', filter=Q(is_completed=True)),
+        ).order_by()
+        rows = []
+        for row in grouped.iterator(chunk_size=2000):
+            rows.append(model(**{
+                'user_id': row['user_id'],
+                field: row[path],
+                'started_lectures': row['started'],
+                'completed_lectures': row['completed'],
+            }))
+            if len(rows) >= 2000:
+                model.objects.bulk_create(rows)
+                rows = []
+        model.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChapterProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_lectures', models.PositiveIntegerField(default=0)),
+                ('completed_lectures', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('chapter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progress_rollups', to='courses.chapter')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'chapter')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SubjectProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_lectures', models.PositiveIntegerField(default=0)),
+                ('completed_lectures', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progress_rollups', to='courses.subject')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'subject')},
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
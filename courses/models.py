@@ -88,6 +88,123 @@ class Progress(models.Model):
     
     def __str__(self):
         return f"{self.user.username} - {self.lecture.title}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_is_completed = instance.__dict__.get('is_completed')
+        return instance
+    
+    @property
+    def completion_changed(self):
+        """True for new rows and rows whose is_completed differs from what was loaded."""
+        return self.is_completed != getattr(self, '_loaded_is_completed', None)
+    
+    @classmethod
+    def refresh_rollups(cls, pairs):
+        """
+        Recount ChapterProgress and SubjectProgress for the chapters and
+        subjects of the given (user_id, lecture_id) pairs. Only the touched
+        (user, chapter) and (user, subject) keys are rewritten.
+        """
+        pairs = set(pairs)
+        if not pairs:
+            return
+        lectures = {
+            lecture_id: (chapter_id, subject_id)
+            for lecture_id, chapter_id, subject_id in Lecture.objects.filter(
+                id__in={lecture_id for _, lecture_id in pairs}
+            ).values_list('id', 'chapter_id', 'chapter__subject_id')
+        }
+        chapter_keys = {(user_id, lectures[lecture_id][0]) for user_id, lecture_id in pairs if lecture_id in lectures}
+        subject_keys = {(user_id, lectures[lecture_id][1]) for user_id, lecture_id in pairs if lecture_id in lectures}
+        ChapterProgress.recount(chapter_keys)
+        SubjectProgress.recount(subject_keys)
+
+class CompletionRollup(models.Model):
+    """Per-user lecture counts for one chapter or subject, kept in step with Progress."""
+    # Path from Progress to the rolled-up object, e.g. 'lecture__chapter'
+    progress_path = None
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    started_lectures = models.PositiveIntegerField(default=0)
+    completed_lectures = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        abstract = True
+    
+    @classmethod
+    def recount(cls, keys):
+        """Recompute the rows for the given (user_id, object_id) keys from Progress."""
+        keys = set(keys)
+        if not keys:
+            return
+        target = f'{cls.progress_path}_id'
+        counts = Progress.objects.filter(
+            user_id__in={user_id for user_id, _ in keys},
+            **{f'{target}__in': {object_id for _, object_id in keys}},
+        ).values('user_id', target).annotate(
+            started=models.Count('id'),
+            completed=models.Count('id', filter=models.Q(is_completed=True)),
+        ).order_by()
+        totals = {(row['user_id'], row[target]): row for row in counts}
+        
+        object_field = cls.progress_path.rsplit('__', 1)[-1]
+        now = timezone.now()
+        rows = []
+        for user_id, object_id in keys:
+            row = totals.get((user_id, object_id), {})
+            rows.append(cls(**{
+                'user_id': user_id,
+                f'{object_field}_id': object_id,
+                'started_lectures': row.get('started', 0),
+                'completed_lectures': row.get('completed', 0),
+                'updated_at': now,
+            }))
+        cls.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['user', object_field],
+            update_fields=['started_lectures', 'completed_lectures', 'updated_at'],
+        )
+    
+    @classmethod
+    def rebuild_for_users(cls, user_ids):
+        """Recount every row belonging to the given users."""
+        cls.objects.filter(user_id__in=user_ids).delete()
+        cls.recount(
+            Progress.objects.filter(user_id__in=user_ids).values_list(
+                'user_id', f'{cls.progress_path}_id'
+            ).distinct().order_by()
+        )
+    
+    def percent_complete(self, total_lectures):
+        if not total_lectures:
+            return 0
+        return min(100, round(self.completed_lectures * 100 / total_lectures))
+
+class ChapterProgress(CompletionRollup):
+    progress_path = 'lecture__chapter'
+    
+    chapter = models.ForeignKey(Chapter, on_delete=models.CASCADE, related_name='progress_rollups')
+    
+    class Meta:
+        unique_together = ['user', 'chapter']
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.chapter_id}: {self.completed_lectures} completed"
+
+class SubjectProgress(CompletionRollup):
+    progress_path = 'lecture__chapter__subject'
+    
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='progress_rollups')
+    
+    class Meta:
+        unique_together = ['user', 'subject']
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.subject_id}: {self.completed_lectures} completed"
 
 class Enrollment(models.Model):
     COURSE_TYPES = [
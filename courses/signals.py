@@ -0,0 +1,15 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Progress
+
+
+@receiver(post_save, sender=Progress)
+def update_completion_rollups(sender, instance, created, **kwargs):
+    if created or instance.completion_changed:
+        Progress.refresh_rollups([(instance.user_id, instance.lecture_id)])
+        instance._loaded_is_completed = instance.is_completed
+
+
+@receiver(post_delete, sender=Progress)
+def remove_from_completion_rollups(sender, instance, **kwargs):
+    Progress.refresh_rollups([(instance.user_id, instance.lecture_id)])
@@ -1,3 +1,137 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.urls import reverse
+
+from accounts import entitlements
+from main import shared_cache
+from main.testing import AppTestCase, QueryBudgetMixin
+from . import heartbeat
+from .models import PDF, Chapter, ChapterProgress, Enrollment, Lecture, Progress, Subject
+from .views import LectureDetailView, SubjectDetailView
+
+
+class CourseTestCase(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.subject = Subject.objects.create(name='Physics', class_level='11th', stream='JEE')
+        self.chapter = Chapter.objects.create(name='Kinematics', subject=self.subject)
+        self.lecture = Lecture.objects.create(title='Motion in a line', chapter=self.chapter, duration=30)
+
+    def enroll(self, user=None):
+        return Enrollment.objects.create(user=user or self.student, course_type='basic', class_level='11th',
+                                         stream='JEE', payment_status='completed')
+
+
+class CourseAccessTests(CourseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.free_lecture = Lecture.objects.create(title='Introduction', chapter=self.chapter, is_free=True)
+        self.client.force_login(self.student)
+
+    def test_paid_lectures_need_a_course_enrollment(self):
+        subject_url = reverse('courses:subject_detail', args=[self.subject.pk])
+        self.assertRedirects(self.client.get(reverse('courses:lecture_detail', args=[self.lecture.pk])), subject_url)
+        self.assertRedirects(self.client.post(reverse('courses:mark_complete', args=[self.lecture.pk])), subject_url)
+        self.assertEqual(self.client.get(reverse('courses:lecture_detail', args=[self.free_lecture.pk])).status_code, 200)
+        self.assertContains(self.client.get(subject_url), 'Enroll to Watch', count=1)
+
+        self.enroll()
+        self.assertEqual(self.client.get(reverse('courses:lecture_detail', args=[self.lecture.pk])).status_code, 200)
+        response = self.client.get(subject_url)
+        self.assertNotContains(response, 'Enroll to Watch')
+        self.assertNotContains(response, 'Enroll Now')
+
+
+class CourseQueryBudgetTests(QueryBudgetMixin, CourseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.enroll()
+        self.client.force_login(self.student)
+        # Entitlements and role names stay cached between requests; the
+        # budgets are for a user who has already loaded a page
+        entitlements.get_entitlements(self.student)
+        self.student.role_name
+
+    def add_lectures(self, chapters, count):
+        lectures = Lecture.objects.bulk_create(
+            Lecture(title=f'Lecture {number}', chapter=chapters[number % len(chapters)], duration=10)
+            for number in range(count)
+        )
+        PDF.objects.bulk_create(PDF(title=lecture.title, file='notes.pdf', lecture=lecture) for lecture in lectures)
+        Progress.objects.bulk_create(
+            Progress(user=self.student, lecture=lecture, is_completed=True) for lecture in lectures[::2]
+        )
+
+    def test_subject_detail_stays_within_budget(self):
+        def grow(size):
+            Chapter.objects.bulk_create(
+                Chapter(name=f'Chapter {number}', subject=self.subject, order_index=number)
+                for number in range(self.subject.chapters.count(), size // 10)
+            )
+            self.add_lectures(list(self.subject.chapters.all()), size - Lecture.objects.count())
+            ChapterProgress.rebuild_for_users([self.student.pk])
+
+        self.assertQueryBudgetHolds(SubjectDetailView, reverse('courses:subject_detail', args=[self.subject.pk]), grow)
+
+    def test_lecture_detail_stays_within_budget(self):
+        Progress.objects.create(user=self.student, lecture=self.lecture, watched_duration=60)
+
+        def grow(size):
+            self.add_lectures([self.chapter], size - Lecture.objects.count())
+            PDF.objects.bulk_create(
+                PDF(title=f'Notes {number}', file='notes.pdf', lecture=self.lecture) for number in range(size // 10)
+            )
+
+        self.assertQueryBudgetHolds(LectureDetailView, reverse('courses:lecture_detail', args=[self.lecture.pk]), grow)
+
+
+class HeartbeatTests(CourseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.enroll()
+        self.client.force_login(self.student)
+        self.url = reverse('courses:heartbeat', args=[self.lecture.pk])
+        # The buffer is written here, not by a background thread
+        patcher = mock.patch.object(heartbeat.LocalBuffer, '_start_writer')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(heartbeat.local_buffer._positions.clear)
+
+    def test_positions_that_are_not_finite_or_are_negative_are_rejected(self):
+        for position in ('', 'abc', 'nan', 'inf', '-inf', '1e400', '-5', str(24 * 60 * 60 + 1)):
+            with self.subTest(position=position):
+                self.assertEqual(self.client.post(self.url, {'position': position}).status_code, 400)
+        self.assertFalse(Progress.objects.exists())
+
+    def test_heartbeats_need_access_to_the_lecture(self):
+        Enrollment.objects.all().delete()
+        entitlements.invalidate(self.student.pk)
+        self.assertEqual(self.client.post(self.url, {'position': '86400'}).status_code, 403)
+        self.assertEqual(heartbeat.local_buffer.flush(), 0)
+        self.assertFalse(Progress.objects.exists())
+
+    def test_heartbeats_are_buffered_until_flushed_with_a_shared_cache(self):
+        with mock.patch.object(shared_cache, 'is_shared', return_value=True):
+            self.assertEqual(self.client.post(self.url, {'position': '120.7'}).status_code, 200)
+            self.assertFalse(Progress.objects.exists())
+            self.assertEqual(heartbeat.flush(), 1)
+        self.assertEqual(Progress.objects.get().watched_duration, 120)
+
+    def test_heartbeats_are_buffered_in_the_process_with_a_process_local_cache(self):
+        with mock.patch.object(shared_cache, 'is_shared', return_value=False):
+            for position in ('600', '1700', '900'):
+                self.client.post(self.url, {'position': position})
+        self.assertFalse(Progress.objects.exists())
+
+        self.assertEqual(heartbeat.local_buffer.flush(), 1)
+        progress = Progress.objects.get()
+        self.assertEqual((progress.watched_duration, progress.is_completed), (1700, True))
+        self.assertEqual(heartbeat.local_buffer.flush(), 0)
+
+    def test_positions_that_fail_to_write_are_kept(self):
+        heartbeat.local_buffer.add(self.student.pk, self.lecture.pk, 300)
+        with mock.patch.object(heartbeat, 'write_positions', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                heartbeat.local_buffer.flush()
+        self.assertEqual(heartbeat.local_buffer.flush(), 1)
+        self.assertEqual(Progress.objects.get().watched_duration, 300)
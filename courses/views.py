@@ -5,10 +5,15 @@ from django.contrib import messages
 from django.views.generic import ListView, DetailView, TemplateView, View
 from django.http import JsonResponse
 from django.utils import timezone
+from django.db.models import Exists, OuterRef, Prefetch
 from datetime import timedelta
-from .models import Subject, Chapter, Lecture, Progress, Enrollment
+from accounts.entitlements import EntitlementRequiredMixin, has_access
+from main import events
+from main.page_cache import AnonymousPageCacheMixin
+from .models import Subject, Chapter, Lecture, PDF, Progress, Enrollment, ChapterProgress, SubjectProgress
+from . import heartbeat
 
-class CourseListView(ListView):
+class CourseListView(AnonymousPageCacheMixin, ListView):
     model = Subject
     template_name = 'courses/list.html'
     context_object_name = 'subjects'
@@ -41,41 +46,68 @@ class SubjectDetailView(DetailView):
     template_name = 'courses/subject_detail.html'
     context_object_name = 'subject'
     pk_url_kwarg = 'subject_id'
+    query_budget = 7
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        chapters = self.object.chapters.prefetch_related('lectures').all()
+        user = self.request.user
+        lectures = Lecture.objects.annotate(
+            has_pdf=Exists(PDF.objects.filter(lecture=OuterRef('pk')))
+        )
+        if user.is_authenticated:
+            lectures = lectures.annotate(is_completed=Exists(
+                Progress.objects.filter(user=user, lecture=OuterRef('pk'), is_completed=True)
+            ))
+        chapters = list(self.object.chapters.prefetch_related(Prefetch('lectures', queryset=lectures)))
+        total_lectures = sum(len(chapter.lectures.all()) for chapter in chapters)
         
-        if self.request.user.is_authenticated:
-            user_progress = Progress.objects.filter(
-                user=self.request.user,
-                lecture__chapter__subject=self.object
-            ).select_related('lecture')
-            progress_dict = {p.lecture_id: p for p in user_progress}
-        else:
-            progress_dict = {}
+        # Completion badges come from the precomputed chapter rollups; the
+        # subject figure is their sum, saving a read of SubjectProgress
+        chapter_rollups = {}
+        if user.is_authenticated:
+            chapter_rollups = {
+                rollup.chapter_id: rollup
+                for rollup in ChapterProgress.objects.filter(user=user, chapter__subject=self.object)
+            }
+        for chapter in chapters:
+            rollup = chapter_rollups.get(chapter.id)
+            chapter.percent_complete = rollup.percent_complete(len(chapter.lectures.all())) if rollup else 0
+        subject_progress = SubjectProgress(
+            subject=self.object,
+            completed_lectures=sum(rollup.completed_lectures for rollup in chapter_rollups.values()),
+        ) if chapter_rollups else None
         
         context.update({
             'chapters': chapters,
-            'progress_dict': progress_dict,
+            'total_lectures': total_lectures,
+            'subject_progress': subject_progress,
+            'percent_complete': subject_progress.percent_complete(total_lectures) if subject_progress else 0,
         })
         return context
 
-class LectureDetailView(LoginRequiredMixin, DetailView):
+class LectureDetailView(LoginRequiredMixin, EntitlementRequiredMixin, DetailView):
     model = Lecture
     template_name = 'courses/lecture_detail.html'
     context_object_name = 'lecture'
     pk_url_kwarg = 'lecture_id'
+    query_budget = 6
+    denied_url_name = 'courses:subject_detail'
+    denied_url_arg = 'chapter.subject_id'
+    denied_message = 'Enroll in this course to watch its lectures.'
+    
+    def get_queryset(self):
+        return Lecture.objects.select_related('chapter__subject').prefetch_related('pdfs', 'chapter__lectures')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Get or create progress record
-        progress, created = Progress.objects.get_or_create(
-            user=self.request.user,
-            lecture=self.object,
-            defaults={'watched_duration': 0}
-        )
+        # Read-only: the row is created by the first heartbeat or completion,
+        # not by viewing the page
+        progress = Progress.objects.filter(user=self.request.user, lecture=self.object).first()
+        if progress is None:
+            progress = Progress(user=self.request.user, lecture=self.object)
+        events.emit('lecture_view', user=self.request.user.pk, lecture=self.object.pk,
+                    subject=self.object.chapter.subject_id)
         
         context.update({
             'progress': progress,
@@ -86,7 +118,10 @@ class LectureDetailView(LoginRequiredMixin, DetailView):
 
 class MarkLectureCompleteView(LoginRequiredMixin, View):
     def post(self, request, lecture_id):
-        lecture = get_object_or_404(Lecture, id=lecture_id)
+        lecture = get_object_or_404(Lecture.objects.select_related('chapter__subject'), id=lecture_id)
+        if not has_access(request.user, lecture):
+            messages.error(request, 'Enroll in this course to watch its lectures.')
+            return redirect('courses:subject_detail', subject_id=lecture.chapter.subject_id)
         progress, created = Progress.objects.get_or_create(
             user=request.user,
             lecture=lecture
@@ -100,6 +135,30 @@ class MarkLectureCompleteView(LoginRequiredMixin, View):
         messages.success(request, f'Lecture "{lecture.title}" marked as complete!')
         return redirect('courses:lecture_detail', lecture_id=lecture.id)
 
+class LectureHeartbeatView(LoginRequiredMixin, View):
+    """
+    Accept a player's current position (seconds) for a lecture.
+    
+    Positions are buffered (see courses.heartbeat) rather than written, so
+    this view only reads the lecture to check access.
+    """
+    MAX_POSITION = 24 * 60 * 60
+    
+    def post(self, request, lecture_id):
+        # int() rejects NaN (ValueError) and infinities (OverflowError)
+        try:
+            position = int(float(request.POST.get('position', '')))
+        except (ValueError, OverflowError):
+            return JsonResponse({'error': 'position must be a finite number of seconds'}, status=400)
+        if not 0 <= position <= self.MAX_POSITION:
+            return JsonResponse({'error': 'position out of range'}, status=400)
+        
+        lecture = get_object_or_404(Lecture.objects.select_related('chapter__subject'), id=lecture_id)
+        if not has_access(request.user, lecture):
+            return JsonResponse({'error': 'Enroll in this course to watch its lectures.'}, status=403)
+        heartbeat.record(request.user.id, lecture.id, position)
+        return JsonResponse({'status': 'ok'})
+
 class EnrollmentView(LoginRequiredMixin, TemplateView):
     template_name = 'courses/enrollment.html'
     
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DoubtsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'doubts'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,113 @@
+"""
+Doubt dispatch: race-free claiming of submitted doubts by teachers.
+
+A claim is a single conditional UPDATE that only matches while the doubt is
+still submitted and the teacher holds fewer than DOUBT_MAX_IN_PROGRESS
+doubts, so when two teachers click at once exactly one of them gets it and
+nobody goes past their capacity, whether they pick a doubt from the dashboard
+or take the next one. `claim_next` hands a teacher the oldest waiting doubt,
+skipping rows other teachers are claiming at the same moment, so the queue
+drains to teachers with spare capacity.
+"""
+import random
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Count, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import LessThan
+
+from accounts import dashboards
+from .models import Doubt
+
+User = get_user_model()
+
+MAX_IN_PROGRESS = getattr(settings, 'DOUBT_MAX_IN_PROGRESS', 5)
+# Oldest submitted doubts a teacher races for when row locks are unavailable
+CANDIDATES = 100
+
+
+def in_progress_count(teacher):
+    return Doubt.objects.filter(teacher=teacher, status='in_progress').count()
+
+
+def _has_capacity(teacher):
+    """Condition, evaluated by the claiming UPDATE itself, that `teacher` is below MAX_IN_PROGRESS."""
+    held = (
+        Doubt.objects.filter(teacher=teacher, status='in_progress')
+        .order_by().values('teacher').annotate(held=Count('pk')).values('held')
+    )
+    return LessThan(Coalesce(Subquery(held), 0), MAX_IN_PROGRESS)
+
+
+def _claimed(doubt_id, teacher):
+    doubt = Doubt.objects.select_related('user').get(pk=doubt_id)
+    # update() skips post_save, so clear the cached dashboards here, once
+    # the claim is visible to the requests that would rebuild them
+    transaction.on_commit(lambda: dashboards.invalidate(doubt.user_id, teacher.pk))
+    return doubt
+
+
+def claim(doubt_id, teacher):
+    """
+    Assign a submitted doubt to `teacher`. Returns the doubt, or None if
+    someone else got it first. Raises ValueError with a readable message if
+    `teacher` is at capacity.
+    """
+    with transaction.atomic():
+        if connection.features.has_select_for_update:
+            # Otherwise two claims of one teacher's at once could each count
+            # the doubts held before the other; SQLite runs one UPDATE at a time
+            User.objects.select_for_update().only('pk').get(pk=teacher.pk)
+        updated = Doubt.objects.filter(_has_capacity(teacher), pk=doubt_id, status='submitted').update(
+            teacher=teacher, status='in_progress'
+        )
+    if updated:
+        return _claimed(doubt_id, teacher)
+    if in_progress_count(teacher) >= MAX_IN_PROGRESS:
+        raise ValueError(
+            f'You already have {MAX_IN_PROGRESS} doubts in progress. Resolve one before taking another.'
+        )
+    return None
+
+
+def _claim_locked(teacher):
+    # Rows locked by other teachers' claims are skipped rather than waited on
+    with transaction.atomic():
+        doubt_id = (
+            Doubt.objects.select_for_update(skip_locked=True)
+            .filter(status='submitted')
+            .order_by('created_at')
+            .values_list('pk', flat=True)
+            .first()
+        )
+        if doubt_id is None:
+            return None
+        return claim(doubt_id, teacher)
+
+
+def _claim_racing(teacher):
+    # Without row locks, try the oldest few in random order so concurrent
+    # teachers mostly aim at different rows instead of all at the head
+    while True:
+        candidates = list(
+            Doubt.objects.filter(status='submitted').order_by('created_at').values_list('pk', flat=True)[:CANDIDATES]
+        )
+        if not candidates:
+            return None
+        random.shuffle(candidates)
+        for doubt_id in candidates:
+            doubt = claim(doubt_id, teacher)
+            if doubt is not None:
+                return doubt
+
+
+def claim_next(teacher):
+    """
+    Assign the oldest submitted doubt to `teacher` and return it, or None when
+    the queue is empty. Raises ValueError with a readable message if `teacher`
+    is at capacity.
+    """
+    if connection.features.has_select_for_update_skip_locked:
+        return _claim_locked(teacher)
+    return _claim_racing(teacher)
@@ -1,4 +1,6 @@
 from django import forms
+from django.conf import settings
+from django.template.defaultfilters import filesizeformat
 from .models import Doubt
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Layout, Submit, Field
@@ -34,6 +36,13 @@ class DoubtSubmissionForm(forms.ModelForm):
             Field('image', help_text='Optional: Upload an image if it helps explain your doubt'),
             Submit('submit', 'Submit Doubt', css_class='btn btn-primary')
         )
+    
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        limit = settings.DOUBT_IMAGE_MAX_UPLOAD_SIZE
+        if image and image.size > limit:
+            raise forms.ValidationError(f'Images must be smaller than {filesizeformat(limit)}.')
+        return image
 
 class DoubtResolutionForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,115 @@
+"""
+Doubt image processing.
+
+Uploads are accepted as-is and handed to a small thread pool once the doubt is
+committed. A worker upright-rotates the photo from its EXIF orientation,
+re-encodes it at a bounded resolution and writes the detail and list
+thumbnails templates show, then drops the original. Requests never decode
+images themselves. The `process_doubt_images` command runs the same step for
+doubts uploaded before this existed.
+"""
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image, ImageOps, features
+
+from .models import Doubt
+
+logger = logging.getLogger(__name__)
+
+WORKERS = getattr(settings, 'DOUBT_IMAGE_WORKERS', 2)
+QUALITY = getattr(settings, 'DOUBT_IMAGE_QUALITY', 80)
+# Longest edge in pixels of each stored rendition
+SIZES = {
+    'image': 2048,
+    'image_preview': 960,
+    'image_thumbnail': 320,
+}
+
+if features.check('webp'):
+    FORMAT, EXTENSION = 'WEBP', 'webp'
+else:
+    FORMAT, EXTENSION = 'JPEG', 'jpg'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='doubt-images')
+        return _executor
+
+
+def is_processed(doubt):
+    return bool(doubt.image_thumbnail)
+
+
+def _encode(image, size):
+    rendition = image.copy()
+    rendition.thumbnail((size, size), Image.LANCZOS)
+    buffer = io.BytesIO()
+    rendition.save(buffer, FORMAT, quality=QUALITY, optimize=True)
+    return ContentFile(buffer.getvalue())
+
+
+def _open(field):
+    with field.open('rb') as source:
+        image = Image.open(source)
+        # JPEG decoders can downscale by 1/2..1/8 while decoding, which keeps
+        # 12-megapixel photos from being expanded in memory at full size
+        image.draft('RGB', (SIZES['image'], SIZES['image']))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            transparent = image.mode in ('LA', 'PA') or 'transparency' in image.info
+            image = image.convert('RGBA' if transparent else 'RGB')
+        if image.mode == 'RGBA' and FORMAT == 'JPEG':
+            image = image.convert('RGB')
+        image.load()
+    return image
+
+
+def process(doubt_id):
+    """Write the bounded image and thumbnails for one doubt. Returns True if it did any work."""
+    doubt = Doubt.objects.filter(pk=doubt_id).only('id', 'image', 'image_preview', 'image_thumbnail').first()
+    if doubt is None or not doubt.image or is_processed(doubt):
+        return False
+
+    original = doubt.image.name
+    image = _open(doubt.image)
+    stem = os.path.splitext(os.path.basename(original))[0]
+    names = {}
+    for field_name, size in SIZES.items():
+        field = getattr(doubt, field_name)
+        suffix = '' if field_name == 'image' else f"-{field_name.replace('image_', '')}"
+        field.save(f'{stem}{suffix}.{EXTENSION}', _encode(image, size), save=False)
+        names[field_name] = field.name
+
+    # Only the image columns change, so a status change made meanwhile is kept
+    Doubt.objects.filter(pk=doubt_id).update(**names)
+    if original != names['image']:
+        doubt.image.storage.delete(original)
+    return True
+
+
+def _run(doubt_id):
+    try:
+        process(doubt_id)
+    except Exception:
+        logger.exception('Could not process image for doubt %s', doubt_id)
+    finally:
+        # Each worker thread holds its own connection
+        connection.close()
+
+
+def schedule(doubt):
+    """Process `doubt`'s image on the worker pool once the current transaction commits."""
+    if doubt.image and not is_processed(doubt):
+        transaction.on_commit(lambda: _get_executor().submit(_run, doubt.pk))
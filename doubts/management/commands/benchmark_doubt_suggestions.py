@@ -0,0 +1,87 @@
+import itertools
+import os
+import random
+import tempfile
+import time
+from django.core.management.base import BaseCommand
+from doubts.similar import DoubtIndex
+from main.management.commands.benchmark_search import build_vocabulary
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    p50 = timings[len(timings) // 2]
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    return f"p50 {p50:.2f}ms, p95 {p95:.2f}ms, max {timings[-1]:.2f}ms"
+
+
+class Command(BaseCommand):
+    help = 'Measure similar-doubt suggestion latency over a synthetic in-memory index (the database is not touched)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doubts', type=int, default=500000, help='Synthetic resolved doubts to index')
+        parser.add_argument('--queries', type=int, default=500, help='Queries to time')
+        parser.add_argument('--vocabulary', type=int, default=20000, help='Distinct words in the corpus')
+        parser.add_argument('--k', type=int, default=5, help='Suggestions per query')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        words = build_vocabulary(rng, options['vocabulary'])
+        # Zipf-like word frequencies, as in natural text
+        cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(words) + 1)))
+        sampled = set(rng.sample(range(1, options['doubts'] + 1), min(options['queries'], options['doubts'])))
+        originals = {}
+
+        def synthetic_doubt():
+            return {
+                'title': ' '.join(rng.choices(words, cum_weights=cum_weights, k=6)),
+                'description': ' '.join(rng.choices(words, cum_weights=cum_weights, k=30)),
+                'resolution': ' '.join(rng.choices(words, cum_weights=cum_weights, k=50)),
+            }
+
+        def documents():
+            for doubt_id in range(1, options['doubts'] + 1):
+                fields = synthetic_doubt()
+                if doubt_id in sampled:
+                    originals[doubt_id] = fields
+                yield doubt_id, fields
+
+        self.stdout.write(f"Indexing {options['doubts']} synthetic doubts...")
+        started = time.perf_counter()
+        index = DoubtIndex.build(documents())
+        self.stdout.write(f"Built in {time.perf_counter() - started:.1f}s")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'doubt_similarity.idx')
+            started = time.perf_counter()
+            index.save(path)
+            saved = time.perf_counter() - started
+            started = time.perf_counter()
+            index = DoubtIndex.load(path)
+            self.stdout.write(
+                f"Snapshot {os.path.getsize(path) / 2 ** 20:.0f}MB: saved in {saved:.1f}s, "
+                f"loaded in {time.perf_counter() - started:.1f}s"
+            )
+
+        timings = []
+        found = 0
+        for doubt_id, fields in originals.items():
+            # A student retyping the same doubt: the title and part of the
+            # description, with some words missed
+            typed = fields['title'].split() + fields['description'].split()[:8]
+            query = ' '.join(word for word in typed if rng.random() > 0.2)
+            started = time.perf_counter()
+            suggestions = index.query(query, options['k'])
+            timings.append((time.perf_counter() - started) * 1000)
+            found += any(suggested == doubt_id for suggested, _ in suggestions)
+        self.stdout.write(f"{len(timings)} queries: {percentiles(timings)}")
+        self.stdout.write(f"Original doubt in the top {options['k']}: {found / max(1, len(timings)):.0%}")
+
+        timings = []
+        for doubt_id in range(options['doubts'] + 1, options['doubts'] + 101):
+            fields = synthetic_doubt()
+            started = time.perf_counter()
+            index.add(doubt_id, fields)
+            timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(self.style.SUCCESS(f"{len(timings)} incremental resolves: {percentiles(timings)}"))
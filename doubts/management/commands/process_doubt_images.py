@@ -0,0 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+from doubts.models import Doubt
+from doubts import images
+
+
+def process(doubt_id):
+    try:
+        return images.process(doubt_id), None
+    except Exception as e:
+        return False, f'Doubt {doubt_id}: {e}'
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Resize images and write thumbnails for doubts uploaded before image processing existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='Doubts read per query')
+        parser.add_argument('--workers', type=int, default=images.WORKERS, help='Images processed in parallel')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        processed = failed = 0
+        last_pk = 0
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            while True:
+                doubt_ids = list(
+                    Doubt.objects.filter(pk__gt=last_pk)
+                    .filter(Q(image_thumbnail__isnull=True) | Q(image_thumbnail=''))
+                    .exclude(image='').exclude(image__isnull=True)
+                    .order_by('pk').values_list('pk', flat=True)[:batch_size]
+                )
+                if not doubt_ids:
+                    break
+                last_pk = doubt_ids[-1]
+
+                for done, error in executor.map(process, doubt_ids):
+                    if error:
+                        failed += 1
+                        self.stderr.write(error)
+                    elif done:
+                        processed += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} doubt images ({failed} failed)'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from doubts import similar
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the similar-doubt suggestion index from resolved doubts and empty its journal'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Doubts read per query')
+
+    def handle(self, *args, **options):
+        total = similar.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} resolved doubts into {similar.INDEX_PATH}'))
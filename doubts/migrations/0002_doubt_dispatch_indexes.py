@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doubts', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='doubt',
+            index=models.Index(fields=['status', 'created_at'], name='doubt_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doubt',
+            index=models.Index(fields=['teacher', 'status'], name='doubt_teacher_status_idx'),
+        ),
+    ]
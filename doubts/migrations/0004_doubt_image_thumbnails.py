@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doubts', '0003_doubt_teacher_list_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doubt',
+            name='image_preview',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='doubts/thumbs/'),
+        ),
+        migrations.AddField(
+            model_name='doubt',
+            name='image_thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='doubts/thumbs/'),
+        ),
+    ]
@@ -1,9 +1,50 @@
 from django.db import models
 from django.utils import timezone
 from django.contrib.auth import get_user_model
+import base64
+from datetime import datetime
 
 User = get_user_model()
 
+class DoubtQuerySet(models.QuerySet):
+    @staticmethod
+    def encode_cursor(doubt):
+        raw = f"{doubt.created_at.isoformat()}|{doubt.pk}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+    
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            created_at, pk = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+            return datetime.fromisoformat(created_at), int(pk)
+        except (ValueError, UnicodeError):
+            return None
+    
+    def newest_page(self, cursor=None, limit=10):
+        """
+        Fetch the `limit` newest doubts older than `cursor`, seeking by
+        (created_at, id) rather than OFFSET so deep pages cost the same as the first.
+        
+        Returns `(doubts, next_cursor)`; `next_cursor` is None on the last page.
+        """
+        doubts = self
+        position = self.decode_cursor(cursor) if cursor else None
+        if position:
+            created_at, pk = position
+            # The plain upper bound lets the index seek to the cursor; the OR
+            # alone would scan from the newest row
+            doubts = doubts.filter(created_at__lte=created_at).filter(
+                models.Q(created_at__lt=created_at) | models.Q(pk__lt=pk)
+            )
+        # One row beyond the page tells whether another follows without a COUNT
+        doubts = list(doubts.order_by('-created_at', '-id')[:limit + 1])
+        
+        next_cursor = None
+        if len(doubts) > limit:
+            doubts = doubts[:limit]
+            next_cursor = self.encode_cursor(doubts[-1])
+        return doubts, next_cursor
+
 class Doubt(models.Model):
     STATUS_CHOICES = [
         ('submitted', 'Submitted'),
@@ -14,6 +55,9 @@ class Doubt(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
     image = models.ImageField(upload_to='doubts/', blank=True, null=True)
+    # Written by doubts.images after upload; empty until the image is processed
+    image_preview = models.ImageField(upload_to='doubts/thumbs/', blank=True, null=True, editable=False)
+    image_thumbnail = models.ImageField(upload_to='doubts/thumbs/', blank=True, null=True, editable=False)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='submitted')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='doubts')
     teacher = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, 
@@ -22,8 +66,15 @@ class Doubt(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     resolved_at = models.DateTimeField(null=True, blank=True)
     
+    objects = DoubtQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # The dispatch queue and pending list, and each teacher's load and list
+            models.Index(fields=['status', 'created_at'], name='doubt_status_created_idx'),
+            models.Index(fields=['teacher', 'status', 'created_at'], name='doubt_teacher_list_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.user.username}"
@@ -35,6 +86,15 @@ class Doubt(models.Model):
         self.resolved_at = timezone.now()
         self.save()
     
+    @classmethod
+    def teacher_counts(cls, teacher):
+        """Unassigned doubts plus `teacher`'s in-progress and resolved ones, in one query."""
+        return cls.objects.aggregate(
+            pending=models.Count('pk', filter=models.Q(status='submitted')),
+            assigned=models.Count('pk', filter=models.Q(teacher=teacher, status='in_progress')),
+            resolved=models.Count('pk', filter=models.Q(teacher=teacher, status='resolved')),
+        )
+    
     def assign_to_teacher(self, teacher):
         self.teacher = teacher
         self.status = 'in_progress'
@@ -0,0 +1,19 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Doubt
+from . import similar
+
+
+@receiver(post_save, sender=Doubt)
+def index_resolved_doubt(sender, instance, **kwargs):
+    if instance.status == 'resolved':
+        similar.record(instance)
+    elif instance.resolved_at is not None:
+        # Reopened after being resolved
+        similar.forget(instance.pk)
+
+
+@receiver(post_delete, sender=Doubt)
+def unindex_doubt(sender, instance, **kwargs):
+    if instance.resolved_at is not None:
+        similar.forget(instance.pk)
@@ -0,0 +1,429 @@
+"""
+Similar resolved doubts, suggested to students while they write a new one.
+
+Every resolved doubt's title, description and resolution is kept as a sparse
+TF-IDF vector in an in-process inverted index. Each term's postings are held
+in ascending weight order, so a query only reads the POSTINGS_PER_TERM
+strongest doubts for each of its terms and scoring stays in the low
+milliseconds however many doubts have been answered.
+
+The index is saved to DOUBT_SIMILARITY_INDEX so processes start from it rather
+than from the database. Resolves and deletes are appended to a journal beside
+it (see doubts.signals); every process replays new journal lines before
+answering a query, so all of them see a doubt as soon as it is resolved. Once
+the journal passes DOUBT_SIMILARITY_JOURNAL_MAX_BYTES it is folded into a new
+snapshot in the background. `manage.py rebuild_doubt_index` rebuilds the
+snapshot from the database and empties the journal; a process that finds no
+snapshot does the same in a background thread and suggests nothing until it
+is done.
+
+Loading a large snapshot takes seconds, so it never happens on the request
+path: a process that finds a snapshot newer than its index, written by another
+process or not read yet, loads it in a background thread and keeps answering
+from the index it has until the new one is swapped in.
+
+Appends take a shared lock on a file beside the snapshot and compactions an
+exclusive one, so no journal line is lost while the journal is replaced.
+"""
+import bisect
+import heapq
+import json
+import logging
+import math
+import os
+import pickle
+import re
+import threading
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+from operator import itemgetter
+from django.conf import settings
+from django.db import connection, transaction
+
+try:
+    import fcntl
+except ImportError:  # Windows; fine for a single development process
+    fcntl = None
+
+from .models import Doubt
+
+logger = logging.getLogger(__name__)
+
+INDEX_PATH = str(getattr(settings, 'DOUBT_SIMILARITY_INDEX', settings.BASE_DIR / 'doubt_similarity.idx'))
+JOURNAL_PATH = INDEX_PATH + '.journal'
+LOCK_PATH = INDEX_PATH + '.lock'
+FORMAT_VERSION = 1
+# Past this size the journal is folded into a new snapshot
+JOURNAL_MAX_BYTES = getattr(settings, 'DOUBT_SIMILARITY_JOURNAL_MAX_BYTES', 4 * 1024 * 1024)
+
+# Title words say more about what a doubt is about than the rest
+FIELD_WEIGHTS = (('title', 3), ('description', 1), ('resolution', 1))
+# Strongest terms kept per doubt, and read from each query
+MAX_TERMS = 24
+MAX_QUERY_TERMS = 12
+# Fewer known words than this is not enough to call anything similar
+MIN_QUERY_TERMS = 2
+POSTINGS_PER_TERM = 1000
+
+TOKEN_RE = re.compile(r'[^\W\d_]{2,}')
+STOPWORDS = frozenset("""
+    a about above after again all also am an and any are as at be because been before being below
+    between both but by can could did do does doing down during each few for from further had has
+    have having he her here hers him his how if in into is it its itself just me more most my no nor
+    not now of off on once only or other our out over own same she should so some such than that the
+    their them then there these they this those through to too under until up very was we were what
+    when where which while who whom why will with would you your yours
+    doubt question please help sir maam mam understand explain get got know
+""".split())
+
+
+def terms(text):
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def _term_weights(fields):
+    """Length-normalised log term frequencies of one doubt's strongest MAX_TERMS terms."""
+    counts = Counter()
+    for field, weight in FIELD_WEIGHTS:
+        for term in terms(fields.get(field) or ''):
+            counts[term] += weight
+    strongest = counts.most_common(MAX_TERMS)
+    if not strongest:
+        return []
+    weights = [(term, 1 + math.log(count)) for term, count in strongest]
+    norm = math.sqrt(sum(weight * weight for _, weight in weights))
+    return [(term, weight / norm) for term, weight in weights]
+
+
+class DoubtIndex:
+    """
+    Inverted index of resolved doubts. `_postings` maps a term to a pair of
+    parallel arrays: weights in ascending order and the doubt ids they belong
+    to. `_terms` maps each indexed doubt to the terms it is posted under, so
+    removing one only touches its own posting lists.
+    """
+
+    def __init__(self):
+        self._postings = {}
+        self._terms = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._terms)
+
+    @classmethod
+    def build(cls, documents):
+        """Index `(doubt_id, fields)` pairs in one pass, sorting each term's postings once at the end."""
+        index = cls()
+        postings = index._postings
+        for doubt_id, fields in documents:
+            if doubt_id in index._terms:
+                continue
+            weights = _term_weights(fields)
+            index._terms[doubt_id] = tuple(term for term, _ in weights)
+            for term, weight in weights:
+                if term not in postings:
+                    postings[term] = (array('f'), array('q'))
+                postings[term][0].append(weight)
+                postings[term][1].append(doubt_id)
+        for term, (weights, ids) in postings.items():
+            order = sorted(range(len(weights)), key=weights.__getitem__)
+            postings[term] = (array('f', (weights[i] for i in order)), array('q', (ids[i] for i in order)))
+        return index
+
+    def add(self, doubt_id, fields):
+        with self._lock:
+            if doubt_id in self._terms:
+                self._remove(doubt_id)
+            weights = _term_weights(fields)
+            self._terms[doubt_id] = tuple(term for term, _ in weights)
+            for term, weight in weights:
+                if term not in self._postings:
+                    self._postings[term] = (array('f'), array('q'))
+                term_weights, ids = self._postings[term]
+                position = bisect.bisect(term_weights, weight)
+                term_weights.insert(position, weight)
+                ids.insert(position, doubt_id)
+
+    def remove(self, doubt_id):
+        with self._lock:
+            if doubt_id in self._terms:
+                self._remove(doubt_id)
+
+    def _remove(self, doubt_id):
+        for term in self._terms.pop(doubt_id):
+            weights, ids = self._postings[term]
+            position = ids.index(doubt_id)
+            del weights[position]
+            del ids[position]
+            if not ids:
+                del self._postings[term]
+
+    def query(self, text, k=5):
+        """Return up to `k` `(doubt_id, score)` pairs most similar to `text`, best first."""
+        with self._lock:
+            total = len(self._terms)
+            candidates = []
+            for term, count in Counter(terms(text)).items():
+                postings = self._postings.get(term)
+                if postings:
+                    idf = math.log(1 + total / len(postings[1]))
+                    candidates.append(((1 + math.log(count)) * idf, postings))
+            if len(candidates) < MIN_QUERY_TERMS:
+                return []
+
+            scores = {}
+            for factor, (weights, ids) in heapq.nlargest(MAX_QUERY_TERMS, candidates, key=itemgetter(0)):
+                start = max(0, len(ids) - POSTINGS_PER_TERM)
+                for doubt_id, weight in zip(ids[start:], weights[start:]):
+                    scores[doubt_id] = scores.get(doubt_id, 0.0) + factor * weight
+        return heapq.nlargest(k, scores.items(), key=itemgetter(1))
+
+    def save(self, path):
+        """Write the index to `path` atomically."""
+        temporary = f'{path}.tmp'
+        with self._lock, open(temporary, 'wb') as snapshot:
+            pickle.dump((FORMAT_VERSION, self._postings, array('q', self._terms)), snapshot, pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as snapshot:
+            version, postings, ids = pickle.load(snapshot)
+        if version != FORMAT_VERSION:
+            raise ValueError(f'{path} was written by an incompatible version; run rebuild_doubt_index')
+        index = cls()
+        index._postings = postings
+        # The snapshot only holds the postings; the forward map is derived
+        terms = {doubt_id: [] for doubt_id in ids}
+        for term, (_, term_ids) in postings.items():
+            for doubt_id in term_ids:
+                terms[doubt_id].append(term)
+        index._terms = {doubt_id: tuple(doubt_terms) for doubt_id, doubt_terms in terms.items()}
+        return index
+
+
+def _resolved_documents(batch_size=2000):
+    doubts = Doubt.objects.filter(status='resolved').order_by().only('pk', 'title', 'description', 'resolution')
+    for doubt in doubts.iterator(chunk_size=batch_size):
+        yield doubt.pk, {'title': doubt.title, 'description': doubt.description, 'resolution': doubt.resolution}
+
+
+def _file_id(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+class _Loaded:
+    """This process's copy of the index and how far into the journal it has read."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.index = None
+        self.snapshot = None
+        self.journal = None
+        self.offset = 0
+
+    def reset(self, index, snapshot=None, journal=None, offset=0):
+        self.index = index
+        self.snapshot = snapshot
+        self.journal = journal
+        self.offset = offset
+
+    def catch_up(self):
+        """Apply journal lines written since the last call, by this or any other process."""
+        try:
+            stat = os.stat(JOURNAL_PATH)
+        except FileNotFoundError:
+            return
+        if self.journal != stat.st_ino:
+            self.journal, self.offset = stat.st_ino, 0
+        if stat.st_size <= self.offset:
+            return
+
+        with open(JOURNAL_PATH, 'rb') as journal:
+            journal.seek(self.offset)
+            pending = journal.read(stat.st_size - self.offset)
+        # A line still being written is picked up next time
+        complete = pending[:pending.rfind(b'\n') + 1]
+        self.offset += len(complete)
+        for line in complete.splitlines():
+            entry = json.loads(line)
+            if entry['op'] == 'add':
+                self.index.add(entry['id'], entry['fields'])
+            else:
+                self.index.remove(entry['id'])
+
+    def sync(self):
+        """
+        Replay new journal lines into the current index, an empty one until a
+        snapshot is loaded, and return the id of the snapshot on disk (None if
+        there is none). Call with `lock` held.
+        """
+        if self.index is None:
+            self.reset(DoubtIndex())
+        self.catch_up()
+        return _file_id(INDEX_PATH)
+
+
+_loaded = _Loaded()
+_maintenance = None
+_maintenance_lock = threading.Lock()
+
+
+def _run_maintenance(function):
+    try:
+        function()
+    except Exception:
+        logger.exception('Doubt similarity index %s failed', function.__name__)
+    finally:
+        # The thread holds its own connection
+        connection.close()
+
+
+def _start_maintenance(function):
+    """Run `function` in a background thread unless a rebuild or compaction is already running."""
+    global _maintenance
+    with _maintenance_lock:
+        if _maintenance is not None and _maintenance.is_alive():
+            return False
+        _maintenance = threading.Thread(
+            target=_run_maintenance, args=(function,), name='doubt-index-maintenance', daemon=True
+        )
+        _maintenance.start()
+        return True
+
+
+def get_index():
+    """
+    This process's index, kept current with the journal. Empty until the first
+    snapshot exists, which is then built in the background, and until this
+    process has loaded it.
+    """
+    with _loaded.lock:
+        snapshot = _loaded.sync()
+        index, loaded, journal_size = _loaded.index, _loaded.snapshot, _loaded.offset
+    if snapshot is None:
+        if _start_maintenance(rebuild):
+            logger.warning('No doubt similarity index at %s; building it in the background', INDEX_PATH)
+    elif snapshot != loaded:
+        _start_maintenance(reload)
+    elif journal_size > JOURNAL_MAX_BYTES:
+        _start_maintenance(compact)
+    return index
+
+
+def suggest(text, k=5):
+    """Ids of up to `k` resolved doubts most similar to `text`, best first."""
+    return [doubt_id for doubt_id, _ in get_index().query(text, k)]
+
+
+@contextmanager
+def _journal_lock(exclusive=False):
+    """Shared while appending to the journal, exclusive while replacing it."""
+    if fcntl is None:
+        yield
+        return
+    with open(LOCK_PATH, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _append(entry):
+    line = (json.dumps(entry) + '\n').encode()
+    with _journal_lock():
+        # One O_APPEND write per entry keeps lines from concurrent processes whole
+        descriptor = os.open(JOURNAL_PATH, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(descriptor, line)
+        finally:
+            os.close(descriptor)
+
+
+def record(doubt):
+    """Queue `doubt` for indexing once the current transaction commits."""
+    entry = {
+        'op': 'add',
+        'id': doubt.pk,
+        'fields': {field: getattr(doubt, field) for field, _ in FIELD_WEIGHTS},
+    }
+    transaction.on_commit(lambda: _append(entry))
+
+
+def forget(doubt_id):
+    transaction.on_commit(lambda: _append({'op': 'remove', 'id': doubt_id}))
+
+
+def _journal_position():
+    try:
+        stat = os.stat(JOURNAL_PATH)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size
+
+
+def _replace_journal(content):
+    with open(f'{JOURNAL_PATH}.tmp', 'wb') as journal:
+        journal.write(content)
+    os.replace(f'{JOURNAL_PATH}.tmp', JOURNAL_PATH)
+
+
+def rebuild(batch_size=2000):
+    """Rebuild the snapshot from every resolved doubt and empty the journal. Returns the number indexed."""
+    # Entries appended while the database is read are carried over, since
+    # the rows they describe may have been read before they changed
+    start = _journal_position()
+    index = DoubtIndex.build(_resolved_documents(batch_size))
+
+    with _journal_lock(exclusive=True):
+        carried = b''
+        if os.path.exists(JOURNAL_PATH):
+            with open(JOURNAL_PATH, 'rb') as journal:
+                # A journal replaced by a compaction meanwhile is carried whole
+                if start is not None and os.fstat(journal.fileno()).st_ino == start[0]:
+                    journal.seek(start[1])
+                carried = journal.read()
+        index.save(INDEX_PATH)
+        _replace_journal(carried)
+        with _loaded.lock:
+            _loaded.reset(index, _file_id(INDEX_PATH))
+    return len(index)
+
+
+def reload():
+    """Load the snapshot on disk and swap it in for this process's index."""
+    fresh = _Loaded()
+    snapshot = _file_id(INDEX_PATH)
+    fresh.reset(DoubtIndex.load(INDEX_PATH), snapshot)
+    # Replayed before the swap, so queries only wait for lines written meanwhile
+    fresh.catch_up()
+    with _loaded.lock:
+        _loaded.reset(fresh.index, fresh.snapshot, fresh.journal, fresh.offset)
+        _loaded.catch_up()
+
+
+def compact():
+    """Fold the journal into a new snapshot of this process's index, then empty it."""
+    with _journal_lock(exclusive=True):
+        position = _journal_position()
+        if position is None or position[1] <= JOURNAL_MAX_BYTES:
+            # Another process compacted it first
+            return
+        with _loaded.lock:
+            snapshot = _loaded.sync()
+            if snapshot is None or snapshot != _loaded.snapshot:
+                # This process's index is not the snapshot's; it is reloaded first
+                return
+            index = _loaded.index
+        # Appends wait on the lock, so nothing can change the index meanwhile
+        index.save(INDEX_PATH)
+        _replace_journal(b'')
+        with _loaded.lock:
+            _loaded.reset(index, _file_id(INDEX_PATH))
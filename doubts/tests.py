@@ -1,3 +1,230 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from main.testing import AppTestCase, QueryBudgetMixin, make_user
+from . import dispatch, images, similar
+from .models import Doubt
+from .views import SimilarDoubtsView, TeacherDoubtDashboard
+
+
+class DoubtTestCase(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.teacher = make_user('teacher', 'teacher')
+
+    def use_temporary_index(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        index_path = f'{directory.name}/doubts.idx'
+        for name, suffix in (('INDEX_PATH', ''), ('JOURNAL_PATH', '.journal'), ('LOCK_PATH', '.lock')):
+            patcher = mock.patch.object(similar, name, index_path + suffix)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(similar._loaded.reset, None)
+
+    def add_doubts(self, count, **fields):
+        return Doubt.objects.bulk_create(
+            Doubt(title=f'Projectile range {number}', description='Why is the range largest at 45 degrees?',
+                  user=self.student, **fields)
+            for number in range(count)
+        )
+
+
+def photo():
+    """
+    A 3000x1500 JPEG, red on the left and blue on the right, tagged to be shown
+    rotated a quarter turn clockwise, as phone cameras held upright write them.
+    """
+    image = Image.new('RGB', (3000, 1500), 'blue')
+    image.paste('red', (0, 0, 1500, 1500))
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotate 90 degrees clockwise
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', exif=exif.tobytes())
+    return SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+
+def use_temporary_media(test):
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    settings_override = override_settings(MEDIA_ROOT=directory.name)
+    settings_override.enable()
+    test.addCleanup(settings_override.disable)
+    return directory.name
+
+
+class TeacherDashboardTests(QueryBudgetMixin, DoubtTestCase):
+    def test_teacher_dashboard_stays_within_budget(self):
+        def grow(size):
+            self.add_doubts(size)
+            self.add_doubts(size, status='in_progress', teacher=self.teacher)
+            self.add_doubts(size, status='resolved', teacher=self.teacher, resolution='Use sin 2 theta.',
+                            resolved_at=timezone.now())
+
+        self.client.force_login(self.teacher)
+        # Role names stay cached between requests; the budget is for a warm process
+        self.teacher.role_name
+        self.assertQueryBudgetHolds(TeacherDoubtDashboard, reverse('doubts:teacher_dashboard'), grow)
+
+
+class ClaimNextTests(DoubtTestCase):
+    def test_claims_stop_at_the_teacher_capacity(self):
+        self.add_doubts(dispatch.MAX_IN_PROGRESS + 1)
+        claimed = [dispatch.claim_next(self.teacher) for _ in range(dispatch.MAX_IN_PROGRESS)]
+        self.assertEqual(len({doubt.pk for doubt in claimed}), dispatch.MAX_IN_PROGRESS)
+        with self.assertRaises(ValueError):
+            dispatch.claim_next(self.teacher)
+        self.assertEqual(dispatch.in_progress_count(self.teacher), dispatch.MAX_IN_PROGRESS)
+        self.assertEqual(Doubt.objects.filter(status='submitted').count(), 1)
+
+    def test_assign_to_me_stops_at_the_teacher_capacity(self):
+        held = self.add_doubts(dispatch.MAX_IN_PROGRESS, status='in_progress', teacher=self.teacher)
+        waiting = self.add_doubts(1)[0]
+        self.client.force_login(self.teacher)
+        response = self.client.post(reverse('doubts:teacher_dashboard'),
+                                    {'action': 'assign_to_me', 'doubt_id': waiting.pk}, follow=True)
+        self.assertIn(f'You already have {dispatch.MAX_IN_PROGRESS} doubts in progress',
+                      [str(message) for message in response.context['messages']][0])
+        self.assertEqual(Doubt.objects.get(pk=waiting.pk).status, 'submitted')
+
+        Doubt.objects.filter(pk=held[0].pk).update(status='resolved')
+        self.assertEqual(dispatch.claim(waiting.pk, self.teacher).teacher, self.teacher)
+
+    def test_capacity_is_checked_by_the_claiming_update(self):
+        self.add_doubts(dispatch.MAX_IN_PROGRESS, status='in_progress', teacher=self.teacher)
+        waiting = self.add_doubts(1)[0]
+        # As if the teacher's other claims committed after any separate count
+        with mock.patch.object(dispatch, 'in_progress_count', return_value=0):
+            self.assertIsNone(dispatch.claim(waiting.pk, self.teacher))
+        self.assertEqual(Doubt.objects.get(pk=waiting.pk).status, 'submitted')
+
+
+class SimilarIndexTests(QueryBudgetMixin, DoubtTestCase):
+    RESOLVED = {'status': 'resolved', 'resolution': 'The range depends on sin 2 theta.'}
+
+    def setUp(self):
+        super().setUp()
+        self.use_temporary_index()
+
+    def fields(self, title):
+        return {'title': title, 'description': 'Why is the range largest at 45 degrees?', 'resolution': ''}
+
+    def test_similar_doubts_stays_within_budget(self):
+        def grow(size):
+            self.add_doubts(size - Doubt.objects.count(), teacher=self.teacher, resolved_at=timezone.now(),
+                            **self.RESOLVED)
+            similar.rebuild()
+
+        self.client.force_login(self.student)
+        url = reverse('doubts:similar') + '?q=projectile+range+largest+angle'
+        self.assertQueryBudgetHolds(SimilarDoubtsView, url, grow)
+        self.assertEqual(len(self.client.get(url).json()['doubts']), SimilarDoubtsView.limit)
+
+    def test_removing_a_doubt_only_touches_its_own_terms(self):
+        index = similar.DoubtIndex.build([(1, self.fields('Projectile range')), (2, self.fields('Optics lens'))])
+        index.add(3, self.fields('Projectile height'))
+        index.remove(1)
+        self.assertEqual(len(index), 2)
+        for weights, ids in index._postings.values():
+            self.assertNotIn(1, ids)
+            self.assertEqual(len(weights), len(ids))
+
+        index.save(similar.INDEX_PATH)
+        loaded = similar.DoubtIndex.load(similar.INDEX_PATH)
+        self.assertEqual({doubt_id: set(terms) for doubt_id, terms in loaded._terms.items()},
+                         {doubt_id: set(terms) for doubt_id, terms in index._terms.items()})
+        loaded.remove(3)
+        self.assertEqual([doubt_id for doubt_id, _ in loaded.query('range largest degrees', k=5)], [2])
+
+    def test_missing_snapshot_is_built_in_the_background(self):
+        self.add_doubts(3, teacher=self.teacher, resolved_at=timezone.now(), **self.RESOLVED)
+        # False: as if a rebuild were already running, which also keeps the warning quiet
+        with mock.patch.object(similar, '_start_maintenance', return_value=False) as start:
+            self.assertEqual(similar.suggest('projectile range largest degrees'), [])
+        start.assert_called_once_with(similar.rebuild)
+
+        similar.rebuild()
+        self.assertEqual(len(similar.suggest('projectile range largest degrees')), 3)
+
+    def test_journal_is_folded_into_the_snapshot_past_its_limit(self):
+        similar.rebuild()
+        for doubt_id in range(1, 6):
+            similar._append({'op': 'add', 'id': doubt_id, 'fields': self.fields(f'Projectile range {doubt_id}')})
+        similar._append({'op': 'remove', 'id': 5})
+
+        with mock.patch.object(similar, 'JOURNAL_MAX_BYTES', 100), \
+                mock.patch.object(similar, '_start_maintenance', side_effect=lambda function: function()):
+            similar.get_index()
+        self.assertEqual(os.path.getsize(similar.JOURNAL_PATH), 0)
+        self.assertEqual(sorted(similar.DoubtIndex.load(similar.INDEX_PATH)._terms), [1, 2, 3, 4])
+        self.assertEqual(len(similar.get_index()), 4)
+
+    def test_snapshot_written_by_another_process_is_loaded_in_the_background(self):
+        query = 'projectile range largest degrees'
+        similar.rebuild()
+        similar.DoubtIndex.build([(1, self.fields('Projectile range')), (2, self.fields('Projectile range'))]).save(
+            similar.INDEX_PATH
+        )
+        with mock.patch.object(similar, '_start_maintenance', return_value=True) as start, \
+                mock.patch.object(similar.DoubtIndex, 'load') as load:
+            self.assertEqual(similar.suggest(query), [])
+        start.assert_called_once_with(similar.reload)
+        load.assert_not_called()
+
+        similar._append({'op': 'remove', 'id': 2})
+        similar.reload()
+        self.assertEqual(similar.suggest(query), [1])
+
+
+class ImageProcessingTests(DoubtTestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = use_temporary_media(self)
+
+    def test_photo_is_turned_upright_bounded_and_replaced(self):
+        doubt = Doubt.objects.create(title='Projectile range', description='See photo', user=self.student, image=photo())
+        original = os.path.join(self.media_root, doubt.image.name)
+        self.assertTrue(os.path.exists(original))
+
+        self.assertTrue(images.process(doubt.pk))
+        doubt.refresh_from_db()
+        for field_name, size in (('image', (1024, 2048)), ('image_preview', (480, 960)), ('image_thumbnail', (160, 320))):
+            with self.subTest(field_name), Image.open(getattr(doubt, field_name).path) as rendition:
+                self.assertEqual(rendition.size, size)
+                # The red half of the sensor is now the top of the photo
+                red, green, blue = rendition.convert('RGB').getpixel((size[0] // 2, size[1] // 4))
+                self.assertGreater(red, 200)
+                self.assertLess(blue, 50)
+        self.assertFalse(os.path.exists(original))
+
+        self.assertFalse(images.process(doubt.pk))
+
+
+class ProcessDoubtImagesCommandTests(TransactionTestCase):
+    # The command processes doubts on worker threads, which only see committed rows
+
+    def setUp(self):
+        use_temporary_media(self)
+        self.student = make_user('student')
+
+    def test_command_skips_processed_doubts(self):
+        processed = Doubt.objects.create(title='Optics', description='See photo', user=self.student, image=photo())
+        images.process(processed.pk)
+        waiting = Doubt.objects.create(title='Projectile', description='See photo', user=self.student, image=photo())
+        Doubt.objects.create(title='Kinematics', description='No photo', user=self.student)
+
+        output = io.StringIO()
+        with mock.patch.object(images, 'process', wraps=images.process) as process:
+            call_command('process_doubt_images', stdout=output)
+        process.assert_called_once_with(waiting.pk)
+        self.assertIn('Processed 1 doubt images (0 failed)', output.getvalue())
+        self.assertTrue(Doubt.objects.get(pk=waiting.pk).image_thumbnail)
@@ -6,8 +6,11 @@ app_name = 'doubts'
 urlpatterns = [
     path('', views.DoubtListView.as_view(), name='list'),
     path('submit/', views.SubmitDoubtView.as_view(), name='submit'),
+    path('similar/', views.SimilarDoubtsView.as_view(), name='similar'),
     path('<int:doubt_id>/', views.DoubtDetailView.as_view(), name='detail'),
     path('<int:doubt_id>/resolve/', views.ResolveDoubtView.as_view(), name='resolve'),
     path('my-doubts/', views.MyDoubtsView.as_view(), name='my_doubts'),
     path('teacher-dashboard/', views.TeacherDoubtDashboard.as_view(), name='teacher_dashboard'),
+    path('teacher-dashboard/<str:list_name>/', views.TeacherDoubtPageView.as_view(), name='teacher_doubt_page'),
+    path('claim-next/', views.ClaimNextDoubtView.as_view(), name='claim_next'),
 ]
\ No newline at end of file
@@ -2,12 +2,18 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.views import View
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, TemplateView
-from django.urls import reverse_lazy
+from django.http import Http404, JsonResponse
+from django.urls import reverse, reverse_lazy
+from django.utils.text import Truncator
+from django.utils.timesince import timesince
 from django.db.models import Q
 from .models import Doubt
+from . import dispatch, images, similar
 from .forms import DoubtSubmissionForm, DoubtResolutionForm
 from accounts.models import User
+from main import events
 
 class DoubtListView(LoginRequiredMixin, ListView):
     model = Doubt
@@ -49,7 +55,38 @@ class SubmitDoubtView(LoginRequiredMixin, CreateView):
     def form_valid(self, form):
         form.instance.user = self.request.user
         messages.success(self.request, 'Doubt submitted successfully!')
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        # Resized off the request thread; templates fall back to the upload until then
+        images.schedule(self.object)
+        events.emit('doubt_submit', user=self.request.user.pk, doubt=self.object.pk,
+                    has_image=bool(self.object.image))
+        return response
+
+class SimilarDoubtsView(LoginRequiredMixin, View):
+    """Resolved doubts resembling the one being written, for the submit form's suggestions."""
+    query_budget = 3
+    limit = 5
+    
+    def get(self, request):
+        query = request.GET.get('q', '')[:2000]
+        doubt_ids = similar.suggest(query, k=self.limit)
+        # The index can briefly trail a doubt that was reopened or deleted
+        doubts = Doubt.objects.filter(pk__in=doubt_ids, status='resolved').only(
+            'id', 'title', 'resolution', 'resolved_at'
+        ).in_bulk()
+        
+        return JsonResponse({
+            'doubts': [
+                {
+                    'id': doubt.id,
+                    'title': doubt.title,
+                    'resolution': Truncator(doubt.resolution).words(60),
+                    'resolved': timesince(doubt.resolved_at) if doubt.resolved_at else '',
+                }
+                for doubt in (doubts.get(doubt_id) for doubt_id in doubt_ids)
+                if doubt is not None
+            ],
+        })
 
 class DoubtDetailView(LoginRequiredMixin, DetailView):
     model = Doubt
@@ -79,6 +116,8 @@ class ResolveDoubtView(LoginRequiredMixin, UpdateView):
     def form_valid(self, form):
         doubt = form.instance
         doubt.resolve(form.cleaned_data['resolution'], self.request.user)
+        events.emit('doubt_resolve', user=self.request.user.pk, doubt=doubt.pk,
+                    seconds_open=round((doubt.resolved_at - doubt.created_at).total_seconds()))
         messages.success(self.request, 'Doubt resolved successfully!')
         return redirect('doubts:detail', doubt_id=doubt.id)
     
@@ -94,37 +133,48 @@ class MyDoubtsView(LoginRequiredMixin, ListView):
     def get_queryset(self):
         return Doubt.objects.filter(user=self.request.user).order_by('-created_at')
 
-class TeacherDoubtDashboard(LoginRequiredMixin, TemplateView):
-    template_name = 'doubts/teacher_dashboard.html'
-    
+class TeacherRequiredMixin(LoginRequiredMixin):
     def dispatch(self, request, *args, **kwargs):
-        if not request.user.is_teacher and not request.user.is_admin:
+        if request.user.is_authenticated and not request.user.is_teacher and not request.user.is_admin:
             messages.error(request, 'Access denied. Teachers only.')
             return redirect('main:index')
         return super().dispatch(request, *args, **kwargs)
+
+class TeacherDoubtDashboard(TeacherRequiredMixin, TemplateView):
+    template_name = 'doubts/teacher_dashboard.html'
+    query_budget = 6
+    page_size = 10
+    
+    @staticmethod
+    def doubt_list(name, teacher):
+        """Queryset behind one of the dashboard's paged lists, or None for an unknown name."""
+        if name == 'pending':
+            doubts = Doubt.objects.filter(status='submitted')
+        elif name == 'assigned':
+            doubts = Doubt.objects.filter(teacher=teacher, status='in_progress')
+        else:
+            return None
+        return doubts.select_related('user')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        teacher = self.request.user
         
+        counts = Doubt.teacher_counts(teacher)
+        pending_doubts, pending_cursor = self.doubt_list('pending', teacher).newest_page(limit=self.page_size)
+        assigned_doubts, assigned_cursor = self.doubt_list('assigned', teacher).newest_page(limit=self.page_size)
         context.update({
-            'pending_doubts': Doubt.objects.filter(status='submitted').order_by('-created_at'),
-            'my_assigned_doubts': Doubt.objects.filter(
-                teacher=self.request.user,
-                status='in_progress'
-            ).order_by('-created_at'),
+            'pending_doubts': pending_doubts,
+            'pending_cursor': pending_cursor,
+            'my_assigned_doubts': assigned_doubts,
+            'assigned_cursor': assigned_cursor,
             'recently_resolved': Doubt.objects.filter(
-                teacher=self.request.user,
+                teacher=teacher,
                 status='resolved'
-            ).order_by('-resolved_at')[:10],
-            'total_pending': Doubt.objects.filter(status='submitted').count(),
-            'total_assigned': Doubt.objects.filter(
-                teacher=self.request.user,
-                status='in_progress'
-            ).count(),
-            'total_resolved': Doubt.objects.filter(
-                teacher=self.request.user,
-                status='resolved'
-            ).count(),
+            ).select_related('user').order_by('-resolved_at')[:10],
+            'total_pending': counts['pending'],
+            'total_assigned': counts['assigned'],
+            'total_resolved': counts['resolved'],
         })
         return context
     
@@ -133,9 +183,61 @@ class TeacherDoubtDashboard(LoginRequiredMixin, TemplateView):
         doubt_id = request.POST.get('doubt_id')
         action = request.POST.get('action')
         
-        if action == 'assign_to_me':
-            doubt = get_object_or_404(Doubt, id=doubt_id, status='submitted')
-            doubt.assign_to_teacher(request.user)
-            messages.success(request, f'Doubt "{doubt.title}" assigned to you.')
+        if action == 'assign_to_me' and doubt_id and doubt_id.isdigit():
+            # Only one of several teachers claiming at once gets the doubt
+            try:
+                doubt = dispatch.claim(doubt_id, request.user)
+            except ValueError as e:
+                messages.error(request, str(e))
+                return redirect('doubts:teacher_dashboard')
+            if doubt:
+                events.emit('doubt_claim', user=request.user.pk, doubt=doubt.pk, queue=False)
+                messages.success(request, f'Doubt "{doubt.title}" assigned to you.')
+            else:
+                messages.warning(request, 'That doubt was already taken by another teacher.')
+        
+        return redirect('doubts:teacher_dashboard')
+
+class ClaimNextDoubtView(TeacherRequiredMixin, View):
+    """Assign the teacher the oldest waiting doubt and open it."""
+    
+    def post(self, request):
+        try:
+            doubt = dispatch.claim_next(request.user)
+        except ValueError as e:
+            messages.error(request, str(e))
+            return redirect('doubts:teacher_dashboard')
+        
+        if doubt is None:
+            messages.info(request, 'No doubts are waiting right now.')
+            return redirect('doubts:teacher_dashboard')
+        events.emit('doubt_claim', user=request.user.pk, doubt=doubt.pk, queue=True)
+        messages.success(request, f'Doubt "{doubt.title}" assigned to you.')
+        return redirect('doubts:detail', doubt_id=doubt.id)
+
+class TeacherDoubtPageView(TeacherRequiredMixin, View):
+    """Next page of a teacher dashboard list, for its "Load more" button."""
+    
+    def get(self, request, list_name):
+        doubts = TeacherDoubtDashboard.doubt_list(list_name, request.user)
+        if doubts is None:
+            raise Http404('Unknown doubt list')
+        doubts, next_cursor = doubts.newest_page(
+            cursor=request.GET.get('cursor'), limit=TeacherDoubtDashboard.page_size
+        )
         
-        return redirect('doubts:teacher_dashboard')
\ No newline at end of file
+        return JsonResponse({
+            'doubts': [
+                {
+                    'id': doubt.id,
+                    'title': Truncator(doubt.title).chars(40),
+                    'description': Truncator(doubt.description).words(15),
+                    'user': doubt.user.get_full_name() or doubt.user.username,
+                    'submitted': timesince(doubt.created_at),
+                    'detail_url': reverse('doubts:detail', args=[doubt.id]),
+                    'resolve_url': reverse('doubts:resolve', args=[doubt.id]),
+                }
+                for doubt in doubts
+            ],
+            'next_cursor': next_cursor,
+        })
\ No newline at end of file
@@ -0,0 +1,169 @@
+"""
+Append-only log of learning events for analytics.
+
+Views record what learners do with `emit('lecture_view', user=..., lecture=...)`.
+emit only appends a tuple to an in-process buffer. A background thread
+serialises the buffer every FLUSH_INTERVAL seconds, or as soon as FLUSH_SIZE
+events are waiting, and appends it as one gzip member to this process's
+segment file for the hour (UTC) under EVENT_LOG_DIR:
+
+    2026/10/18/07-<host>-<pid>.jsonl.gz
+
+Each line is `{"ts": <unix seconds>, "event": <name>, ...fields}`. Segments
+are only ever appended to, and a new one starts every hour, so offline jobs
+read them without touching the database; `read(start, end)` streams the
+events in a time range from every segment, merged by timestamp. If the
+writer falls MAX_BUFFERED events behind, further events are dropped rather
+than slowing requests down.
+"""
+import atexit
+import calendar
+import glob
+import gzip
+import heapq
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+LOG_DIR = str(getattr(settings, 'EVENT_LOG_DIR', settings.BASE_DIR / 'events'))
+FLUSH_INTERVAL = getattr(settings, 'EVENT_LOG_FLUSH_INTERVAL', 1.0)
+FLUSH_SIZE = 1000
+MAX_BUFFERED = 100000
+COMPRESS_LEVEL = 6
+SEGMENT_HOUR = '%Y/%m/%d/%H'
+SEGMENT_SECONDS = 3600
+
+
+def _timestamp(value):
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, datetime):
+        return value.timestamp()
+    raise ValueError(f'Expected a datetime or unix timestamp, got {value!r}')
+
+
+def _read_segment(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as segment:
+        try:
+            for line in segment:
+                yield json.loads(line)
+        except (EOFError, gzip.BadGzipFile, ValueError):
+            # The last member is still being written, or its writer died mid-write
+            return
+
+
+class EventLog:
+    def __init__(self, directory):
+        self.directory = directory
+        self.dropped = 0
+        self._buffer = deque()
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._writer_lock = threading.Lock()
+        self._writer_pid = None
+
+    def emit(self, event, **fields):
+        """Record `event` with JSON-serialisable `fields`. Never waits on I/O."""
+        if self._writer_pid != os.getpid():
+            self._start_writer()
+        if len(self._buffer) >= MAX_BUFFERED:
+            self.dropped += 1
+            return
+        self._buffer.append((time.time(), event, fields))
+        if len(self._buffer) >= FLUSH_SIZE:
+            self._wakeup.set()
+
+    def _start_writer(self):
+        with self._writer_lock:
+            if self._writer_pid == os.getpid():
+                return
+            if self._writer_pid is not None:
+                # A forked child inherits the parent's unwritten events but
+                # not its writer thread; the parent writes those itself
+                self._buffer.clear()
+            else:
+                atexit.register(self.flush)
+            self._writer_pid = os.getpid()
+            threading.Thread(target=self._write_loop, name='event-log', daemon=True).start()
+
+    def _write_loop(self):
+        while True:
+            self._wakeup.wait(FLUSH_INTERVAL)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Could not write events to %s', self.directory)
+
+    def _segment_path(self, hour):
+        name = f'{time.strftime(SEGMENT_HOUR, time.gmtime(hour * SEGMENT_SECONDS))}-{socket.gethostname()}-{os.getpid()}'
+        return os.path.join(self.directory, f'{name}.jsonl.gz')
+
+    def flush(self):
+        """Write every buffered event to its segment now. Returns the number written."""
+        with self._flush_lock:
+            batch = []
+            while self._buffer:
+                batch.append(self._buffer.popleft())
+            batch.sort(key=itemgetter(0))
+
+            for hour, events in groupby(batch, key=lambda item: int(item[0] // SEGMENT_SECONDS)):
+                lines = ''.join(
+                    json.dumps({'ts': ts, 'event': event, **fields}, default=str, separators=(',', ':')) + '\n'
+                    for ts, event, fields in events
+                )
+                path = self._segment_path(hour)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Each flush is a complete gzip member; readers see concatenated
+                # members as one stream
+                with open(path, 'ab') as segment:
+                    segment.write(gzip.compress(lines.encode(), COMPRESS_LEVEL))
+            return len(batch)
+
+    def segments(self, start=None, end=None):
+        """`(hour start, path)` of every segment that can hold events in [start, end), oldest first."""
+        start, end = _timestamp(start), _timestamp(end)
+        found = []
+        for path in glob.glob(os.path.join(self.directory, '*', '*', '*', '*.jsonl.gz')):
+            relative = os.path.relpath(path, self.directory).replace(os.sep, '/')
+            try:
+                hour = calendar.timegm(time.strptime(relative[:13], SEGMENT_HOUR))
+            except ValueError:
+                continue
+            if (start is None or hour + SEGMENT_SECONDS > start) and (end is None or hour < end):
+                found.append((hour, path))
+        return sorted(found)
+
+    def read(self, start=None, end=None, events=None):
+        """
+        Stream events with start <= ts < end (datetimes or unix timestamps),
+        oldest first, from every process's segments. `events` limits the
+        stream to those event names.
+        """
+        start, end = _timestamp(start), _timestamp(end)
+        events = set(events) if events else None
+        for _, hour_segments in groupby(self.segments(start, end), key=itemgetter(0)):
+            streams = [_read_segment(path) for _, path in hour_segments]
+            for record in heapq.merge(*streams, key=itemgetter('ts')):
+                if start is not None and record['ts'] < start:
+                    continue
+                if end is not None and record['ts'] >= end:
+                    continue
+                if events is None or record['event'] in events:
+                    yield record
+
+
+default_log = EventLog(LOG_DIR)
+emit = default_log.emit
+flush = default_log.flush
+read = default_log.read
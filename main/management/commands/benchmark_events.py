@@ -0,0 +1,51 @@
+import os
+import tempfile
+import time
+from django.core.management.base import BaseCommand
+from main.events import EventLog
+
+
+class Command(BaseCommand):
+    help = 'Measure the request-path cost of emitting events and the throughput of writing and reading them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=200000)
+        parser.add_argument('--rate', type=int, default=20000, help='Events emitted per second, in bursts of 100')
+
+    def handle(self, *args, **options):
+        count = options['events']
+        with tempfile.TemporaryDirectory() as directory:
+            log = EventLog(directory)
+            log.emit('warmup')
+            log.flush()
+
+            # Emitted in bursts while the background writer runs, as under
+            # traffic; only time spent inside emit is counted
+            emitted = 0.0
+            burst = 100
+            started_run = time.perf_counter()
+            for first in range(0, count, burst):
+                started = time.perf_counter()
+                for i in range(first, min(first + burst, count)):
+                    log.emit('lecture_view', user=i % 5000, lecture=i % 700, subject=i % 40)
+                emitted += time.perf_counter() - started
+                delay = started_run + (first + burst) / options['rate'] - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            self.stdout.write(
+                f"emit: {emitted / count * 1e6:.2f}µs per event over {count} events at {options['rate']}/s "
+                f"({log.dropped} dropped)"
+            )
+
+            started = time.perf_counter()
+            log.flush()
+            self.stdout.write(f"final flush: {(time.perf_counter() - started) * 1000:.0f}ms")
+            size = sum(os.path.getsize(path) for _, path in log.segments())
+
+            started = time.perf_counter()
+            read = sum(1 for _ in log.read(events=['lecture_view']))
+            elapsed = time.perf_counter() - started
+            self.stdout.write(self.style.SUCCESS(
+                f"read back {read} events in {elapsed:.2f}s ({read / elapsed:,.0f}/s), "
+                f"{size / max(1, read):.1f} bytes per event on disk"
+            ))
@@ -0,0 +1,71 @@
+import itertools
+import random
+import time
+from django.core.management.base import BaseCommand
+from main import search
+from main.models import SearchDocument
+
+SYLLABLES = ['ka', 'mo', 'ri', 'te', 'lu', 'shi', 'no', 'va', 'pe', 'zo', 'gri', 'tan', 'bel', 'dor', 'fum']
+
+
+def build_vocabulary(rng, size):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    return sorted(words)
+
+
+class Command(BaseCommand):
+    help = 'Measure search latency over a synthetic corpus (rows are removed afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000, help='Synthetic documents to index')
+        parser.add_argument('--queries', type=int, default=200, help='Queries to time')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Documents inserted per query')
+        parser.add_argument('--vocabulary', type=int, default=20000, help='Distinct words in the corpus')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--keep', action='store_true', help='Keep the synthetic rows')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        backend = search.get_backend()
+        words = build_vocabulary(rng, options['vocabulary'])
+        # Zipf-like word frequencies, as in natural text
+        cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(words) + 1)))
+
+        self.stdout.write(f"Indexing {options['rows']} synthetic documents...")
+        started = time.perf_counter()
+        documents = []
+        for object_id in range(1, options['rows'] + 1):
+            documents.append(SearchDocument(
+                kind='synthetic',
+                object_id=object_id,
+                title=' '.join(rng.choices(words, cum_weights=cum_weights, k=4)),
+                body=' '.join(rng.choices(words, cum_weights=cum_weights, k=40)),
+            ))
+            if len(documents) >= options['batch_size']:
+                SearchDocument.objects.bulk_create(documents)
+                documents = []
+        SearchDocument.objects.bulk_create(documents)
+        backend.optimize()
+        self.stdout.write(f"Indexed in {time.perf_counter() - started:.1f}s")
+
+        try:
+            timings = []
+            for _ in range(options['queries']):
+                # Search terms are content words, so draw them uniformly rather than by frequency
+                match = backend.build_query(' '.join(rng.choices(words, k=rng.randint(1, 3))))
+                started = time.perf_counter()
+                backend.count(match)
+                backend.fetch(match, 0, 20)
+                timings.append((time.perf_counter() - started) * 1000)
+
+            timings.sort()
+            p50 = timings[len(timings) // 2]
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            self.stdout.write(self.style.SUCCESS(
+                f"{len(timings)} queries: p50 {p50:.1f}ms, p95 {p95:.1f}ms, max {timings[-1]:.1f}ms"
+            ))
+        finally:
+            if not options['keep']:
+                SearchDocument.objects.filter(kind='synthetic').delete()
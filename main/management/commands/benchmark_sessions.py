@@ -0,0 +1,99 @@
+import time
+from importlib import import_module
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from main.middleware import SessionTouchMiddleware
+
+ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+
+
+def logged_in_view(request):
+    # Reads the session the way AuthenticationMiddleware does for request.user
+    request.session.get('_auth_user_id')
+    return HttpResponse('ok')
+
+
+class SimulatedClockMiddleware(SessionTouchMiddleware):
+    clock = 0.0
+
+    def now(self):
+        return self.clock
+
+
+class SessionQueryCounter:
+    """connection.execute_wrapper that counts reads and writes on django_session."""
+
+    def __init__(self):
+        self.reads = 0
+        self.writes = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if 'django_session' in sql:
+            if sql.startswith('SELECT'):
+                self.reads += 1
+            elif sql.startswith(('INSERT', 'UPDATE', 'DELETE')):
+                self.writes += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = 'Count session reads and writes per N logged-in requests, saving every request vs. throttled touches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--interval', type=float, default=30,
+                            help='Simulated seconds between requests')
+        parser.add_argument('--engines', default=','.join(ENGINES),
+                            help=f"Comma-separated session engines: {', '.join(ENGINES)}")
+
+    def run(self, engine, throttled, requests, interval):
+        """Return (reads, writes, cookies set) for `requests` requests on one session."""
+        with override_settings(SESSION_ENGINE=ENGINES[engine], SESSION_SAVE_EVERY_REQUEST=not throttled):
+            SimulatedClockMiddleware.clock = time.time()
+            handler = SimulatedClockMiddleware(logged_in_view) if throttled else logged_in_view
+            handler = SessionMiddleware(handler)
+
+            session = import_module(settings.SESSION_ENGINE).SessionStore()
+            session['_auth_user_id'] = '1'
+            session.save()
+            cookie = session.session_key
+
+            factory = RequestFactory()
+            counter = SessionQueryCounter()
+            cookies = 0
+            with connection.execute_wrapper(counter):
+                for _ in range(requests):
+                    request = factory.get('/')
+                    request.COOKIES[settings.SESSION_COOKIE_NAME] = cookie
+                    response = handler(request)
+                    if settings.SESSION_COOKIE_NAME in response.cookies:
+                        cookie = response.cookies[settings.SESSION_COOKIE_NAME].value
+                        cookies += 1
+                    SimulatedClockMiddleware.clock += interval
+
+            session.delete(cookie)
+            return counter.reads, counter.writes, cookies
+
+    def handle(self, *args, **options):
+        requests = options['requests']
+        interval = options['interval']
+        fraction = getattr(settings, 'SESSION_TOUCH_FRACTION', 0.1)
+        self.stdout.write(
+            f"{requests} requests, one every {interval:g}s, SESSION_COOKIE_AGE={settings.SESSION_COOKIE_AGE}, "
+            f"SESSION_TOUCH_FRACTION={fraction:g}"
+        )
+        self.stdout.write(f"{'engine':<16}{'mode':<16}{'db reads':>10}{'db writes':>11}{'cookies set':>13}")
+        for engine in options['engines'].split(','):
+            for throttled in (False, True):
+                reads, writes, cookies = self.run(engine, throttled, requests, interval)
+                mode = 'throttled' if throttled else 'every request'
+                self.stdout.write(f"{engine:<16}{mode:<16}{reads:>10}{writes:>11}{cookies:>13}")
+        self.stdout.write(self.style.SUCCESS('Done'))
@@ -0,0 +1,29 @@
+import json
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from main import events
+
+
+def parse_time(value):
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Not an ISO date or time: {value}')
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+
+class Command(BaseCommand):
+    help = 'Write logged learning events in a time range to stdout as JSON lines, oldest first'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=parse_time, help='ISO date or time (inclusive)')
+        parser.add_argument('--end', type=parse_time, help='ISO date or time (exclusive)')
+        parser.add_argument('--event', action='append', dest='events', help='Only this event; may be repeated')
+
+    def handle(self, *args, **options):
+        count = 0
+        for record in events.read(options['start'], options['end'], options['events']):
+            self.stdout.write(json.dumps(record, separators=(',', ':')))
+            count += 1
+        self.stderr.write(self.style.SUCCESS(f'Exported {count} events'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from main import search
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index from subjects, lectures, quizzes, batch lectures and DPPs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of documents inserted per query')
+
+    def handle(self, *args, **options):
+        total = search.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} documents'))
@@ -0,0 +1,38 @@
+import time
+from django.conf import settings
+
+TOUCHED_KEY = '_touched_at'
+
+
+class SessionTouchMiddleware:
+    """
+    Sliding session expiry without a session write on every request.
+
+    Instead of SESSION_SAVE_EVERY_REQUEST, the session remembers when it was
+    last saved and is saved again only once that is more than
+    SESSION_TOUCH_FRACTION of SESSION_COOKIE_AGE ago. Saving extends both the
+    stored expiry and the cookie, so an idle session still expires between
+    (1 - fraction) * SESSION_COOKIE_AGE and SESSION_COOKIE_AGE after the last
+    request. Requests that never read the session do not extend it.
+
+    Must come after SessionMiddleware so it runs before the session is saved.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.interval = settings.SESSION_COOKIE_AGE * getattr(settings, 'SESSION_TOUCH_FRACTION', 0.1)
+
+    def now(self):
+        return time.time()
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        session = getattr(request, 'session', None)
+        if session is None or not session.accessed or session.is_empty():
+            return response
+
+        now = self.now()
+        # Sessions about to be saved anyway just restart the interval
+        if session.modified or now - session.get(TOUCHED_KEY, 0) >= self.interval:
+            session[TOUCHED_KEY] = int(now)
+        return response
@@ -0,0 +1,70 @@
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE main_searchdocument_fts USING fts5(
+        title, body, content='main_searchdocument', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER main_searchdocument_ai AFTER INSERT ON main_searchdocument BEGIN
+        INSERT INTO main_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER main_searchdocument_ad AFTER DELETE ON main_searchdocument BEGIN
+        INSERT INTO main_searchdocument_fts(main_searchdocument_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER main_searchdocument_au AFTER UPDATE ON main_searchdocument BEGIN
+        INSERT INTO main_searchdocument_fts(main_searchdocument_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO main_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS main_searchdocument_au",
+    "DROP TRIGGER IF EXISTS main_searchdocument_ad",
+    "DROP TRIGGER IF EXISTS main_searchdocument_ai",
+    "DROP TABLE IF EXISTS main_searchdocument_fts",
+]
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE main_searchdocument ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(body, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX main_searchdocument_vector_idx ON main_searchdocument USING GIN (search_vector)",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS main_searchdocument_vector_idx",
+    "ALTER TABLE main_searchdocument DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            run_for_vendor({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRES_REVERSE}),
+        ),
+    ]
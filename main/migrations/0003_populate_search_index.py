@@ -0,0 +1,21 @@
+from django.db import migrations
+
+from main import search
+
+
+def populate_search_index(apps, schema_editor):
+    search.rebuild(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_search_index'),
+        ('batches', '0012_backfill_video_embeds'),
+        ('courses', '0002_completion_rollups'),
+        ('quizzes', '0003_item_statistics'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_search_index, migrations.RunPython.noop),
+    ]
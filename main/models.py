@@ -1,3 +1,26 @@
 from django.db import models
 
-# Create your models here.
+class SearchDocument(models.Model):
+    """
+    One searchable piece of content. The full-text index over these rows is
+    backend specific (FTS5 on SQLite, tsvector + GIN on PostgreSQL) and is
+    created by migration 0002; see main.search.
+    """
+    KINDS = [
+        ('subject', 'Subject'),
+        ('lecture', 'Lecture'),
+        ('quiz', 'Quiz'),
+        ('batch_lecture', 'Batch Lecture'),
+        ('dpp', 'DPP'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KINDS)
+    object_id = models.PositiveIntegerField()
+    title = models.CharField(max_length=300)
+    body = models.TextField(blank=True)
+    
+    class Meta:
+        unique_together = ['kind', 'object_id']
+    
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.title}"
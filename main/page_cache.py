@@ -0,0 +1,69 @@
+"""
+Full-page cache for anonymous catalog pages.
+
+Pages are keyed by path, query string and a content-version token. The token is
+bumped whenever catalog content changes (see main.signals), so edits show up on
+the next request instead of after the cache timeout.
+"""
+import hashlib
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+VERSION_KEY = 'pagecache:version'
+PAGE_CACHE_TIMEOUT = getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 10)
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def bump_version():
+    """Invalidate every cached page by moving to a new content version."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, None)
+
+
+def page_key(request):
+    digest = hashlib.md5(request.get_full_path().encode(), usedforsecurity=False).hexdigest()
+    return f'pagecache:{get_version()}:{digest}'
+
+
+class AnonymousPageCacheMixin:
+    """Serve GET requests from logged-out visitors out of the page cache."""
+    
+    def dispatch(self, request, *args, **kwargs):
+        if not self.is_cacheable(request):
+            return super().dispatch(request, *args, **kwargs)
+        
+        key = page_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+            patch_vary_headers(response, ['Cookie'])
+            return response
+        
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            if hasattr(response, 'render'):
+                response.render()
+            cache.set(key, (response.content, response['Content-Type']), PAGE_CACHE_TIMEOUT)
+        patch_vary_headers(response, ['Cookie'])
+        return response
+    
+    def is_cacheable(self, request):
+        return (
+            request.method in ('GET', 'HEAD')
+            and not request.user.is_authenticated
+            # Pending flash messages are rendered into the page and must not be shared
+            and not len(messages.get_messages(request))
+        )
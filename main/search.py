@@ -0,0 +1,217 @@
+"""
+Full-text search over subjects, lectures, quizzes, batch lectures and DPPs.
+
+Searchable content is mirrored into SearchDocument rows, kept in sync by model
+signals (see main.signals), first filled by migration 0003 and rebuilt with
+`manage.py rebuild_search_index`.
+Ranking, highlighting and matching are done by the database: an FTS5 virtual
+table on SQLite and a weighted tsvector with a GIN index on PostgreSQL.
+"""
+import re
+from django.apps import apps as global_apps
+from django.core.paginator import Paginator
+from django.db import connection
+from django.urls import reverse
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from .models import SearchDocument
+
+# Highlight sentinels; the highlighted text is HTML-escaped before these are
+# swapped for <mark> tags
+MARK_START = '⟦'
+MARK_END = '⟧'
+MAX_QUERY_TERMS = 10
+
+
+def _sources(apps=global_apps):
+    """kind: (model, title field, body fields, detail url name), with models from the `apps` registry."""
+    return {
+        'subject': (apps.get_model('courses.Subject'), 'name', ('description',), 'courses:subject_detail'),
+        'lecture': (apps.get_model('courses.Lecture'), 'title', ('description',), 'courses:lecture_detail'),
+        'quiz': (apps.get_model('quizzes.Quiz'), 'title', ('description',), 'quizzes:detail'),
+        'batch_lecture': (apps.get_model('batches.Lecture'), 'topic_name', ('description',), 'batches:lecture_detail'),
+        'dpp': (apps.get_model('batches.DPP'), 'title', ('description',), 'batches:dpp_detail'),
+    }
+
+
+def _kind_for(model):
+    for kind, (source_model, *_) in _sources().items():
+        if source_model is model:
+            return kind
+    return None
+
+
+def _document_fields(kind, instance):
+    _, title_field, body_fields, _ = _sources()[kind]
+    return {
+        'title': getattr(instance, title_field) or '',
+        'body': '\n'.join(getattr(instance, field) or '' for field in body_fields),
+    }
+
+
+def index_instance(instance):
+    kind = _kind_for(type(instance))
+    if kind:
+        SearchDocument.objects.update_or_create(
+            kind=kind, object_id=instance.pk, defaults=_document_fields(kind, instance)
+        )
+
+
+def remove_instance(instance):
+    kind = _kind_for(type(instance))
+    if kind:
+        SearchDocument.objects.filter(kind=kind, object_id=instance.pk).delete()
+
+
+def rebuild(batch_size=1000, apps=global_apps):
+    """
+    Repopulate every SearchDocument from the source models. Returns the number
+    indexed. Migrations pass their historical `apps`.
+    """
+    documents_model = apps.get_model('main.SearchDocument')
+    documents_model.objects.all().delete()
+    total = 0
+    for kind, (model, title_field, body_fields, _) in _sources(apps).items():
+        documents = []
+        for instance in model.objects.only('pk', title_field, *body_fields).iterator(chunk_size=batch_size):
+            documents.append(documents_model(kind=kind, object_id=instance.pk, **_document_fields(kind, instance)))
+            if len(documents) >= batch_size:
+                documents_model.objects.bulk_create(documents)
+                total += len(documents)
+                documents = []
+        documents_model.objects.bulk_create(documents)
+        total += len(documents)
+    get_backend().optimize()
+    return total
+
+
+def _render_highlight(text):
+    return mark_safe(escape(text).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>'))
+
+
+class SQLiteBackend:
+    def build_query(self, query):
+        terms = re.findall(r'\w+', query)[:MAX_QUERY_TERMS]
+        # Quote every term so user input can never be parsed as FTS5 syntax
+        return ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+    
+    def count(self, match):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM main_searchdocument_fts WHERE main_searchdocument_fts MATCH %s",
+                [match]
+            )
+            return cursor.fetchone()[0]
+    
+    def fetch(self, match, offset, limit):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT d.kind, d.object_id,
+                       highlight(main_searchdocument_fts, 0, %s, %s),
+                       snippet(main_searchdocument_fts, 1, %s, %s, '...', 24)
+                FROM main_searchdocument_fts
+                JOIN main_searchdocument d ON d.id = main_searchdocument_fts.rowid
+                WHERE main_searchdocument_fts MATCH %s
+                ORDER BY bm25(main_searchdocument_fts, 10.0, 1.0)
+                LIMIT %s OFFSET %s
+                """,
+                [MARK_START, MARK_END, MARK_START, MARK_END, match, limit, offset]
+            )
+            return cursor.fetchall()
+    
+    def optimize(self):
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO main_searchdocument_fts(main_searchdocument_fts) VALUES ('optimize')")
+
+
+class PostgresBackend:
+    HEADLINE_OPTIONS = f"StartSel={MARK_START}, StopSel={MARK_END}"
+    
+    def build_query(self, query):
+        return ' '.join(re.findall(r'\w+', query)[:MAX_QUERY_TERMS])
+    
+    def count(self, match):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM main_searchdocument "
+                "WHERE search_vector @@ websearch_to_tsquery('english', %s)",
+                [match]
+            )
+            return cursor.fetchone()[0]
+    
+    def fetch(self, match, offset, limit):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT kind, object_id,
+                       ts_headline('english', title, q, %s),
+                       ts_headline('english', body, q, %s)
+                FROM (
+                    SELECT id, kind, object_id, title, body, q
+                    FROM main_searchdocument, websearch_to_tsquery('english', %s) q
+                    WHERE search_vector @@ q
+                    ORDER BY ts_rank(search_vector, q) DESC, id
+                    LIMIT %s OFFSET %s
+                ) ranked
+                """,
+                [f"{self.HEADLINE_OPTIONS}, HighlightAll=true",
+                 f"{self.HEADLINE_OPTIONS}, MaxWords=35, MinWords=15",
+                 match, limit, offset]
+            )
+            return cursor.fetchall()
+    
+    def optimize(self):
+        pass
+
+
+def get_backend():
+    if connection.vendor == 'postgresql':
+        return PostgresBackend()
+    return SQLiteBackend()
+
+
+class SearchResults:
+    """Lazily evaluated, sliceable ranked results so Paginator only fetches one page."""
+    
+    def __init__(self, backend, match):
+        self.backend = backend
+        self.match = match
+        self._count = None
+    
+    def count(self):
+        if self._count is None:
+            self._count = self.backend.count(self.match) if self.match else 0
+        return self._count
+    
+    def __len__(self):
+        return self.count()
+    
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError("SearchResults only supports slicing")
+        offset = index.start or 0
+        limit = (index.stop if index.stop is not None else self.count()) - offset
+        if not self.match or limit <= 0:
+            return []
+        
+        sources = _sources()
+        return [
+            {
+                'kind': kind,
+                'kind_label': dict(SearchDocument.KINDS).get(kind, kind),
+                'object_id': object_id,
+                'title': _render_highlight(title),
+                'snippet': _render_highlight(snippet or ''),
+                'url': reverse(sources[kind][3], args=[object_id]),
+            }
+            for kind, object_id, title, snippet in self.backend.fetch(self.match, offset, limit)
+            if kind in sources
+        ]
+
+
+def search(query, page=1, per_page=20):
+    """Return a Paginator page of ranked, highlighted results for `query`."""
+    backend = get_backend()
+    paginator = Paginator(SearchResults(backend, backend.build_query(query)), per_page)
+    return paginator.get_page(page)
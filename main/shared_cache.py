@@ -0,0 +1,15 @@
+"""
+Whether Django's cache is shared between worker processes.
+
+Deleting a key only reaches other workers through a shared backend (Redis,
+Memcached, the database or files). LocMemCache and DummyCache keep a copy per
+process, so features that rely on cross-process invalidation, or on handing
+data to another process through the cache, check this and fall back.
+"""
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def is_shared(alias='default'):
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
@@ -0,0 +1,50 @@
+import time
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from batches.models import Batch, Category, Lecture as BatchLecture, DPP
+from courses.models import Subject, Lecture
+from quizzes.models import Quiz
+from . import search
+from .middleware import TOUCHED_KEY
+from .page_cache import bump_version
+
+
+@receiver(post_save, sender=Subject)
+@receiver(post_delete, sender=Subject)
+@receiver(post_save, sender=Lecture)
+@receiver(post_delete, sender=Lecture)
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+@receiver(post_save, sender=Batch)
+@receiver(post_delete, sender=Batch)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_page_cache(sender, **kwargs):
+    bump_version()
+
+
+@receiver(post_save, sender=Subject)
+@receiver(post_save, sender=Lecture)
+@receiver(post_save, sender=Quiz)
+@receiver(post_save, sender=BatchLecture)
+@receiver(post_save, sender=DPP)
+def update_search_document(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_instance(instance)
+
+
+@receiver(post_delete, sender=Subject)
+@receiver(post_delete, sender=Lecture)
+@receiver(post_delete, sender=Quiz)
+@receiver(post_delete, sender=BatchLecture)
+@receiver(post_delete, sender=DPP)
+def remove_search_document(sender, instance, **kwargs):
+    search.remove_instance(instance)
+
+
+@receiver(user_logged_in)
+def start_session_touch_interval(sender, request, **kwargs):
+    # Logging in saves the session, so the next touch is a full interval away
+    if hasattr(request, 'session'):
+        request.session[TOUCHED_KEY] = int(time.time())
@@ -1,5 +1,6 @@
 from django import template
 from django.utils.safestring import mark_safe
+from accounts.entitlements import has_access as user_has_access
 
 register = template.Library()
 
@@ -81,4 +82,9 @@ def pluralize(value, suffix='s'):
             return ''
         return suffix
     except (ValueError, TypeError):
-        return suffix
\ No newline at end of file
+        return suffix
+
+@register.filter
+def has_access(user, obj):
+    """Check whether user is entitled to a batch or course object"""
+    return user_has_access(user, obj)
@@ -0,0 +1,89 @@
+"""
+Test helpers shared across apps.
+
+make_user creates users of any role, and AppTestCase starts each test with an
+empty cache and a student. Views that promise a fixed number of queries
+declare it as a `query_budget` class attribute; QueryBudgetMixin checks that
+promise against growing data. TestRunner keeps the events tests emit out of
+the real EVENT_LOG_DIR.
+"""
+import tempfile
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext
+
+
+def make_user(username, role='student', **fields):
+    """
+    Create a user with the `role` Role, creating the role if needed. No
+    password is set, which skips the slow hashing; log in with force_login.
+    """
+    from accounts.models import Role, User
+
+    return User.objects.create(
+        username=username, email=f'{username}@example.com', role=Role.objects.get_or_create(name=role)[0], **fields
+    )
+
+
+class AppTestCase(TestCase):
+    """
+    TestCase with an empty cache, so entitlements and dashboards cached by an
+    earlier test never leak in, and a `student` user.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.student = make_user('student')
+
+
+class QueryBudgetMixin:
+    """TestCase mixin for asserting that a view stays within its declared query budget."""
+
+    def assertWithinQueryBudget(self, budget, url, client=None, data=None):
+        """Request `url`, POSTing `data` if given, and fail if it runs more than `budget` queries."""
+        client = client or self.client
+        method = 'GET' if data is None else 'POST'
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url) if data is None else client.post(url, data)
+        self.assertLess(response.status_code, 400, f"{method} {url} returned {response.status_code}")
+        executed = len(queries)
+        if executed > budget:
+            self.fail(
+                f"{method} {url} ran {executed} queries, over its budget of {budget}:\n"
+                + "\n".join(query['sql'] for query in queries.captured_queries)
+            )
+        return response
+
+    def assertQueryBudgetHolds(self, view_class, url, grow, sizes=(10, 100, 1000), client=None):
+        """
+        Grow the data with `grow(size)` for each size and assert that `url` stays
+        within `view_class.query_budget` every time.
+        """
+        budget = view_class.query_budget
+        for size in sizes:
+            grow(size)
+            with self.subTest(size=size):
+                self.assertWithinQueryBudget(budget, url, client=client)
+
+
+class TestRunner(DiscoverRunner):
+    """Test runner that writes the event log to a temporary directory, removed afterwards."""
+
+    def setup_test_environment(self, **kwargs):
+        from main import events
+
+        super().setup_test_environment(**kwargs)
+        self._event_log_dir = tempfile.TemporaryDirectory(prefix='events-')
+        self._real_event_log_dir = events.default_log.directory
+        events.default_log.directory = self._event_log_dir.name
+
+    def teardown_test_environment(self, **kwargs):
+        from main import events
+
+        events.default_log.flush()
+        events.default_log.directory = self._real_event_log_dir
+        self._event_log_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
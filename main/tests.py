@@ -1,3 +1,77 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import tempfile
+from importlib import import_module
 
-# Create your tests here.
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase
+
+from courses.models import Chapter, Lecture, Subject
+from . import search
+from .events import EventLog
+from .models import SearchDocument
+
+HOUR = 1760770800  # 2025-10-18 07:00 UTC
+
+
+class SearchIndexMigrationTests(TestCase):
+    def test_migration_indexes_content_created_before_it(self):
+        subject = Subject.objects.create(name='Physics', class_level='11th', stream='JEE')
+        chapter = Chapter.objects.create(name='Kinematics', subject=subject)
+        Lecture.objects.create(title='Projectile motion', description='Range and time of flight', chapter=chapter)
+        # As if the rows predate the signals that mirror them
+        SearchDocument.objects.all().delete()
+
+        migration = import_module('main.migrations.0003_populate_search_index')
+        state = MigrationExecutor(connection).loader.project_state(('main', '0003_populate_search_index'))
+        migration.populate_search_index(state.apps, None)
+
+        self.assertEqual(SearchDocument.objects.count(), 2)
+        results = search.search('projectile')
+        self.assertEqual([result['title'] for result in results], ['<mark>Projectile</mark> motion'])
+
+
+class EventLogTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.log = EventLog(directory.name)
+
+    def write(self, *events):
+        """Buffer `(ts, event)` pairs, as emit would at those times, and flush them."""
+        self.log._buffer.extend((ts, event, {'user': 1}) for ts, event in events)
+        return self.log.flush()
+
+    def test_read_merges_every_segment_of_an_hour_by_timestamp(self):
+        self.assertEqual(self.write((HOUR + 20, 'lecture_view'), (HOUR + 10, 'lecture_view')), 2)
+        self.write((HOUR + 30, 'quiz_submit'))
+        # Another process's segment for the same hour
+        segment = os.path.join(os.path.dirname(self.log._segment_path(HOUR // 3600)), '07-other-1.jsonl.gz')
+        with gzip.open(segment, 'wt') as other:
+            other.writelines(json.dumps({'ts': ts, 'event': 'lecture_view'}) + '\n' for ts in (HOUR + 15, HOUR + 25))
+
+        self.assertEqual([record['ts'] for record in self.log.read()], [HOUR + offset for offset in (10, 15, 20, 25, 30)])
+        self.assertEqual([record['ts'] for record in self.log.read(HOUR + 15, HOUR + 30)], [HOUR + 15, HOUR + 20, HOUR + 25])
+        self.assertEqual([record['ts'] for record in self.log.read(events=['quiz_submit'])], [HOUR + 30])
+        self.assertEqual(next(self.log.read())['user'], 1)
+
+    def test_segments_are_filtered_by_hour(self):
+        self.write((HOUR + 5, 'lecture_view'), (HOUR + 3605, 'lecture_view'), (HOUR + 7205, 'lecture_view'))
+
+        self.assertEqual([hour for hour, _ in self.log.segments()], [HOUR, HOUR + 3600, HOUR + 7200])
+        self.assertEqual([hour for hour, _ in self.log.segments(HOUR + 3600, HOUR + 7200)], [HOUR + 3600])
+        self.assertEqual([hour for hour, _ in self.log.segments(HOUR + 3599, HOUR + 3601)], [HOUR, HOUR + 3600])
+        self.assertEqual([record['ts'] for record in self.log.read(HOUR + 3600, HOUR + 7200)], [HOUR + 3605])
+
+    def test_a_truncated_last_member_does_not_hide_earlier_events(self):
+        self.write((HOUR + 1, 'lecture_view'), (HOUR + 2, 'lecture_view'))
+        (_, path), = self.log.segments()
+        complete = os.path.getsize(path)
+        self.write((HOUR + 3, 'quiz_submit'))
+        # The writer died halfway through appending the second member
+        with open(path, 'r+b') as segment:
+            segment.truncate(complete + (os.path.getsize(path) - complete) // 2)
+
+        self.assertEqual([record['ts'] for record in self.log.read()], [HOUR + 1, HOUR + 2])
@@ -1,10 +1,11 @@
 from django.shortcuts import render
 from django.views.generic import TemplateView
-from django.db.models import Q
 from courses.models import Subject, Lecture
 from quizzes.models import Quiz
+from . import search
+from .page_cache import AnonymousPageCacheMixin
 
-class IndexView(TemplateView):
+class IndexView(AnonymousPageCacheMixin, TemplateView):
     template_name = 'main/index.html'
     
     def get_context_data(self, **kwargs):
@@ -17,13 +18,13 @@ class IndexView(TemplateView):
         })
         return context
 
-class AboutView(TemplateView):
+class AboutView(AnonymousPageCacheMixin, TemplateView):
     template_name = 'main/about.html'
 
-class ContactView(TemplateView):
+class ContactView(AnonymousPageCacheMixin, TemplateView):
     template_name = 'main/contact.html'
 
-class PricingView(TemplateView):
+class PricingView(AnonymousPageCacheMixin, TemplateView):
     template_name = 'main/pricing.html'
 
 class SearchView(TemplateView):
@@ -31,27 +32,10 @@ class SearchView(TemplateView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        query = self.request.GET.get('q', '')
-        
-        if query:
-            subjects = Subject.objects.filter(
-                Q(name__icontains=query) | Q(description__icontains=query)
-            )
-            lectures = Lecture.objects.filter(
-                Q(title__icontains=query) | Q(description__icontains=query)
-            )
-            quizzes = Quiz.objects.filter(
-                Q(title__icontains=query) | Q(description__icontains=query)
-            )
-        else:
-            subjects = Subject.objects.none()
-            lectures = Lecture.objects.none()
-            quizzes = Quiz.objects.none()
+        query = self.request.GET.get('q', '').strip()
         
         context.update({
             'query': query,
-            'subjects': subjects,
-            'lectures': lectures,
-            'quizzes': quizzes,
+            'page_obj': search.search(query, page=self.request.GET.get('page')) if query else None,
         })
-        return context
\ No newline at end of file
+        return context
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Quiz, Question, QuizAttempt, QuizAnswer, DailyPracticeProblem
+from django.utils.html import format_html, format_html_join
+from .models import Quiz, Question, QuizAttempt, QuizAnswer, DailyPracticeProblem, QuestionStats
 
 class QuestionInline(admin.TabularInline):
     model = Question
@@ -29,19 +30,31 @@ class QuestionAdmin(admin.ModelAdmin):
     search_fields = ['question_text', 'quiz__title']
     ordering = ['quiz', 'id']
 
-class QuizAnswerInline(admin.TabularInline):
-    model = QuizAnswer
-    extra = 0
-    readonly_fields = ['question', 'selected_answer', 'is_correct', 'marks_obtained']
-
 @admin.register(QuizAttempt)
 class QuizAttemptAdmin(admin.ModelAdmin):
     list_display = ['user', 'quiz', 'score', 'total_marks', 'percentage', 'time_taken', 'started_at', 'completed_at']
     list_filter = ['quiz__chapter__subject__class_level', 'quiz__chapter__subject__stream', 'started_at', 'completed_at']
     search_fields = ['user__username', 'quiz__title']
-    readonly_fields = ['started_at', 'completed_at', 'percentage']
+    readonly_fields = ['started_at', 'completed_at', 'percentage', 'answer_summary']
+    exclude = ['answer_sheet']
     ordering = ['-started_at']
-    inlines = [QuizAnswerInline]
+    
+    def answer_summary(self, obj):
+        if not obj.pk:
+            return '-'
+        rows = format_html_join(
+            '',
+            '<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td></tr>',
+            (
+                (answer.question_id, answer.selected_answer or '-',
+                 'Yes' if answer.is_correct else 'No', answer.marks_obtained)
+                for answer in obj.get_answers()
+            )
+        )
+        return format_html(
+            '<table><tr><th>Question</th><th>Selected</th><th>Correct</th><th>Marks</th></tr>{}</table>',
+            rows
+        )
 
 @admin.register(QuizAnswer)
 class QuizAnswerAdmin(admin.ModelAdmin):
@@ -55,4 +68,40 @@ class DailyPracticeProblemAdmin(admin.ModelAdmin):
     list_display = ['title', 'chapter', 'difficulty', 'date_assigned', 'created_at']
     list_filter = ['difficulty', 'chapter__subject__class_level', 'chapter__subject__stream', 'date_assigned']
     search_fields = ['title', 'chapter__name']
-    ordering = ['-date_assigned']
\ No newline at end of file
+    ordering = ['-date_assigned']
+
+class ItemStatisticsAdmin(admin.ModelAdmin):
+    """Read-only view of statistics written by `manage.py analyze_questions`."""
+    list_display = ['question', 'responses', 'difficulty', 'discrimination', 'distractor_efficiency',
+                    'verdict', 'computed_at']
+    readonly_fields = ['question', 'responses', 'difficulty', 'discrimination', 'distractor_efficiency',
+                       'verdict', 'option_table', 'computed_at']
+    exclude = ['option_stats']
+    list_select_related = ['question']
+    ordering = ['discrimination']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def option_table(self, obj):
+        rows = format_html_join(
+            '',
+            '<tr><td>{}</td><td>{}</td><td>{}</td></tr>',
+            (
+                (choice or 'Blank', option['count'], option['mean_rest_score'])
+                for choice, option in obj.option_stats.items()
+            )
+        )
+        return format_html(
+            '<table><tr><th>Option</th><th>Chosen</th><th>Mean rest score</th></tr>{}</table>',
+            rows
+        )
+    option_table.short_description = 'Options'
+
+@admin.register(QuestionStats)
+class QuestionStatsAdmin(ItemStatisticsAdmin):
+    list_filter = ['question__quiz__chapter__subject__class_level', 'question__quiz__chapter__subject__stream']
+    search_fields = ['question__question_text', 'question__quiz__title']
@@ -0,0 +1,203 @@
+"""
+Nightly item analysis of quiz and DPP questions.
+
+For every question, each completed attempt contributes one response: the
+option chosen ('' for blank), whether it was correct, and the attempt's score
+on the rest of the paper. Responses are never held individually; they are
+counted into cells of (option, correct, rest score), whose number is bounded
+by options x distinct scores however many attempts there are. The statistics
+are derived from the cells:
+
+- difficulty: the share of responses that are correct (the p-value)
+- discrimination: the point-biserial correlation between answering
+  correctly and the rest-of-paper score, so the item is not correlated with
+  itself
+- option_stats: per option, how many chose it and their mean rest score
+- distractor_efficiency: the share of wrong options that at least
+  FUNCTIONAL_DISTRACTOR of responses chose
+
+Quiz answer sheets are streamed CHUNK_SIZE attempts at a time, one quiz at a
+time. DPP answers are counted by the database with GROUP BY, one DPP at a
+time, so the job's memory does not grow with the number of answers.
+"""
+import math
+from collections import Counter, defaultdict
+from itertools import repeat
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+
+from batches.models import DPP, DPPAnswer, DPPQuestionStats
+from .models import QuestionStats, Quiz, QuizAttempt
+
+CHUNK_SIZE = getattr(settings, 'ITEM_ANALYSIS_CHUNK_SIZE', 5000)
+# A wrong option chosen by fewer responses than this is not doing its job
+FUNCTIONAL_DISTRACTOR = 0.05
+MCQ_OPTIONS = ('A', 'B', 'C', 'D')
+# Wrong numerical answers are too varied to report one by one
+OTHER_ANSWER = 'Other'
+
+STATS_FIELDS = ['responses', 'difficulty', 'discrimination', 'distractor_efficiency', 'option_stats', 'computed_at']
+
+
+def item_statistics(cells, distractors=None):
+    """
+    Statistics of one question from `cells`, a mapping of
+    (option, correct, rest score) to the number of responses. `distractors`
+    are the wrong options a response could choose; distractor efficiency is
+    only computed when they are given.
+    """
+    responses = correct = 0
+    total = total_squares = correct_total = 0.0
+    options = defaultdict(lambda: [0, 0.0])
+    for (choice, is_correct, rest), count in cells.items():
+        responses += count
+        total += rest * count
+        total_squares += rest * rest * count
+        if is_correct:
+            correct += count
+            correct_total += rest * count
+        options[choice][0] += count
+        options[choice][1] += rest * count
+
+    stats = {
+        'responses': responses,
+        'difficulty': None,
+        'discrimination': None,
+        'distractor_efficiency': None,
+        'option_stats': {
+            choice: {'count': count, 'mean_rest_score': round(rest_total / count, 2)}
+            for choice, (count, rest_total) in sorted(options.items())
+        },
+    }
+    if not responses:
+        return stats
+
+    p = correct / responses
+    stats['difficulty'] = round(p, 4)
+    mean = total / responses
+    variance = max(0.0, total_squares / responses - mean * mean)
+    if 0 < correct < responses and variance > 0:
+        mean_correct = correct_total / correct
+        mean_wrong = (total - correct_total) / (responses - correct)
+        discrimination = (mean_correct - mean_wrong) / math.sqrt(variance) * math.sqrt(p * (1 - p))
+        stats['discrimination'] = round(discrimination, 4)
+    if distractors:
+        functional = sum(
+            1 for choice in distractors
+            if choice in options and options[choice][0] >= FUNCTIONAL_DISTRACTOR * responses
+        )
+        stats['distractor_efficiency'] = round(functional / len(distractors), 4)
+    return stats
+
+
+def count_sheets(questions, rows):
+    """
+    Cells for each of `questions` (ordered by id) from
+    `(score, answer_sheet, sheet_questions)` rows. Each sheet character is
+    matched to its question through `sheet_questions`, so questions added or
+    deleted after an attempt do not shift its answers; answers to deleted
+    questions are dropped. Returns the cells, in question order, and how many
+    sheets were skipped because they do not record which questions they cover.
+    """
+    index = {question.id: position for position, question in enumerate(questions)}
+    # Attempts of a quiz share a handful of question lists; each is parsed once
+    layouts = {}
+    counts = Counter()
+    skipped = 0
+    for score, sheet, sheet_questions in rows:
+        layout = layouts.get(sheet_questions)
+        if layout is None:
+            question_ids = [int(question_id) for question_id in sheet_questions.split(',') if question_id]
+            layout = layouts[sheet_questions] = [index.get(question_id) for question_id in question_ids]
+        if not layout or len(sheet) != len(layout):
+            skipped += 1
+            continue
+        # Counted in C: one (position, option, score) key per answer
+        counts.update(zip(layout, sheet, repeat(score)))
+
+    cells = [Counter() for _ in questions]
+    for (position, choice, score), count in counts.items():
+        if position is None:
+            continue
+        question = questions[position]
+        if choice == QuizAttempt.BLANK_ANSWER:
+            choice = ''
+        is_correct = choice == question.correct_answer
+        cells[position][choice, is_correct, score - question.marks if is_correct else score] += count
+    return cells, skipped
+
+
+def count_answers(answers, numerical=()):
+    """
+    Cells per question id from answer rows, counted by the database. Answers to
+    questions in `numerical` that are neither blank nor correct are pooled.
+    """
+    cells = defaultdict(Counter)
+    grouped = answers.order_by().values(
+        'question_id', 'selected_answer', 'is_correct', 'marks_obtained', 'attempt__score'
+    ).annotate(responses=Count('pk'))
+    for row in grouped:
+        choice = row['selected_answer']
+        if row['question_id'] in numerical and choice and not row['is_correct']:
+            choice = OTHER_ANSWER
+        rest = row['attempt__score'] - row['marks_obtained']
+        cells[row['question_id']][choice, row['is_correct'], rest] += row['responses']
+    return cells
+
+
+def _save(model, rows):
+    now = timezone.now()
+    model.objects.bulk_create(
+        [model(question_id=question_id, computed_at=now, **stats) for question_id, stats in rows],
+        update_conflicts=True, unique_fields=['question'], update_fields=STATS_FIELDS,
+    )
+
+
+def analyze_quiz(quiz, chunk_size=CHUNK_SIZE):
+    """Compute and store the statistics of every question of `quiz`. Returns (questions, responses, skipped sheets)."""
+    questions = list(quiz.questions.order_by('id').only('id', 'correct_answer', 'marks'))
+    if not questions:
+        return 0, 0, 0
+    sheets = QuizAttempt.objects.filter(quiz=quiz, completed_at__isnull=False).exclude(answer_sheet='').order_by()
+    sheets = sheets.values_list('score', 'answer_sheet', 'sheet_questions')
+    cells, skipped = count_sheets(questions, sheets.iterator(chunk_size=chunk_size))
+
+    rows = []
+    for question, question_cells in zip(questions, cells):
+        distractors = [choice for choice in MCQ_OPTIONS if choice != question.correct_answer]
+        rows.append((question.id, item_statistics(question_cells, distractors)))
+    _save(QuestionStats, rows)
+    return len(rows), sum(stats['responses'] for _, stats in rows), skipped
+
+
+def analyze_dpp(dpp):
+    """Compute and store the statistics of every question of `dpp`. Returns (questions, responses)."""
+    questions = list(dpp.questions.only('id', 'question_type', 'correct_answer'))
+    if not questions:
+        return 0, 0
+    numerical = {question.id for question in questions if question.question_type == 'numerical'}
+    cells = count_answers(
+        DPPAnswer.objects.filter(question__dpp=dpp, attempt__completed_at__isnull=False), numerical
+    )
+
+    rows = []
+    for question in questions:
+        distractors = None
+        if question.question_type == 'mcq':
+            distractors = [choice for choice in MCQ_OPTIONS if choice != question.correct_answer]
+        rows.append((question.id, item_statistics(cells.get(question.id, {}), distractors)))
+    _save(DPPQuestionStats, rows)
+    return len(rows), sum(stats['responses'] for _, stats in rows)
+
+
+def analyze_all(chunk_size=CHUNK_SIZE):
+    """Refresh the statistics of every quiz and DPP question. Returns totals for reporting."""
+    totals = Counter()
+    for quiz in Quiz.objects.order_by('pk').iterator():
+        questions, responses, skipped = analyze_quiz(quiz, chunk_size)
+        totals.update(questions=questions, responses=responses, skipped_sheets=skipped)
+    for dpp in DPP.objects.order_by('pk').iterator():
+        questions, responses = analyze_dpp(dpp)
+        totals.update(questions=questions, responses=responses)
+    return totals
@@ -0,0 +1,23 @@
+import time
+from django.core.management.base import BaseCommand
+from quizzes import analytics
+
+
+class Command(BaseCommand):
+    help = 'Recompute difficulty, discrimination and option statistics of every quiz and DPP question (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=analytics.CHUNK_SIZE,
+                            help='Quiz attempts read per query')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        totals = analytics.analyze_all(chunk_size=options['chunk_size'])
+        if totals['skipped_sheets']:
+            self.stdout.write(self.style.WARNING(
+                f"Skipped {totals['skipped_sheets']} answer sheets that do not record which questions they cover"
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"Analysed {totals['questions']} questions over {totals['responses']} responses "
+            f"in {time.perf_counter() - started:.1f}s"
+        ))
@@ -0,0 +1,84 @@
+import math
+import random
+import resource
+import time
+from django.core.management.base import BaseCommand
+from quizzes import analytics
+from quizzes.models import Question, QuestionStats, QuizAttempt
+
+
+def peak_memory_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = 'Time item analysis over synthetic answer sheets streamed through it (the database is not touched)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--answers', type=int, default=50000000, help='Answers to analyse in total')
+        parser.add_argument('--questions', type=int, default=30, help='Questions per quiz')
+        parser.add_argument('--students', type=int, default=20000,
+                            help='Distinct synthetic answer sheets, replayed until --answers is reached')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def synthetic_sheets(self, rng, questions, students):
+        # Ability and item parameters as in a two-parameter logistic model;
+        # the last question's key is wrong, so strong students "miss" it
+        items = [(rng.uniform(0.5, 2.0), rng.uniform(-3.0, 3.0)) for _ in questions]
+        miskeyed = questions[-1]
+        sheet_questions = QuizAttempt.pack_question_ids(question.id for question in questions)
+        sheets = []
+        for _ in range(students):
+            ability = rng.gauss(0, 1)
+            sheet = []
+            score = 0
+            for question, (discrimination, difficulty) in zip(questions, items):
+                knows = rng.random() < 1 / (1 + math.exp(-discrimination * (ability - difficulty)))
+                if rng.random() < 0.03:
+                    sheet.append('-')
+                    continue
+                intended = 'C' if question is miskeyed else question.correct_answer
+                wrong = [choice for choice in analytics.MCQ_OPTIONS if choice != intended]
+                choice = intended if knows else rng.choices(wrong, weights=[6, 3, 1])[0]
+                sheet.append(choice)
+                if choice == question.correct_answer:
+                    score += question.marks
+            sheets.append((score, ''.join(sheet), sheet_questions))
+        return sheets
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        questions = [
+            Question(id=number, correct_answer=rng.choice(analytics.MCQ_OPTIONS), marks=rng.choice([1, 2, 4]))
+            for number in range(1, options['questions'] + 1)
+        ]
+        questions[-1].correct_answer = 'B'
+        pool = self.synthetic_sheets(rng, questions, options['students'])
+        attempts = options['answers'] // options['questions']
+        baseline = peak_memory_mb()
+        self.stdout.write(f"Streaming {attempts} attempts x {options['questions']} questions "
+                          f"(peak memory before: {baseline:.0f}MB)...")
+
+        started = time.perf_counter()
+        rows = (pool[i % len(pool)] for i in range(attempts))
+        cells, _ = analytics.count_sheets(questions, rows)
+        counted = time.perf_counter() - started
+        results = [
+            QuestionStats(question=question, **analytics.item_statistics(
+                question_cells, [choice for choice in analytics.MCQ_OPTIONS if choice != question.correct_answer]
+            ))
+            for question, question_cells in zip(questions, cells)
+        ]
+        elapsed = time.perf_counter() - started
+        answers = attempts * options['questions']
+        self.stdout.write(
+            f"{answers:,} answers in {elapsed:.1f}s ({answers / elapsed / 1e6:.1f}M/s; statistics "
+            f"{(elapsed - counted) * 1000:.0f}ms), {sum(len(c) for c in cells)} cells, "
+            f"peak memory {peak_memory_mb():.0f}MB"
+        )
+        verdicts = {}
+        for stats in results:
+            verdicts.setdefault(stats.verdict, []).append(stats.question.id)
+        for verdict, ids in sorted(verdicts.items()):
+            self.stdout.write(f"  {verdict}: questions {', '.join(map(str, ids))}")
+        self.stdout.write(self.style.SUCCESS(f"Question {questions[-1].id} (miskeyed): {results[-1].verdict}"))
@@ -0,0 +1,109 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:31
+
+from django.db import migrations, models
+
+CHUNK_SIZE = 1000
+BLANK_ANSWER = '-'
+
+
+def pack_answers(apps, schema_editor):
+    """
+    Pack each attempt's answer rows into a sheet over its quiz's questions
+    ordered by id, record those ids beside it, and delete the rows.
+    """
+    QuizAttempt = apps.get_model('quizzes', 'QuizAttempt')
+    QuizAnswer = apps.get_model('quizzes', 'QuizAnswer')
+    Question = apps.get_model('quizzes', 'Question')
+
+    question_ids_by_quiz = {}
+    last_pk = 0
+    while True:
+        attempts = list(
+            QuizAttempt.objects.filter(pk__gt=last_pk).order_by('pk').only('id', 'quiz_id')[:CHUNK_SIZE]
+        )
+        if not attempts:
+            break
+        last_pk = attempts[-1].pk
+
+        selected = {}
+        for attempt_id, question_id, answer in QuizAnswer.objects.filter(
+            attempt_id__in=[attempt.pk for attempt in attempts]
+        ).values_list('attempt_id', 'question_id', 'selected_answer'):
+            selected[(attempt_id, question_id)] = answer
+
+        for attempt in attempts:
+            if attempt.quiz_id not in question_ids_by_quiz:
+                question_ids_by_quiz[attempt.quiz_id] = list(
+                    Question.objects.filter(quiz_id=attempt.quiz_id).order_by('id').values_list('id', flat=True)
+                )
+            question_ids = question_ids_by_quiz[attempt.quiz_id]
+            attempt.answer_sheet = ''.join(
+                selected.get((attempt.pk, question_id)) or BLANK_ANSWER for question_id in question_ids
+            )
+            attempt.sheet_questions = ','.join(map(str, question_ids))
+
+        QuizAttempt.objects.bulk_update(attempts, ['answer_sheet', 'sheet_questions'])
+        QuizAnswer.objects.filter(attempt_id__in=[attempt.pk for attempt in attempts]).delete()
+
+
+def unpack_answers(apps, schema_editor):
+    QuizAttempt = apps.get_model('quizzes', 'QuizAttempt')
+    QuizAnswer = apps.get_model('quizzes', 'QuizAnswer')
+    Question = apps.get_model('quizzes', 'Question')
+
+    questions_by_quiz = {}
+    last_pk = 0
+    while True:
+        attempts = list(
+            QuizAttempt.objects.filter(pk__gt=last_pk).exclude(answer_sheet='')
+            .order_by('pk').only('id', 'quiz_id', 'answer_sheet', 'sheet_questions')[:CHUNK_SIZE]
+        )
+        if not attempts:
+            break
+        last_pk = attempts[-1].pk
+
+        rows = []
+        for attempt in attempts:
+            if attempt.quiz_id not in questions_by_quiz:
+                questions_by_quiz[attempt.quiz_id] = {
+                    question_id: (correct_answer, marks)
+                    for question_id, correct_answer, marks in Question.objects.filter(quiz_id=attempt.quiz_id)
+                    .values_list('id', 'correct_answer', 'marks')
+                }
+            questions = questions_by_quiz[attempt.quiz_id]
+            question_ids = [int(question_id) for question_id in attempt.sheet_questions.split(',') if question_id]
+            for question_id, answer in zip(question_ids, attempt.answer_sheet):
+                if question_id not in questions:
+                    continue
+                correct_answer, marks = questions[question_id]
+                answer = '' if answer == BLANK_ANSWER else answer
+                is_correct = bool(answer) and answer == correct_answer
+                rows.append(QuizAnswer(
+                    attempt_id=attempt.pk,
+                    question_id=question_id,
+                    selected_answer=answer,
+                    is_correct=is_correct,
+                    marks_obtained=marks if is_correct else 0,
+                ))
+        QuizAnswer.objects.bulk_create(rows, batch_size=CHUNK_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizattempt',
+            name='answer_sheet',
+            field=models.TextField(blank=True, default='', help_text='Selected options, one character per question in sheet_questions'),
+        ),
+        migrations.AddField(
+            model_name='quizattempt',
+            name='sheet_questions',
+            field=models.TextField(blank=True, default='', help_text='Comma-separated ids of the questions answer_sheet covers, in order'),
+        ),
+        migrations.RunPython(pack_answers, unpack_answers),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:55
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0002_quizattempt_answer_sheet'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('responses', models.PositiveIntegerField(default=0)),
+                ('difficulty', models.FloatField(blank=True, help_text='Share of attempts answering correctly (p-value)', null=True)),
+                ('discrimination', models.FloatField(blank=True, help_text='Point-biserial correlation with the rest-of-paper score', null=True)),
+                ('distractor_efficiency', models.FloatField(blank=True, help_text='Share of wrong options chosen by at least 5% of attempts', null=True)),
+                ('option_stats', models.JSONField(blank=True, default=dict)),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='quizzes.question')),
+            ],
+            options={
+                'verbose_name_plural': 'Question stats',
+            },
+        ),
+    ]
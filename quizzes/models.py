@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from courses.models import Chapter
@@ -55,6 +55,8 @@ class Question(models.Model):
         }
 
 class QuizAttempt(models.Model):
+    BLANK_ANSWER = '-'
+    
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='quiz_attempts')
     quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='attempts')
     score = models.PositiveIntegerField(default=0)
@@ -63,6 +65,10 @@ class QuizAttempt(models.Model):
     time_taken = models.PositiveIntegerField(help_text="Time taken in minutes", null=True, blank=True)
     started_at = models.DateTimeField(default=timezone.now)
     completed_at = models.DateTimeField(null=True, blank=True)
+    answer_sheet = models.TextField(blank=True, default='',
+                                    help_text="Selected options, one character per question in sheet_questions")
+    sheet_questions = models.TextField(blank=True, default='',
+                                       help_text="Comma-separated ids of the questions answer_sheet covers, in order")
     
     class Meta:
         ordering = ['-started_at']
@@ -70,6 +76,86 @@ class QuizAttempt(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.quiz.title} - {self.score}/{self.total_marks}"
     
+    @classmethod
+    def start(cls, user, quiz):
+        question_ids = list(quiz.questions.order_by('id').values_list('id', flat=True))
+        return cls.objects.create(
+            user=user,
+            quiz=quiz,
+            total_marks=quiz.total_marks,
+            started_at=timezone.now(),
+            answer_sheet=cls.BLANK_ANSWER * len(question_ids),
+            sheet_questions=cls.pack_question_ids(question_ids)
+        )
+    
+    @staticmethod
+    def pack_question_ids(question_ids):
+        return ','.join(map(str, question_ids))
+    
+    def get_sheet_question_ids(self):
+        return [int(question_id) for question_id in self.sheet_questions.split(',') if question_id]
+    
+    def get_answers(self, questions=None):
+        """
+        Return the per-question answers of this attempt as unsaved QuizAnswer objects.
+        
+        Sheet characters are matched to questions through `sheet_questions`, so
+        questions added or deleted after the attempt do not shift the answers.
+        """
+        if questions is None:
+            questions = self.quiz.questions.order_by('id')
+        questions_by_id = {question.id: question for question in questions}
+        
+        answers = []
+        for question_id, selected in zip(self.get_sheet_question_ids(), self.answer_sheet):
+            question = questions_by_id.get(question_id)
+            if question is None:
+                # Deleted since the attempt
+                continue
+            answer = QuizAnswer(
+                attempt=self,
+                question=question,
+                selected_answer='' if selected == self.BLANK_ANSWER else selected
+            )
+            if answer.selected_answer:
+                answer.grade()
+            answers.append(answer)
+        return answers
+    
+    def submit(self, submitted_answers):
+        """
+        Grade `submitted_answers` (question id -> option) and store them packed on the attempt.
+        Returns False if the attempt had already been completed.
+        """
+        with transaction.atomic():
+            locked = QuizAttempt.objects.select_for_update().get(pk=self.pk)
+            if locked.completed_at:
+                self.refresh_from_db()
+                return False
+            
+            questions = list(self.quiz.questions.order_by('id'))
+            sheet = []
+            total_score = 0
+            for question in questions:
+                selected = submitted_answers.get(question.id)
+                if selected in QuizAnswer.VALID_ANSWERS:
+                    sheet.append(selected)
+                    if selected == question.correct_answer:
+                        total_score += question.marks
+                else:
+                    sheet.append(self.BLANK_ANSWER)
+            
+            self.answer_sheet = ''.join(sheet)
+            self.sheet_questions = self.pack_question_ids(question.id for question in questions)
+            self.score = total_score
+            self.completed_at = timezone.now()
+            self.calculate_percentage()
+            
+            time_taken_seconds = (self.completed_at - self.started_at).total_seconds()
+            self.time_taken = int(time_taken_seconds / 60)
+            self.save()
+        return True
+    
     def calculate_percentage(self):
         if self.total_marks > 0:
             self.percentage = (self.score / self.total_marks) * 100
@@ -87,6 +173,7 @@ class QuizAnswer(models.Model):
         ('C', 'Option C'),
         ('D', 'Option D'),
     ]
+    VALID_ANSWERS = {choice for choice, _ in ANSWER_CHOICES}
     
     attempt = models.ForeignKey(QuizAttempt, on_delete=models.CASCADE, related_name='answers')
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
@@ -100,10 +187,13 @@ class QuizAnswer(models.Model):
     def __str__(self):
         return f"{self.attempt.user.username} - {self.question.quiz.title} - Q{self.question.id}"
     
+    def grade(self):
+        self.is_correct = self.selected_answer == self.question.correct_answer
+        self.marks_obtained = self.question.marks if self.is_correct else 0
+    
     def save(self, *args, **kwargs):
         if self.selected_answer:
-            self.is_correct = self.selected_answer == self.question.correct_answer
-            self.marks_obtained = self.question.marks if self.is_correct else 0
+            self.grade()
         super().save(*args, **kwargs)
 
 class DailyPracticeProblem(models.Model):
@@ -124,4 +214,78 @@ class DailyPracticeProblem(models.Model):
         ordering = ['-date_assigned']
     
     def __str__(self):
-        return f"{self.title} - {self.chapter.name}"
\ No newline at end of file
+        return f"{self.title} - {self.chapter.name}"
+class ItemStatistics(models.Model):
+    """
+    Classical item analysis of one question over every completed attempt,
+    written by quizzes.analytics (`manage.py analyze_questions`).
+    
+    `option_stats` maps each selected option ('' for blank) to its count and
+    the mean score of those attempts on the rest of the paper.
+    """
+    TOO_EASY = 0.9
+    TOO_HARD = 0.2
+    POOR_DISCRIMINATION = 0.2
+    # Share of responses on one wrong option that, with nobody choosing the key, suggests a miskey
+    HEAVY_DISTRACTOR = 0.4
+    
+    responses = models.PositiveIntegerField(default=0)
+    difficulty = models.FloatField(null=True, blank=True, help_text="Share of attempts answering correctly (p-value)")
+    discrimination = models.FloatField(null=True, blank=True,
+                                       help_text="Point-biserial correlation with the rest-of-paper score")
+    distractor_efficiency = models.FloatField(null=True, blank=True,
+                                              help_text="Share of wrong options chosen by at least 5% of attempts")
+    option_stats = models.JSONField(default=dict, blank=True)
+    computed_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        abstract = True
+    
+    def get_key(self):
+        raise NotImplementedError
+    
+    def dominant_distractor(self):
+        """
+        A wrong option picked more often, and by stronger students, than the
+        key, if any. When nobody picked the key, the most picked wrong option
+        if at least HEAVY_DISTRACTOR of responses chose it.
+        """
+        key = self.option_stats.get(self.get_key())
+        wrong = [
+            (option['count'], choice) for choice, option in self.option_stats.items()
+            if choice and choice != self.get_key()
+        ]
+        if key is None:
+            count, choice = max(wrong, default=(0, None))
+            return choice if count and count >= self.HEAVY_DISTRACTOR * self.responses else None
+        for count, choice in wrong:
+            option = self.option_stats[choice]
+            if count > key['count'] and option['mean_rest_score'] > key['mean_rest_score']:
+                return choice
+        return None
+    
+    @property
+    def verdict(self):
+        if not self.responses:
+            return 'No data'
+        if (self.discrimination is not None and self.discrimination < 0) or self.dominant_distractor():
+            return 'Possibly miskeyed'
+        if self.difficulty > self.TOO_EASY:
+            return 'Too easy'
+        if self.difficulty < self.TOO_HARD:
+            return 'Too hard'
+        if self.discrimination is not None and self.discrimination < self.POOR_DISCRIMINATION:
+            return 'Poor discrimination'
+        return 'OK'
+
+class QuestionStats(ItemStatistics):
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, related_name='stats')
+    
+    class Meta:
+        verbose_name_plural = 'Question stats'
+    
+    def __str__(self):
+        return f"Stats - {self.question}"
+    
+    def get_key(self):
+        return self.question.correct_answer
@@ -1,3 +1,124 @@
-from django.test import TestCase
+from importlib import import_module
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.urls import reverse
+from django.utils import timezone
+
+from courses.models import Chapter, Subject
+from main.testing import AppTestCase, make_user
+from . import analytics
+from .models import Question, QuestionStats, Quiz, QuizAnswer, QuizAttempt
+
+
+def make_quiz(keys='ABC'):
+    subject = Subject.objects.create(name='Physics', class_level='11th', stream='JEE')
+    chapter = Chapter.objects.create(name='Kinematics', subject=subject)
+    quiz = Quiz.objects.create(title='Kinematics quiz', chapter=chapter, total_marks=len(keys))
+    for number, key in enumerate(keys):
+        Question.objects.create(
+            quiz=quiz, question_text=f'Question {number}', option_a='a', option_b='b', option_c='c', option_d='d',
+            correct_answer=key
+        )
+    return quiz
+
+
+class AnswerSheetTests(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.quiz = make_quiz('ABC')
+        self.questions = list(self.quiz.questions.order_by('id'))
+        self.attempt = QuizAttempt.start(self.student, self.quiz)
+        self.attempt.submit({self.questions[0].id: 'A', self.questions[1].id: 'C', self.questions[2].id: 'C'})
+
+    def selected(self, attempt):
+        return {answer.question_id: answer.selected_answer for answer in attempt.get_answers()}
+
+    def test_answers_follow_their_questions_after_one_is_deleted_and_another_added(self):
+        self.questions[0].delete()
+        added = Question.objects.create(
+            quiz=self.quiz, question_text='Added later', option_a='a', option_b='b', option_c='c', option_d='d',
+            correct_answer='D'
+        )
+        attempt = QuizAttempt.objects.get(pk=self.attempt.pk)
+        self.assertEqual(self.selected(attempt), {self.questions[1].id: 'C', self.questions[2].id: 'C'})
+        self.assertNotIn(added.id, self.selected(attempt))
+
+    def test_migration_records_the_questions_it_packs(self):
+        # Stored before answer sheets existed: answer rows only
+        legacy = QuizAttempt.objects.create(user=self.student, quiz=self.quiz, total_marks=3, completed_at=timezone.now())
+        QuizAnswer.objects.create(attempt=legacy, question=self.questions[1], selected_answer='B', is_correct=True,
+                                  marks_obtained=1)
+        migration = import_module('quizzes.migrations.0002_quizattempt_answer_sheet')
+        state = MigrationExecutor(connection).loader.project_state(('quizzes', '0002_quizattempt_answer_sheet'))
+        migration.pack_answers(state.apps, None)
+
+        legacy = QuizAttempt.objects.get(pk=legacy.pk)
+        self.assertEqual(legacy.answer_sheet, '-B-')
+        self.assertEqual(legacy.get_sheet_question_ids(), [question.id for question in self.questions])
+        self.assertFalse(QuizAnswer.objects.filter(attempt=legacy).exists())
+        self.questions[0].delete()
+        self.assertEqual(self.selected(legacy), {self.questions[1].id: 'B', self.questions[2].id: ''})
+
+    def test_second_submission_is_not_reported_as_a_success(self):
+        self.assertFalse(self.attempt.submit({self.questions[0].id: 'B'}))
+        self.assertEqual(self.selected(QuizAttempt.objects.get(pk=self.attempt.pk))[self.questions[0].id], 'A')
+
+        attempt = QuizAttempt.start(self.student, self.quiz)
+        self.client.force_login(self.student)
+        # Another request completes the attempt after this one has read it
+        with mock.patch.object(QuizAttempt, 'submit', return_value=False):
+            response = self.client.post(
+                reverse('quizzes:submit', args=[self.quiz.id]), {f'question_{self.questions[0].id}': 'A'}, follow=True
+            )
+        self.assertRedirects(response, reverse('quizzes:results', args=[attempt.id]))
+        self.assertEqual(
+            [str(message) for message in response.context['messages']], ['This quiz attempt was already submitted.']
+        )
+
+
+class ItemAnalysisTests(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.students = [self.student, make_user('student1'), make_user('student2')]
+        self.quiz = make_quiz('ABC')
+        self.questions = list(self.quiz.questions.order_by('id'))
+
+    def submit(self, student, choices):
+        questions = self.quiz.questions.order_by('id')
+        QuizAttempt.start(student, self.quiz).submit(dict(zip((question.id for question in questions), choices)))
+
+    def option_counts(self, question):
+        stats = QuestionStats.objects.get(question=question)
+        return {choice: option['count'] for choice, option in stats.option_stats.items()}
+
+    def test_answers_are_counted_against_the_questions_their_sheet_covers(self):
+        self.submit(self.students[0], 'ABD')
+        self.questions[0].delete()
+        added = Question.objects.create(
+            quiz=self.quiz, question_text='Added later', option_a='a', option_b='b', option_c='c', option_d='d',
+            correct_answer='D'
+        )
+        self.submit(self.students[1], 'BDD')
+        unmatched = QuizAttempt.start(self.students[2], self.quiz)
+        unmatched.submit({})
+        QuizAttempt.objects.filter(pk=unmatched.pk).update(sheet_questions='')
+
+        self.assertEqual(analytics.analyze_quiz(self.quiz), (3, 5, 1))
+        self.assertEqual(self.option_counts(self.questions[1]), {'B': 2})
+        self.assertEqual(self.option_counts(self.questions[2]), {'D': 2})
+        self.assertEqual(self.option_counts(added), {'D': 1})
+
+    def test_key_nobody_chose_is_flagged_when_a_wrong_option_dominates(self):
+        stats = QuestionStats(question=self.questions[0], responses=10, difficulty=0.0, option_stats={
+            'C': {'count': 8, 'mean_rest_score': 2.5}, 'D': {'count': 1, 'mean_rest_score': 0.0},
+            '': {'count': 1, 'mean_rest_score': 1.0},
+        })
+        self.assertEqual(stats.dominant_distractor(), 'C')
+        self.assertEqual(stats.verdict, 'Possibly miskeyed')
+
+        stats.option_stats = {choice: {'count': 3, 'mean_rest_score': 1.0} for choice in 'BCD'}
+        stats.responses = 9
+        self.assertIsNone(stats.dominant_distractor())
+        self.assertEqual(stats.verdict, 'Too hard')
@@ -5,6 +5,7 @@ from django.views.generic import ListView, DetailView, TemplateView, View
 from django.http import JsonResponse
 from django.utils import timezone
 from django.db import transaction
+from main import events
 from .models import Quiz, Question, QuizAttempt, QuizAnswer
 
 class QuizListView(LoginRequiredMixin, ListView):
@@ -34,27 +35,16 @@ class QuizDetailView(LoginRequiredMixin, DetailView):
             'questions_count': self.object.questions.count(),
             'has_attempted': user_attempts.exists(),
         })
+        if self.request.user.is_teacher or self.request.user.is_admin:
+            # Written nightly by `manage.py analyze_questions`
+            context['question_stats'] = self.object.questions.order_by('id').select_related('stats')
         return context
 
 class StartQuizView(LoginRequiredMixin, View):
     def post(self, request, quiz_id):
         quiz = get_object_or_404(Quiz, id=quiz_id, is_active=True)
         
-        # Create new attempt
-        attempt = QuizAttempt.objects.create(
-            user=request.user,
-            quiz=quiz,
-            total_marks=quiz.total_marks,
-            started_at=timezone.now()
-        )
-        
-        # Create answer records for all questions
-        questions = quiz.questions.all()
-        for question in questions:
-            QuizAnswer.objects.create(
-                attempt=attempt,
-                question=question
-            )
+        QuizAttempt.start(request.user, quiz)
         
         messages.success(request, f'Quiz "{quiz.title}" started successfully!')
         return redirect('quizzes:submit', quiz_id=quiz.id)
@@ -77,8 +67,8 @@ class SubmitQuizView(LoginRequiredMixin, TemplateView):
             messages.error(self.request, 'No active quiz attempt found.')
             return redirect('quizzes:detail', quiz_id=quiz.id)
         
-        questions = quiz.questions.all().order_by('id')
-        answers = QuizAnswer.objects.filter(attempt=attempt).select_related('question')
+        questions = list(quiz.questions.order_by('id'))
+        answers = attempt.get_answers(questions)
         answer_dict = {answer.question_id: answer for answer in answers}
         
         context.update({
@@ -104,32 +94,21 @@ class SubmitQuizView(LoginRequiredMixin, TemplateView):
             return redirect('quizzes:detail', quiz_id=quiz.id)
         
         # Process submitted answers
-        total_score = 0
-        with transaction.atomic():
-            for question in quiz.questions.all():
-                answer_key = f'question_{question.id}'
-                selected_answer = request.POST.get(answer_key)
-                
-                if selected_answer:
-                    quiz_answer = QuizAnswer.objects.get(
-                        attempt=attempt,
-                        question=question
-                    )
-                    quiz_answer.selected_answer = selected_answer
-                    quiz_answer.save()  # This will trigger the save method to set is_correct and marks
-                    
-                    if quiz_answer.is_correct:
-                        total_score += quiz_answer.marks_obtained
-            
-            # Update attempt
-            attempt.score = total_score
-            attempt.completed_at = timezone.now()
-            attempt.calculate_percentage()
-            
-            # Calculate time taken
-            time_taken_seconds = (attempt.completed_at - attempt.started_at).total_seconds()
-            attempt.time_taken = int(time_taken_seconds / 60)  # Convert to minutes
-            attempt.save()
+        submitted_answers = {}
+        for key, value in request.POST.items():
+            if key.startswith('question_') and value:
+                try:
+                    submitted_answers[int(key[len('question_'):])] = value
+                except ValueError:
+                    continue
+        
+        if not attempt.submit(submitted_answers):
+            # A second submission of the same attempt, e.g. a double click
+            messages.info(request, 'This quiz attempt was already submitted.')
+            return redirect('quizzes:results', attempt_id=attempt.id)
+        total_score = attempt.score
+        events.emit('quiz_submit', user=request.user.pk, quiz=quiz.pk, attempt=attempt.pk,
+                    score=total_score, total_marks=quiz.total_marks)
         
         messages.success(request, f'Quiz submitted successfully! Score: {total_score}/{quiz.total_marks}')
         return redirect('quizzes:results', attempt_id=attempt.id)
@@ -145,7 +124,7 @@ class QuizResultsView(LoginRequiredMixin, DetailView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        answers = self.object.answers.select_related('question').all()
+        answers = self.object.get_answers()
         
         context.update({
             'answers': answers,
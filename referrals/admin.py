@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import SalesExecutive, ReferralCode
+from .models import SalesExecutive, ReferralCode, SalesDailyRollup
 
 @admin.register(SalesExecutive)
 class SalesExecutiveAdmin(admin.ModelAdmin):
@@ -11,4 +11,15 @@ class SalesExecutiveAdmin(admin.ModelAdmin):
 class ReferralCodeAdmin(admin.ModelAdmin):
     list_display = ['code', 'sales_executive', 'discount_percentage', 'is_active', 'created_at']
     list_filter = ['is_active', 'created_at']
-    search_fields = ['code', 'sales_executive__user__username']
\ No newline at end of file
+    search_fields = ['code', 'sales_executive__user__username']
+@admin.register(SalesDailyRollup)
+class SalesDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ['date', 'sales_executive', 'batch', 'payment_status', 'order_count', 'gross_amount', 'discount_amount', 'net_amount']
+    list_filter = ['payment_status', 'date']
+    date_hierarchy = 'date'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
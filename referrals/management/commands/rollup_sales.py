@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import datetime, time, timedelta
+from referrals.models import SalesDailyRollup
+
+class Command(BaseCommand):
+    help = (
+        'Incrementally update the daily sales rollup from the stored high-water mark. '
+        'Safe to re-run; use --full after deleting orders.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild the whole rollup instead of resuming from the high-water mark')
+        parser.add_argument('--since', help='Rebuild days touched by orders changed on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--overlap-minutes', type=int, default=5, help='How far behind the high-water mark to rescan for late commits')
+        parser.add_argument('--days-per-chunk', type=int, default=31, help='Days rebuilt per transaction')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            day = parse_date(options['since'])
+            if day is None:
+                raise CommandError('--since must be a date in YYYY-MM-DD format')
+            since = datetime.combine(day, time.min, tzinfo=timezone.get_current_timezone())
+        
+        days, rows = SalesDailyRollup.refresh(
+            since=since,
+            full=options['full'],
+            overlap=timedelta(minutes=options['overlap_minutes']),
+            days_per_chunk=options['days_per_chunk'],
+        )
+        
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {days} days ({rows} rollup rows)'))
@@ -0,0 +1,69 @@
+from django.db import migrations
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce, TruncDate, TruncMonth
+from django.utils import timezone
+
+
+def backfill_sales_rollups(apps, schema_editor):
+    """Build the rollups from every existing order, as `rollup_sales --full` would."""
+    Order = apps.get_model('batches', 'Order')
+    SalesDailyRollup = apps.get_model('referrals', 'SalesDailyRollup')
+    SalesMonthlyRollup = apps.get_model('referrals', 'SalesMonthlyRollup')
+    RollupCheckpoint = apps.get_model('referrals', 'RollupCheckpoint')
+    if RollupCheckpoint.objects.filter(name='sales_daily', high_water_mark__isnull=False).exists():
+        # Already built by rollup_sales
+        return
+
+    new_mark = timezone.now()
+    totals = {
+        'orders': Count('id'),
+        'gross': Sum('original_amount'),
+        'discount': Sum('discount_amount'),
+        'net': Sum('amount'),
+    }
+    daily = Order.objects.annotate(
+        day=TruncDate(Coalesce('payment_date', 'created_at'), tzinfo=timezone.get_current_timezone())
+    ).values('day', 'sales_executive_id', 'batch_id', 'payment_status').annotate(**totals).order_by()
+    SalesDailyRollup.objects.all().delete()
+    SalesDailyRollup.objects.bulk_create(
+        [
+            SalesDailyRollup(
+                date=row['day'], sales_executive_id=row['sales_executive_id'], batch_id=row['batch_id'],
+                payment_status=row['payment_status'], order_count=row['orders'], gross_amount=row['gross'] or 0,
+                discount_amount=row['discount'] or 0, net_amount=row['net'] or 0,
+            )
+            for row in daily
+        ],
+        batch_size=1000,
+    )
+
+    monthly = SalesDailyRollup.objects.annotate(month_start=TruncMonth('date')).values(
+        'month_start', 'sales_executive_id', 'payment_status'
+    ).annotate(
+        orders=Sum('order_count'), gross=Sum('gross_amount'), discount=Sum('discount_amount'), net=Sum('net_amount')
+    ).order_by()
+    SalesMonthlyRollup.objects.all().delete()
+    SalesMonthlyRollup.objects.bulk_create(
+        [
+            SalesMonthlyRollup(
+                month=row['month_start'], sales_executive_id=row['sales_executive_id'],
+                payment_status=row['payment_status'], order_count=row['orders'], gross_amount=row['gross'] or 0,
+                discount_amount=row['discount'] or 0, net_amount=row['net'] or 0,
+            )
+            for row in monthly
+        ],
+        batch_size=1000,
+    )
+    RollupCheckpoint.objects.update_or_create(name='sales_daily', defaults={'high_water_mark': new_mark})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('referrals', '0003_sales_daily_rollup'),
+        ('batches', '0013_order_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_sales_rollups, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,9 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate, TruncMonth
 from django.contrib.auth import get_user_model
 from django.utils import timezone
+from datetime import datetime, time, timedelta
 import string
 import random
 
@@ -35,4 +38,264 @@ class ReferralCode(models.Model):
                 return code
     
     def __str__(self):
-        return f"{self.code} - {self.sales_executive.user.get_full_name()}"
\ No newline at end of file
+        return f"{self.code} - {self.sales_executive.user.get_full_name()}"
+
+class RollupCheckpoint(models.Model):
+    """High-water mark for an incremental rollup job."""
+    name = models.CharField(max_length=50, unique=True)
+    high_water_mark = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} @ {self.high_water_mark}"
+
+
+class SalesDailyRollup(models.Model):
+    """
+    Per-day order totals keyed by (date, sales_executive, batch, payment_status).
+    
+    An order is counted on the local date of its payment_date, or of its
+    created_at while it has not been paid. Rows are rebuilt a whole day at a
+    time by `refresh`, so re-running it never double counts. Migration 0004
+    builds the table for orders placed before it existed.
+    """
+    CHECKPOINT = 'sales_daily'
+    
+    date = models.DateField()
+    sales_executive = models.ForeignKey(SalesExecutive, on_delete=models.CASCADE, null=True, blank=True, related_name='daily_rollups')
+    batch = models.ForeignKey('batches.Batch', on_delete=models.CASCADE, related_name='daily_rollups')
+    payment_status = models.CharField(max_length=20)
+    order_count = models.PositiveIntegerField(default=0)
+    gross_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    discount_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    net_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        unique_together = ['date', 'sales_executive', 'batch', 'payment_status']
+        indexes = [
+            models.Index(fields=['sales_executive', 'payment_status', 'date'], name='rollup_exec_status_date_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.date} {self.batch_id}/{self.sales_executive_id} {self.payment_status}: {self.order_count}"
+    
+    @staticmethod
+    def order_bucket():
+        """The timestamp an order is bucketed on; mirrors Order's `order_bucket_idx`."""
+        return Coalesce('payment_date', 'created_at')
+    
+    @classmethod
+    def rebuild_range(cls, first_day, last_day):
+        """Recompute every rollup row dated first_day..last_day (inclusive) from Order."""
+        from batches.models import Order
+        
+        tz = timezone.get_current_timezone()
+        start = datetime.combine(first_day, time.min, tzinfo=tz)
+        end = datetime.combine(last_day + timedelta(days=1), time.min, tzinfo=tz)
+        
+        grouped = Order.objects.annotate(
+            bucket_at=cls.order_bucket()
+        ).filter(
+            bucket_at__gte=start, bucket_at__lt=end
+        ).annotate(
+            day=TruncDate('bucket_at', tzinfo=tz)
+        ).values(
+            'day', 'sales_executive_id', 'batch_id', 'payment_status'
+        ).annotate(
+            orders=Count('id'),
+            gross=Sum('original_amount'),
+            discount=Sum('discount_amount'),
+            net=Sum('amount'),
+        ).order_by()
+        
+        rows = [
+            cls(
+                date=row['day'],
+                sales_executive_id=row['sales_executive_id'],
+                batch_id=row['batch_id'],
+                payment_status=row['payment_status'],
+                order_count=row['orders'],
+                gross_amount=row['gross'] or 0,
+                discount_amount=row['discount'] or 0,
+                net_amount=row['net'] or 0,
+            )
+            for row in grouped
+        ]
+        
+        with transaction.atomic():
+            cls.objects.filter(date__gte=first_day, date__lte=last_day).delete()
+            cls.objects.bulk_create(rows, batch_size=1000)
+            SalesMonthlyRollup.rebuild_range(first_day, last_day)
+        return len(rows)
+    
+    @classmethod
+    def touched_days(cls, since=None):
+        """
+        Local dates whose totals may have changed since `since`: the bucket
+        date and creation date of every order created, paid or edited at or
+        after it. All order dates when `since` is None.
+        """
+        from batches.models import Order
+        
+        tz = timezone.get_current_timezone()
+        orders = Order.objects.all()
+        if since is not None:
+            # updated_at moves on every save, so status edits are seen too
+            orders = orders.filter(updated_at__gte=since)
+        
+        bucket_days = orders.annotate(
+            day=TruncDate(cls.order_bucket(), tzinfo=tz)
+        ).values_list('day', flat=True).distinct().order_by()
+        created_days = orders.annotate(
+            day=TruncDate('created_at', tzinfo=tz)
+        ).values_list('day', flat=True).distinct().order_by()
+        return sorted(set(bucket_days) | set(created_days))
+    
+    @classmethod
+    def refresh(cls, since=None, full=False, overlap=timedelta(minutes=5), days_per_chunk=31):
+        """
+        Bring the rollup up to date and advance the checkpoint.
+        
+        Starts from the stored high-water mark (minus `overlap`, to pick up
+        orders committed late) unless `since` is given. With `full`, or with
+        no mark yet, the whole table is rebuilt. Returns (days rebuilt, rows written).
+        """
+        checkpoint, _ = RollupCheckpoint.objects.get_or_create(name=cls.CHECKPOINT)
+        if full:
+            since = None
+            cls.objects.all().delete()
+            SalesMonthlyRollup.objects.all().delete()
+        elif since is None and checkpoint.high_water_mark is not None:
+            since = checkpoint.high_water_mark - overlap
+        
+        # Read the new mark before scanning so concurrent writes land in the next run
+        new_mark = timezone.now()
+        days = cls.touched_days(since)
+        
+        rows = 0
+        chunk = []
+        for day in days:
+            if chunk and (day - chunk[0]).days >= days_per_chunk:
+                rows += cls.rebuild_range(chunk[0], chunk[-1])
+                chunk = []
+            chunk.append(day)
+        if chunk:
+            rows += cls.rebuild_range(chunk[0], chunk[-1])
+        
+        checkpoint.high_water_mark = new_mark
+        checkpoint.save(update_fields=['high_water_mark', 'updated_at'])
+        return len(days), rows
+    
+    @classmethod
+    def totals(cls, start=None, end=None, **filters):
+        """
+        Sum the rollup between two optional dates (inclusive), grouped by
+        (sales_executive_id, payment_status).
+        
+        Whole months are read from SalesMonthlyRollup and only the partial
+        months at either end from the daily rows, so the cost does not grow
+        with the length of the range. `filters` apply to both tables.
+        """
+        # First and last months that lie wholly inside the range
+        first_month = last_month = None
+        if start is not None:
+            first_month = start if start.day == 1 else month_after(start)
+        if end is not None:
+            last_month = ((end + timedelta(days=1)).replace(day=1) - timedelta(days=1)).replace(day=1)
+        
+        monthly = SalesMonthlyRollup.objects.filter(**filters)
+        daily = cls.objects.filter(**filters)
+        if first_month is not None and last_month is not None and first_month > last_month:
+            # No whole month in range
+            monthly = monthly.none()
+            daily_range = Q(date__gte=start, date__lte=end)
+        else:
+            if first_month is not None:
+                monthly = monthly.filter(month__gte=first_month)
+            if last_month is not None:
+                monthly = monthly.filter(month__lte=last_month)
+            daily_range = Q(pk__in=[])
+            if start is not None and start < first_month:
+                daily_range |= Q(date__gte=start, date__lt=first_month)
+            if end is not None and end >= month_after(last_month):
+                daily_range |= Q(date__gte=month_after(last_month), date__lte=end)
+        
+        results = {}
+        for queryset in (monthly, daily.filter(daily_range)):
+            grouped = queryset.values('sales_executive_id', 'payment_status').annotate(
+                orders=Sum('order_count'),
+                gross=Sum('gross_amount'),
+                discount=Sum('discount_amount'),
+                net=Sum('net_amount'),
+            ).order_by()
+            for row in grouped:
+                key = (row['sales_executive_id'], row['payment_status'])
+                total = results.setdefault(key, {'orders': 0, 'gross': 0, 'discount': 0, 'net': 0})
+                for field in total:
+                    total[field] += row[field] or 0
+        return results
+    
+    @classmethod
+    def last_refreshed(cls):
+        return RollupCheckpoint.objects.filter(name=cls.CHECKPOINT).values_list('high_water_mark', flat=True).first()
+
+
+
+class SalesMonthlyRollup(models.Model):
+    """
+    SalesDailyRollup summed per month and sales executive, for long-range
+    reports. Kept in step by SalesDailyRollup.rebuild_range.
+    """
+    month = models.DateField(help_text="First day of the month")
+    sales_executive = models.ForeignKey(SalesExecutive, on_delete=models.CASCADE, null=True, blank=True, related_name='monthly_rollups')
+    payment_status = models.CharField(max_length=20)
+    order_count = models.PositiveIntegerField(default=0)
+    gross_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    discount_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    net_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        unique_together = ['month', 'sales_executive', 'payment_status']
+    
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.sales_executive_id} {self.payment_status}: {self.order_count}"
+    
+    @classmethod
+    def rebuild_range(cls, first_day, last_day):
+        """Recompute the months overlapping first_day..last_day from the daily rollup."""
+        first_month = first_day.replace(day=1)
+        end = month_after(last_day)
+        grouped = SalesDailyRollup.objects.filter(
+            date__gte=first_month, date__lt=end
+        ).annotate(
+            month_start=TruncMonth('date')
+        ).values(
+            'month_start', 'sales_executive_id', 'payment_status'
+        ).annotate(
+            orders=Sum('order_count'),
+            gross=Sum('gross_amount'),
+            discount=Sum('discount_amount'),
+            net=Sum('net_amount'),
+        ).order_by()
+        
+        rows = [
+            cls(
+                month=row['month_start'],
+                sales_executive_id=row['sales_executive_id'],
+                payment_status=row['payment_status'],
+                order_count=row['orders'],
+                gross_amount=row['gross'] or 0,
+                discount_amount=row['discount'] or 0,
+                net_amount=row['net'] or 0,
+            )
+            for row in grouped
+        ]
+        with transaction.atomic():
+            cls.objects.filter(month__gte=first_month, month__lt=end).delete()
+            cls.objects.bulk_create(rows, batch_size=1000)
+        return len(rows)
+
+
+def month_after(day):
+    """First day of the month following `day`."""
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
@@ -0,0 +1,99 @@
+from datetime import timedelta
+from importlib import import_module
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.urls import reverse
+from django.utils import timezone
+
+from batches.models import Batch, Category, Order
+from main.testing import AppTestCase, QueryBudgetMixin, make_user
+from .models import ReferralCode, RollupCheckpoint, SalesDailyRollup, SalesExecutive
+from .views import SalesDashboardView
+
+
+class ReferralTestCase(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.batch = Batch.objects.create(name='Arjuna', category=Category.objects.create(name='JEE'), price=1000)
+
+    def add_executive(self, number):
+        executive = SalesExecutive.objects.create(user=make_user(f'sales{number}', 'sales_executive'), employee_id=f'EMP{number}', phone='9999999999')
+        ReferralCode.objects.create(code=f'CODE{number}', sales_executive=executive, discount_percentage=10)
+        return executive
+
+    def add_orders(self, executives, count):
+        now = timezone.now()
+        first = Order.objects.count()
+        Order.objects.bulk_create(
+            Order(order_id=f'SS{first + number:08d}', user=self.student,
+                  batch=self.batch, original_amount=1000, discount_amount=100, amount=900,
+                  sales_executive=executives[number % len(executives)], payment_status='successful',
+                  created_at=now - timedelta(days=number % 60), payment_date=now - timedelta(days=number % 60))
+            for number in range(count)
+        )
+
+
+class SalesQueryBudgetTests(QueryBudgetMixin, ReferralTestCase):
+    def test_sales_dashboard_stays_within_budget(self):
+        admin = make_user('admin', 'admin')
+
+        def grow(size):
+            executives = [self.add_executive(number) for number in range(SalesExecutive.objects.count(), size // 10)]
+            self.add_orders(executives or list(SalesExecutive.objects.all()), size)
+            SalesDailyRollup.refresh(full=True)
+
+        self.client.force_login(admin)
+        # Role names stay cached between requests; the budget is for a warm process
+        admin.role_name
+        self.assertQueryBudgetHolds(SalesDashboardView, reverse('referrals:sales_dashboard'), grow)
+
+
+class SalesRollupTests(ReferralTestCase):
+    def setUp(self):
+        super().setUp()
+        self.executive = self.add_executive(1)
+
+    def test_incremental_refresh_sees_status_edits(self):
+        self.add_orders([self.executive], 1)
+        order = Order.objects.get()
+        Order.objects.filter(pk=order.pk).update(payment_status='pending', payment_date=None)
+        SalesDailyRollup.refresh(full=True)
+        self.assertEqual(SalesDailyRollup.totals()[self.executive.pk, 'pending']['orders'], 1)
+
+        order.refresh_from_db()
+        order.payment_status = 'failed'
+        order.save()
+        SalesDailyRollup.refresh()
+        totals = SalesDailyRollup.totals()
+        self.assertNotIn((self.executive.pk, 'pending'), totals)
+        self.assertEqual(totals[self.executive.pk, 'failed']['orders'], 1)
+
+    def test_migration_builds_rollups_for_existing_orders(self):
+        self.add_orders([self.executive], 40)
+        # The test database was migrated before these orders existed
+        RollupCheckpoint.objects.all().delete()
+        migration = import_module('referrals.migrations.0004_backfill_sales_rollups')
+        state = MigrationExecutor(connection).loader.project_state(('referrals', '0004_backfill_sales_rollups'))
+        migration.backfill_sales_rollups(state.apps, None)
+
+        self.assertEqual(SalesDailyRollup.totals()[self.executive.pk, 'successful'], {
+            'orders': 40, 'gross': 40000, 'discount': 4000, 'net': 36000,
+        })
+        self.assertIsNotNone(SalesDailyRollup.last_refreshed())
+
+
+class ExecutiveDashboardTests(ReferralTestCase):
+    def test_order_tabs_page_through_every_order(self):
+        executive = self.add_executive(1)
+        self.add_orders([executive], 60)
+        self.client.force_login(executive.user)
+        url = reverse('referrals:executive_dashboard')
+
+        first = self.client.get(url).context['enrolled_orders']
+        last = self.client.get(url, {'tab': 'enrolled', 'enrolled_page': 2})
+        self.assertEqual(len(first), 50)
+        self.assertEqual(len(last.context['enrolled_orders']), 10)
+        self.assertEqual(last.context['active_tab'], 'enrolled')
+        seen = {order.pk for order in first} | {order.pk for order in last.context['enrolled_orders']}
+        self.assertEqual(seen, set(Order.objects.values_list('pk', flat=True)))
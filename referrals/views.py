@@ -1,12 +1,20 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.paginator import Paginator
 from django.views.generic import TemplateView
-from django.db.models import Sum, Count, Q
+from django.db.models import Sum, Count, OuterRef, Subquery, IntegerField, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import timedelta
 from batches.models import Order
-from .models import SalesExecutive, ReferralCode
+from .models import SalesExecutive, ReferralCode, SalesDailyRollup
 
 class SalesExecutiveDashboardView(LoginRequiredMixin, TemplateView):
     template_name = 'referrals/executive_dashboard.html'
+    orders_per_page = 50
+    # Each tab pages independently with its own `<tab>_page` parameter
+    tabs = ('enrolled', 'pending', 'cancelled')
     
     def dispatch(self, request, *args, **kwargs):
         if not request.user.is_sales_executive:
@@ -20,91 +28,121 @@ class SalesExecutiveDashboardView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
+        totals = {}
         if self.sales_executive:
-            # Get all orders for this sales executive
-            all_orders = Order.objects.filter(sales_executive=self.sales_executive)
+            # Counts and sums come from the rollups, grouped by status
+            totals = SalesDailyRollup.totals(sales_executive=self.sales_executive)
             
-            # Successful orders (enrolled students)
-            enrolled_orders = all_orders.filter(payment_status='successful')
-            
-            # Pending orders
-            pending_orders = all_orders.filter(payment_status='pending')
-            
-            # Failed/cancelled orders
-            cancelled_orders = all_orders.filter(payment_status='failed')
-            
-            # Statistics
-            total_revenue = enrolled_orders.aggregate(Sum('amount'))['amount__sum'] or 0
-            total_discount_given = enrolled_orders.aggregate(Sum('discount_amount'))['discount_amount__sum'] or 0
+            # One page of each list at a time; served by the
+            # (sales_executive, payment_status, payment_date) index
+            orders = Order.objects.filter(sales_executive=self.sales_executive).select_related('user', 'batch')
+            enrolled_orders = orders.filter(payment_status='successful').order_by('-payment_date')
+            pending_orders = orders.filter(payment_status='pending').order_by('-created_at')
+            cancelled_orders = orders.filter(payment_status='failed').order_by('-created_at')
             active_referral_codes = self.sales_executive.referral_codes.filter(is_active=True)
         else:
             enrolled_orders = pending_orders = cancelled_orders = Order.objects.none()
-            total_revenue = total_discount_given = 0
             active_referral_codes = []
         
+        empty = {'orders': 0, 'discount': 0, 'net': 0}
+        executive_id = self.sales_executive.id if self.sales_executive else None
+        enrolled, pending, cancelled = (
+            totals.get((executive_id, status), empty)
+            for status in ('successful', 'pending', 'failed')
+        )
+        
+        pages = {
+            tab: Paginator(orders, self.orders_per_page).get_page(self.request.GET.get(f'{tab}_page'))
+            for tab, orders in zip(self.tabs, (enrolled_orders, pending_orders, cancelled_orders))
+        }
+        active_tab = self.request.GET.get('tab')
         context.update({
             'sales_executive': self.sales_executive,
-            'enrolled_orders': enrolled_orders.select_related('user', 'batch'),
-            'pending_orders': pending_orders.select_related('user', 'batch'),
-            'cancelled_orders': cancelled_orders.select_related('user', 'batch'),
-            'total_enrolled': enrolled_orders.count(),
-            'total_pending': pending_orders.count(),
-            'total_cancelled': cancelled_orders.count(),
-            'total_revenue': total_revenue,
-            'total_discount_given': total_discount_given,
-            'active_referral_codes': active_referral_codes,
+            'enrolled_orders': pages['enrolled'],
+            'pending_orders': pages['pending'],
+            'cancelled_orders': pages['cancelled'],
+            'active_tab': active_tab if active_tab in self.tabs else self.tabs[0],
+            'total_enrolled': enrolled['orders'],
+            'total_pending': pending['orders'],
+            'total_cancelled': cancelled['orders'],
+            'total_revenue': enrolled['net'],
+            'total_discount_given': enrolled['discount'],
+            'rollup_refreshed_at': SalesDailyRollup.last_refreshed(),
         })
         
         return context
 
 class SalesDashboardView(LoginRequiredMixin, TemplateView):
     template_name = 'referrals/sales_dashboard.html'
+    query_budget = 7
+    trend_days = 30
     
     def dispatch(self, request, *args, **kwargs):
         if not request.user.is_admin:
             return redirect('main:index')
         return super().dispatch(request, *args, **kwargs)
     
+    @staticmethod
+    def parse_day(value):
+        try:
+            return parse_date(value) if value else None
+        except ValueError:
+            return None
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        start = self.parse_day(self.request.GET.get('start'))
+        end = self.parse_day(self.request.GET.get('end'))
+        
+        # Everything reads from the rollups, bucketed on payment date
+        totals = SalesDailyRollup.totals(start, end, payment_status='successful')
         
-        # Get all sales executives with their stats
-        sales_executives = SalesExecutive.objects.filter(is_active=True)
+        active_codes = ReferralCode.objects.filter(
+            sales_executive=OuterRef('pk'), is_active=True
+        ).values('sales_executive')
+        sales_executives = SalesExecutive.objects.filter(is_active=True).select_related('user').annotate(
+            active_codes=Coalesce(
+                Subquery(active_codes.annotate(total=Count('id')).values('total')),
+                Value(0), output_field=IntegerField()
+            ),
+        )
         
+        empty = {'orders': 0, 'net': 0}
         sales_data = []
         for executive in sales_executives:
-            orders = Order.objects.filter(
-                sales_executive=executive,
-                payment_status='successful'
-            )
-            
-            total_sales = orders.aggregate(
-                total_amount=Sum('amount'),
-                total_orders=Count('id')
-            )
-            
+            sold = totals.get((executive.id, 'successful'), empty)
             sales_data.append({
                 'executive': executive,
-                'total_amount': total_sales['total_amount'] or 0,
-                'total_orders': total_sales['total_orders'] or 0,
-                'referral_codes': executive.referral_codes.filter(is_active=True).count()
+                'total_amount': sold['net'],
+                'total_orders': sold['orders'],
+                'referral_codes': executive.active_codes,
             })
         
-        # Overall stats
-        total_referral_orders = Order.objects.filter(
-            referral_code__isnull=False,
-            payment_status='successful'
-        ).count()
+        # Referral orders are the ones attributed to a sales executive
+        referral_totals = [total for (executive_id, _), total in totals.items() if executive_id is not None]
         
-        total_referral_revenue = Order.objects.filter(
-            referral_code__isnull=False,
-            payment_status='successful'
-        ).aggregate(Sum('amount'))['amount__sum'] or 0
+        # Daily trend for the last `trend_days` days of the selected range
+        trend_end = end or timezone.localdate()
+        trend = SalesDailyRollup.objects.filter(
+            payment_status='successful', sales_executive__isnull=False,
+            date__gt=trend_end - timedelta(days=self.trend_days), date__lte=trend_end,
+        )
+        if start:
+            trend = trend.filter(date__gte=start)
+        daily_trend = trend.values('date').annotate(
+            orders=Sum('order_count'),
+            revenue=Sum('net_amount'),
+        ).order_by('-date')
         
         context.update({
             'sales_data': sales_data,
-            'total_referral_orders': total_referral_orders,
-            'total_referral_revenue': total_referral_revenue,
+            'total_referral_orders': sum(total['orders'] for total in referral_totals),
+            'total_referral_revenue': sum(total['net'] for total in referral_totals),
+            'daily_trend': daily_trend,
+            'trend_days': self.trend_days,
+            'start_date': start,
+            'end_date': end,
+            'rollup_refreshed_at': SalesDailyRollup.last_refreshed(),
         })
         
-        return context
\ No newline at end of file
+        return context
@@ -45,6 +45,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'main.middleware.SessionTouchMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -77,9 +78,51 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # WAL lets reads proceed during writes
+        'OPTIONS': {
+            'init_command': 'PRAGMA journal_mode=WAL;',
+        },
     }
 }
 
+# Cache
+# Page, entitlement and dashboard caches are invalidated through this backend, so use a
+# shared one (e.g. Redis or Memcached) when running more than one worker.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='smart-study'),
+    }
+}
+
+# Anonymous full-page cache timeout in seconds (content edits invalidate it sooner)
+PAGE_CACHE_TIMEOUT = config('PAGE_CACHE_TIMEOUT', default=600, cast=int)
+
+# Logged-in dashboard figures; the user's own changes invalidate them sooner
+DASHBOARD_CACHE_TIMEOUT = config('DASHBOARD_CACHE_TIMEOUT', default=60, cast=int)
+
+# Doubts a teacher may hold in progress before the dispatch queue stops
+# giving them more
+DOUBT_MAX_IN_PROGRESS = config('DOUBT_MAX_IN_PROGRESS', default=5, cast=int)
+
+# Learning-event log segments (main.events) and how often buffered events are written
+EVENT_LOG_DIR = config('EVENT_LOG_DIR', default=str(BASE_DIR / 'events'))
+EVENT_LOG_FLUSH_INTERVAL = config('EVENT_LOG_FLUSH_INTERVAL', default=1.0, cast=float)
+
+# Runs tests with the event log in a temporary directory (main.testing)
+TEST_RUNNER = 'main.testing.TestRunner'
+
+# Recipients per transaction when a notification fans out (accounts.notifications)
+NOTIFICATION_CHUNK_SIZE = config('NOTIFICATION_CHUNK_SIZE', default=2000, cast=int)
+
+# Quiz attempts read per query by the nightly item analysis (quizzes.analytics)
+ITEM_ANALYSIS_CHUNK_SIZE = config('ITEM_ANALYSIS_CHUNK_SIZE', default=5000, cast=int)
+
+# Fraction of a lecture's duration a heartbeat must reach to mark it completed
+PROGRESS_COMPLETE_THRESHOLD = config('PROGRESS_COMPLETE_THRESHOLD', default=0.9, cast=float)
+# Seconds between writes of each worker's own heartbeat buffer, when the cache is not shared
+PROGRESS_HEARTBEAT_FLUSH_INTERVAL = config('PROGRESS_HEARTBEAT_FLUSH_INTERVAL', default=30, cast=int)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -119,6 +162,12 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Custom user model
 AUTH_USER_MODEL = 'accounts.User'
 
+# Sessions created before RoleModelBackend was added still name ModelBackend
+AUTHENTICATION_BACKENDS = [
+    'accounts.backends.RoleModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 # Login/Logout URLs
 LOGIN_URL = 'accounts:login'
 LOGIN_REDIRECT_URL = '/'
@@ -138,14 +187,30 @@ EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='Smart Study <noreply@smartstudy.com>')
 
 # File upload settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 16 * 1024 * 1024  # 16MB
+# Uploads above this are streamed to a temporary file instead of held in memory
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(2.5 * 1024 * 1024)  # 2.5MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 16 * 1024 * 1024  # 16MB
 
+# Doubt images: largest accepted upload, and threads that resize them (doubts.images)
+DOUBT_IMAGE_MAX_UPLOAD_SIZE = config('DOUBT_IMAGE_MAX_UPLOAD_SIZE', default=16 * 1024 * 1024, cast=int)
+DOUBT_IMAGE_WORKERS = config('DOUBT_IMAGE_WORKERS', default=2, cast=int)
+
+# Snapshot of the similar-doubt index (doubts.similar); its journal sits beside it
+# and is folded into the snapshot once it grows past the byte limit
+DOUBT_SIMILARITY_INDEX = config('DOUBT_SIMILARITY_INDEX', default=str(BASE_DIR / 'doubt_similarity.idx'))
+DOUBT_SIMILARITY_JOURNAL_MAX_BYTES = config('DOUBT_SIMILARITY_JOURNAL_MAX_BYTES', default=4 * 1024 * 1024, cast=int)
+
 # Security settings for production
 SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
 X_FRAME_OPTIONS = 'DENY'
 
 # Session settings
+# cached_db serves reads from CACHES (only safe with a shared cache backend);
+# signed_cookies keeps sessions out of the database entirely
+SESSION_ENGINE = config('SESSION_ENGINE', default='django.contrib.sessions.backends.db')
 SESSION_COOKIE_AGE = 86400  # 24 hours
-SESSION_SAVE_EVERY_REQUEST = True
\ No newline at end of file
+# Sliding expiry comes from main.middleware.SessionTouchMiddleware, which only
+# re-saves a session once this fraction of SESSION_COOKIE_AGE has passed
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_TOUCH_FRACTION = config('SESSION_TOUCH_FRACTION', default=0.1, cast=float)